@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+自适应块大小 - AIMD控制器：每块的平均单条记录延迟下降且解析失败率低时加性增大token预算，
+遇到超时、5xx或输出被max_tokens截断时乘性减小；每次决策都写入日志，便于按模型调优吞吐量
+"""
+import json
+import time
+import logging
+import threading
+
+from entry_chunker import token_budget
+
+logger = logging.getLogger(__name__)
+
+MIN_BUDGET = 150
+MAX_BUDGET = 1600
+INCREASE_STEP = 64          # 加性增大步长（token）
+DECREASE_FACTOR = 0.5       # 乘性减小系数
+MAX_FAILURE_RATE = 0.05     # 解析失败率超过该值时不再增大
+LATENCY_TOLERANCE = 1.1     # 单条延迟比历史平滑值高出10%以内视为“没有变慢”
+EWMA_ALPHA = 0.3
+
+
+class AIMDController:
+    """单个模型的块大小控制器（线程安全）"""
+
+    def __init__(self, model, initial=None, minimum=MIN_BUDGET, maximum=MAX_BUDGET,
+                 step=INCREASE_STEP, factor=DECREASE_FACTOR, decision_log=None):
+        self.model = model
+        self.budget = initial or token_budget()
+        self.minimum = minimum
+        self.maximum = maximum
+        self.step = step
+        self.factor = factor
+        self.decision_log = decision_log
+        self.latency_per_record = None   # 单条记录延迟的EWMA
+        self._lock = threading.Lock()
+
+    def current(self):
+        with self._lock:
+            return self.budget
+
+    def observe(self, budget_used, latency=None, records=0, failed=0, errors=(), truncated=False):
+        """根据一块的处理结果调整预算，返回(决策, 新预算)
+
+        errors为本块遇到的超时/5xx等错误列表，truncated表示输出达到max_tokens被截断
+        """
+        with self._lock:
+            old = self.budget
+            per_record = latency / records if latency is not None and records else None
+            failure_rate = failed / (records + failed) if records + failed else 0.0
+            if errors or truncated:
+                decision = 'decrease'
+                self.budget = max(self.minimum, int(self.budget * self.factor))
+            elif per_record is None or failure_rate > MAX_FAILURE_RATE:
+                decision = 'hold'
+            elif self.latency_per_record is None or per_record <= self.latency_per_record * LATENCY_TOLERANCE:
+                decision = 'increase'
+                self.budget = min(self.maximum, self.budget + self.step)
+            else:
+                decision = 'hold'
+            if per_record is not None:
+                if self.latency_per_record is None:
+                    self.latency_per_record = per_record
+                else:
+                    self.latency_per_record += EWMA_ALPHA * (per_record - self.latency_per_record)
+            event = {
+                'time': time.time(), 'model': self.model, 'decision': decision,
+                'budget_used': budget_used, 'old_budget': old, 'new_budget': self.budget,
+                'latency': latency, 'records': records, 'failed': failed,
+                'failure_rate': round(failure_rate, 4), 'errors': list(errors), 'truncated': truncated,
+                'latency_per_record': per_record, 'latency_per_record_ewma': self.latency_per_record,
+            }
+        logger.info("自适应块大小 %s", json.dumps(event, ensure_ascii=False))
+        if self.decision_log:
+            with open(self.decision_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        return decision, self.budget
+
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(model, **kwargs):
+    """获取模型的控制器（同一进程内按模型名共享，跨字母延续调优结果）"""
+    with _controllers_lock:
+        controller = _controllers.get(model)
+        if controller is None:
+            controller = _controllers[model] = AIMDController(model, **kwargs)
+        return controller
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+AI处理日志 - 按源条目的内容哈希保存AI输出的记录行（ai/<字母>/journal.jsonl，每行一个条目）
+重新运行时日志中已有的条目直接复用，只把新增或改动过的条目发给LLM；与块大小、块序号无关
+"""
+import os
+import json
+import threading
+
+JOURNAL_NAME = 'journal.jsonl'
+
+
+class EntryJournal:
+    """线程安全的追加式日志，同一条目多次写入时以最后一次为准"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        item = json.loads(line)
+                    except ValueError:
+                        # 进程中断时最后一行可能只写了一半
+                        continue
+                    self.entries[item['key']] = item['records']
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, records):
+        """写入一个条目的输出记录行（可以为空列表，表示AI丢弃了该条目）"""
+        line = json.dumps({'key': key, 'records': records}, ensure_ascii=False)
+        with self._lock:
+            self.entries[key] = records
+            self._file.write(line + '\n')
+            self._file.flush()
+
+    def compact(self, keys):
+        """只保留keys中的条目并重写日志，去掉源文件中已删除或改动前的旧条目"""
+        with self._lock:
+            self.entries = {key: self.entries[key] for key in keys if key in self.entries}
+            self._file.close()
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                for key, records in self.entries.items():
+                    f.write(json.dumps({'key': key, 'records': records}, ensure_ascii=False) + '\n')
+            os.replace(self.path + '.tmp', self.path)
+            self._file = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        with self._lock:
+            self._file.close()
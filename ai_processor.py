@@ -7,11 +7,29 @@ AI处理器 - 专门处理AI相关功能
 import os
 import time
 import requests
+import heapq
+import json
+import itertools
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from rich.console import Console
-from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn
+from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn, MofNCompleteColumn
 from rich.prompt import Prompt, Confirm
 import dotenv
+from llm_throttle import throttle
+from entry_chunker import entry_key, estimate_tokens, headword, match_owner, next_chunk_end, split_entries, token_prefix
+from ai_journal import EntryJournal, JOURNAL_NAME
+from local_parser import parse_entry
+from adaptive_chunking import get_controller
+from model_router import get_router
+from llm_stream import is_record_line, read_stream
+from llm_cache import get_cache
+from llm_telemetry import bind, current_context, error_cause, get_telemetry, run_summary
+from json_records import RecordDecoder, convert_output, json_summary
+from prompt_builder import build_prompt, pack_contents, record_request, split_packed, usage_summary
+import llm_client
+from model_health import DEFAULT_CACHE_PATH, DEFAULT_TTL, FAILURE_TTL, check_models, rank_models
 
 # 加载环境变量
 dotenv.load_dotenv()
@@ -25,10 +43,46 @@ logging.basicConfig(
 
 # 从.env文件读取API密钥
 SILICONFLOW_API_KEY = os.getenv("SILICONFLOW_API_KEY")
+# 接口地址可用SILICONFLOW_BASE_URL或LLM_BASE_URL覆盖（如本地的mock_llm_server.py）
+SILICONFLOW_API_URL = llm_client.chat_url("https://api.siliconflow.cn/v1", "SILICONFLOW_BASE_URL")
+# 每个模型的限流配额（每分钟请求数 / 每分钟token数），以及同时在途的请求数
+SILICONFLOW_RPM = int(os.getenv("SILICONFLOW_RPM", "60"))
+SILICONFLOW_TPM = int(os.getenv("SILICONFLOW_TPM", "50000"))
+AI_CONCURRENCY = int(os.getenv("AI_CONCURRENCY", "4"))
+# 同时处理的字母数；所有字母共享AI_CONCURRENCY个在途请求名额。失败的字母在后台等待后重试
+AI_LETTER_CONCURRENCY = int(os.getenv("AI_LETTER_CONCURRENCY", "3"))
+LETTER_RETRY_DELAY = 15
+MAX_LETTER_ATTEMPTS = 3
+# 错误处理阶段每批的失败项数，以及单个失败项被单独重试的最多次数
+REPAIR_BATCH_SIZE = int(os.getenv("AI_REPAIR_BATCH_SIZE", "8"))
+REPAIR_MAX_ATTEMPTS = int(os.getenv("AI_REPAIR_MAX_ATTEMPTS", "3"))
+# 错误处理阶段首轮把几批失败项打包在一个请求中（分段标记，回复按段拆回各批），摊薄指令的token开销
+REPAIR_PACK_SIZE = int(os.getenv("AI_REPAIR_PACK_SIZE", "4"))
+# 使用精简版指令（只保留格式定义和示例），减少每个请求重复发送的指令token
+AI_COMPACT_PROMPT = os.getenv("AI_COMPACT_PROMPT", "0") == "1"
+# JSON输出模式：要求模型逐行输出JSON记录，本地按schema校验并修复小错误后转换为记录行，减少错误处理阶段的请求；
+# 接口支持时同时发送response_format=json_object（AI_JSON_RESPONSE_FORMAT=0不发送）
+AI_JSON_MODE = os.getenv("AI_JSON_MODE", "0") == "1"
+AI_JSON_RESPONSE_FORMAT = os.getenv("AI_JSON_RESPONSE_FORMAT", "1") == "1"
+# 对冲请求：主请求超过该模型p95延迟（样本不足时为HEDGE_DELAY秒）未返回时向次优模型重发，
+# 对冲请求数不超过主请求数的HEDGE_MAX_RATIO
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", "30"))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+# 流式输出（SSE）：边生成边解析，输出越过的条目立即写入日志，中断时只重发未完成的条目。
+# AI_STREAM_TIMEOUT为单次流式请求的总时限，STREAM_READ_TIMEOUT为两次收到数据之间的最长间隔
+AI_STREAM = os.getenv("AI_STREAM", "1") == "1"
+AI_STREAM_TIMEOUT = float(os.getenv("AI_STREAM_TIMEOUT", "60"))
+STREAM_READ_TIMEOUT = float(os.getenv("STREAM_READ_TIMEOUT", "30"))
+# 格式规整的条目在本地直接解析，不发给LLM（AI_LOCAL_PARSE=0关闭）
+AI_LOCAL_PARSE = os.getenv("AI_LOCAL_PARSE", "1") == "1"
+# 一个块因中断或输出截断最多续传几轮
+CHUNK_RESUME_ROUNDS = 4
+# 自适应块大小的决策除写入 ai_processing_errors.log 外，可另存为JSONL便于按模型分析
+CHUNK_DECISION_LOG = os.getenv("CHUNK_DECISION_LOG", "")
 
 console = Console()
 
-# 定义模型列表，均为硅基流动免费模型
+# 定义模型列表，均为硅基流动免费模型（不重复）
 MODELS = [
     "THUDM/GLM-4-9B-0414",
     "Qwen/Qwen2.5-7B-Instruct",
@@ -38,15 +92,16 @@ MODELS = [
     "deepseek-ai/DeepSeek-R1-0528-Qwen3-8B",
     "THUDM/GLM-Z1-9B-0414",
     "deepseek-ai/DeepSeek-R1-Distill-Qwen-7B",
-    "Qwen/Qwen2.5-7B-Instruct",
-    "Qwen/Qwen2.5-Coder-7B-Instruct",
-    "THUDM/GLM-4-9B-0414",
     "Qwen/Qwen3-8B",
     "internlm/internlm2_5-7b-chat",
-    "THUDM/glm-4-9b-chat",
-    "Qwen/Qwen2-7B-Instruct"
+    "THUDM/glm-4-9b-chat"
 ]
 
+# 模型健康检查缓存（可用性与探测延迟）及有效期；探测失败的记录使用单独的较短有效期
+MODEL_HEALTH_CACHE = os.getenv("MODEL_HEALTH_CACHE", DEFAULT_CACHE_PATH)
+MODEL_HEALTH_TTL = int(os.getenv("MODEL_HEALTH_TTL", str(DEFAULT_TTL)))
+MODEL_HEALTH_FAILURE_TTL = int(os.getenv("MODEL_HEALTH_FAILURE_TTL", str(FAILURE_TTL)))
+
 def print_step_header(step_num, step_name, description=""):
     """打印步骤标题"""
     console.print(f"\n{'='*60}")
@@ -71,10 +126,9 @@ def log_error(message):
     """记录错误日志"""
     logging.info(message)
 
-def check_model_status(api_key, model):
-    """检查模型状态"""
+def probe_model(api_key, model):
+    """探测模型，返回响应延迟（秒），不可用时返回None"""
     try:
-        url = "https://api.siliconflow.cn/v1/chat/completions"
         payload = {
             "model": model,
             "messages": [
@@ -86,23 +140,26 @@ def check_model_status(api_key, model):
             "max_tokens": 10,
             "temperature": 0.1
         }
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
 
-        response = requests.post(url, json=payload, headers=headers, timeout=10)
+        start_time = time.time()
+        response = llm_client.post(SILICONFLOW_API_URL, payload, api_key, timeout=(llm_client.CONNECT_TIMEOUT, 10))
         if response.status_code == 200:
-            return True
+            return time.time() - start_time
         else:
-            return False
+            return None
     except Exception:
-        return False
+        return None
+
+def check_model_status(api_key, model):
+    """检查模型状态"""
+    return probe_model(api_key, model) is not None
+
+def get_available_models(api_key, refresh=False):
+    """获取可用模型列表，按探测延迟从快到慢排序
 
-def get_available_models(api_key):
-    """获取可用模型列表"""
+    并发探测去重后的MODELS，结果缓存在MODEL_HEALTH_CACHE中，有效期内不重复探测；refresh=True强制重新探测
+    """
     console.print("🔍 检查模型状态...")
-    available_models = []
     
     with Progress(
         SpinnerColumn(),
@@ -111,107 +168,40 @@ def get_available_models(api_key):
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
         expand=True,
     ) as progress:
-        task = progress.add_task("检查模型...", total=len(MODELS))
+        task = progress.add_task("检查模型...", total=len(set(MODELS)))
         
-        for model in MODELS:
+        def on_result(model, entry, cached):
             progress.update(task, description=f"检查 {model}...", advance=1)
-            if check_model_status(api_key, model):
-                available_models.append(model)
-                console.print(f"  ✅ {model} [green]可用[/green]")
+            source = "缓存" if cached else "探测"
+            if entry['ok']:
+                console.print(f"  ✅ {model} [green]可用[/green] ({entry['latency']:.2f} 秒, {source})")
             else:
-                console.print(f"  ❌ {model} [red]不可用[/red]")
+                console.print(f"  ❌ {model} [red]不可用[/red] ({source})")
+        
+        health = check_models(MODELS, lambda model: probe_model(api_key, model),
+                              cache_path=MODEL_HEALTH_CACHE, ttl=0 if refresh else MODEL_HEALTH_TTL,
+                              on_result=on_result, endpoint=SILICONFLOW_API_URL,
+                              failure_ttl=MODEL_HEALTH_FAILURE_TTL)
     
+    available_models = rank_models(health)
     if not available_models:
         print_error("没有可用的模型")
         return None
     
     return available_models
 
-def split_file_by_size(file_path, chunk_size=2*1024):
-    """按指定大小分割文件，返回分割后的内容列表"""
-    chunks = []
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            
-        if len(content.encode('utf-8')) <= chunk_size:
-            # 文件小于等于chunk_size，不需要分割
-            chunks.append(content)
-        else:
-            # 按行分割文件，避免单词被截断
-            lines = content.splitlines(True)  # 保留换行符
-            current_chunk = ""
-            
-            for line in lines:
-                # 检查添加这行后是否会超过chunk_size
-                test_chunk = current_chunk + line
-                if len(test_chunk.encode('utf-8')) > chunk_size and current_chunk:
-                    # 当前块已满，保存并开始新块
-                    chunks.append(current_chunk)
-                    current_chunk = line
-                else:
-                    current_chunk += line
-            
-            # 添加最后一个块
-            if current_chunk:
-                chunks.append(current_chunk)
-                
-        return chunks
-    except Exception as e:
-        print_error(f"分割文件失败: {e}")
-        return []
+def call_qwen_api(content, api_key, model="Qwen/QwQ-32B", available_models=None, is_error_processing=False, on_line=None,
+                  sections=1, slots=None):
+    """调用硅基流动API，返回(修正内容, 调用信息)
 
-def call_qwen_api(content, api_key, model="Qwen/QwQ-32B", available_models=None, is_error_processing=False):
-    """调用硅基流动API"""
-    base_prompt = (
-        "请将以下单词表内容修正为标准格式，每行一个单词，格式如下：。\n"
-        "每一行都由个元素组成，分别为：\n"
-        "en：英文单词/词组/句子\n"
-        "zh：中文释义，如果中文释义中间存在分号，则分号分割了2个不同的释义。\n"
-        "pro：词性（注：只有单词有词性，词组与句子的词性设为NULL）\n"
-        "type：en类型（注：句子的type为1,单词的type为0,词组的type为-1）\n"
-        "promt：对于type为词组和句子的en,根据上文（不查找下文）找出最有可能的原单词，即该词组中保有的最低有效提示单词\n"
-        "如果原始内容有格式错误、缺失、顺序混乱、缺少词性等，请自动补全和修正。\n"
-        "同时，对于多个解释，请另起一行，重复英文，并继续输出相关内容。其中“/”之间可能混有音标，这个不管，直接丢弃。\n"
-        "单词性、单释义示例：\n"
-        "|abandon|放弃|vt.|0|NULL|\n"
-        "多词性、多释义示例：\n"
-        "输入为：contrary/'kontrari/ n./adj. 相反\n 输出为：\n"
-        "|contrary|相反|n.|0|NULL|\n"
-        "|contrary|相反|adj.|0|NULL|\n"
-        "或者：\n"
-        "输入为：shoulder/feulde/ n. 肩膀 vt. 挑起，扛起；担负 \n"
-        "输出为：\n"
-        "|shoulder|肩膀|n.|0|NULL|\n"
-        "|shoulder|挑起，扛起；担负|vt.|0|NULL|\n"
-        "输入：host n. 主人 vt. 做东\n"
-        "输出：|host|主人|n.|0|NULL|\n"
-        "|host|做东|vt.|0|NULL|\n"
-        "单词性、多释义示例：\n"
-        "输入为：consume /ken'sju:m/ vt.消费；吃，喝；消耗\n"
-        "输出为：\n |consume|消费|vt.|0|NULL|\n |consume|吃，喝|vt.|0|NULL|\n |consume|消耗|vt.|0|NULL|\n"
-        "词组示例：\n"
-        "|consider doing|考虑做……|NULL|-1|consider|\n"
-        "句子示例：\n"
-        "输入为：As we get older, we often find it difficult to understand(v.) music. 年龄增长时，我们常常发现难以理解音乐。\n"
-        "输出为：\n |As we get older, we often find it difficult to understand music.|年龄增长时，我们常常发现难以理解音乐。|NULL|1|understand|\n"
-        "如果有多词性或多义项，请分多行输出。不要输出多余解释和说明，只输出修正后的内容。同时，在句子或者词组中，如果英文部分有用括号包裹的词性，则也丢弃\n"
-        "如果有明显的语义缺失、无法有效根据上下文补全的，丢弃这一行\n"
-        "每一列由\"|\"分割，\"|\"与内容之间不要添加空格\n"
-        "原始内容如下：\n"
-        f"{content}\n"
-        "请严格按照上述格式输出。**务必要输出5栏**，如果实在没有找到相关项，就用NULL代替！！！"
-    )
-    
-    # 如果是错误处理阶段，添加额外提示
-    if is_error_processing:
-        prompt = (
-            f"{base_prompt}\n\n"
-            "重要提醒：该列表为处理错误的列表，可能缺少一列，请自动分割英文、中文、词性、类型与提示词。\n"
-            "**输出的列表一定有5列，即存在6个\"|\"**，请仔细检查确保每行都有正确的格式。"
-        )
-    else:
-        prompt = base_prompt
+    调用信息包含实际使用的模型、响应时间、finish_reason、输出token数、是否被max_tokens截断，
+    以及途中遇到的超时/5xx错误，供自适应块大小控制器使用；失败时修正内容为None。
+    流式模式下每条完整记录调用一次on_line(行)：错误处理阶段（不对冲）收到即转发，其余在胜出的请求结束后按顺序转发；
+    中途中断时返回已收到的完整行，调用信息中partial为True。
+    sections>1表示content是prompt_builder.pack_contents打包的多段内容，回复由调用方按段拆分；
+    slots为调用方已占用一个名额的全局在途请求信号量，对冲请求需另外取得名额
+    """
+    prompt = build_prompt(content, AI_COMPACT_PROMPT, is_error_processing, sections, json_output=AI_JSON_MODE)
     
     max_retries = 5
     retry_delay = 10
@@ -232,6 +222,8 @@ def call_qwen_api(content, api_key, model="Qwen/QwQ-32B", available_models=None,
         "max_tokens": 2048,
         "temperature": 0.2
     }
+    if AI_JSON_MODE and AI_JSON_RESPONSE_FORMAT:
+        payload["response_format"] = {"type": "json_object"}
     
     payload_size = len(str(payload).encode('utf-8'))
     console.print(f"  📦 发送数据包大小: {payload_size} 字节")
@@ -251,60 +243,192 @@ def call_qwen_api(content, api_key, model="Qwen/QwQ-32B", available_models=None,
     if model not in models_to_try:
         print_warning(f"首选模型 {model} 不可用，将使用其他可用模型")
     
-    for model_idx, current_model in enumerate(models_to_try):
-        if model_idx > 0:  # 如果是备用模型，给出提示
-            print_warning(f"切换到备用模型: {current_model}")
-            
-        for attempt in range(max_retries):
-            try:
-                url = "https://api.siliconflow.cn/v1/chat/completions"
-                
-                # 更新当前尝试的模型
-                payload["model"] = current_model
-                
-                start_time = time.time()
-                headers = {
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json"
-                }
+    info = {'model': model, 'latency': None, 'finish_reason': None, 'completion_tokens': None,
+            'truncated': False, 'errors': [], 'cached': False, 'partial': False}
+    # 错误处理阶段由调用方轮换模型，保持给定顺序且不对冲；其余按路由得分选择模型
+    router = get_router(hedge_ratio=HEDGE_MAX_RATIO, default_hedge_delay=HEDGE_DELAY)
+    routed = not is_error_processing
+    if routed:
+        models_to_try = router.rank(models_to_try, preferred=model)
+    
+    # 每次实际发出的请求记录一行遥测；标签（字母、阶段、块号）取自调用线程，对冲请求在其他线程中发出
+    telemetry = get_telemetry()
+    tags = current_context()
+    sent = itertools.count(1)
+    
+    def valid(result):
+        content = result[0]
+        return bool(content) and any(line.lstrip().startswith('|') for line in content.splitlines())
+    
+    # 相同的接口、模型、提示词和参数直接使用缓存结果；缓存中不合格的回复（如旧版本写入的拒答）删除后照常请求
+    cache = get_cache()
+    for current_model in models_to_try:
+        cached = cache.get(dict(payload, model=current_model), SILICONFLOW_API_URL, count=False)
+        if cached is not None and not valid((cached, None)):
+            cache.delete(dict(payload, model=current_model), SILICONFLOW_API_URL)
+            print_warning(f"缓存中模型 {current_model} 的回复无效，已删除")
+            cached = None
+        if cached is not None:
+            cache.record_lookup(True)
+            console.print(f"  💾 命中LLM缓存 ({current_model})")
+            info.update(model=current_model, cached=True)
+            telemetry.record('cached', model=current_model, attempt=0, **tags)
+            return cached, info
+    cache.record_lookup(False)
+    
+    def count_request(current_model):
+        """统计实际发出的请求中指令与原始内容的token数"""
+        record_request(prompt, content, current_model)
+    
+    def request(current_model, on_line=on_line):
+        """向单个模型发送一次请求，返回(内容, 调用信息)，HTTP错误和超时直接抛出"""
+        body = dict(payload, model=current_model)
+        
+        # 按模型限流（请求数 + 估算的输入输出token数）
+        waited = throttle(current_model, SILICONFLOW_RPM, SILICONFLOW_TPM,
+                          estimate_tokens(prompt, current_model) + body["max_tokens"])
+        if waited > 1:
+            console.print(f"  ⏳ 模型 {current_model} 限流等待 {waited:.1f} 秒")
+        count_request(current_model)
+        
+        start_time = time.time()
+        call_info = {'model': current_model, 'partial': False, 'errors': [],
+                     'request_bytes': len(json.dumps(body, ensure_ascii=False).encode('utf-8'))}
+        if AI_STREAM:
+            body["stream"] = True
+            response = llm_client.post(SILICONFLOW_API_URL, body, api_key, stream=True,
+                                       timeout=(llm_client.CONNECT_TIMEOUT, STREAM_READ_TIMEOUT))
+            response.raise_for_status()
+            stream = read_stream(response, on_line, deadline=time.monotonic() + AI_STREAM_TIMEOUT,
+                                 decoder=RecordDecoder() if AI_JSON_MODE else None)
+            # 一条完整记录都没收到就中断时按失败处理，交给路由器换模型
+            if not stream.complete and not stream.lines:
+                raise stream.error
+            content = stream.content
+            finish_reason = stream.finish_reason
+            completion_tokens = stream.usage.get("completion_tokens")
+            call_info.update(prompt_tokens=stream.usage.get("prompt_tokens"),
+                             first_record_latency=stream.first_line_latency)
+            response_time = time.time() - start_time
+            if stream.first_line_latency is not None:
+                console.print(f"  ⚡ 首条记录用时: {stream.first_line_latency:.2f} 秒 ({current_model})")
+            if not stream.complete:
+                print_warning(f"模型 {current_model} 流式输出中断（已收到 {stream.lines} 行）: {stream.error}")
+                call_info['partial'] = True
+                call_info['errors'].append('timeout' if is_timeout(stream.error) else 'disconnect')
+            response_size = len(content.encode('utf-8'))
+        else:
+            response = llm_client.post(SILICONFLOW_API_URL, body, api_key)
+            response.raise_for_status()
+            response_time = time.time() - start_time
+            result = response.json()
+            choice = result["choices"][0]
+            content = choice["message"]["content"]
+            if AI_JSON_MODE:
+                content = convert_output(content)
+            completion_tokens = (result.get("usage") or {}).get("completion_tokens")
+            call_info['prompt_tokens'] = (result.get("usage") or {}).get("prompt_tokens")
+            finish_reason = choice.get("finish_reason")
+            response_size = len(response.content)
+        
+        # 显示响应信息
+        speed = response_size / response_time if response_time > 0 else 0
+        console.print(f"  📥 响应数据包大小: {response_size} 字节 ({current_model})")
+        console.print(f"  🕒 响应时间: {response_time:.2f} 秒")
+        console.print(f"  🚀 传输速度: {speed:.2f} 字节/秒")
+        
+        # 输出达到max_tokens时内容被截断，末尾的记录不完整
+        truncated = finish_reason == 'length' or (completion_tokens or 0) >= body["max_tokens"]
+        if truncated:
+            print_warning(f"模型 {current_model} 输出达到max_tokens={body['max_tokens']}，内容可能被截断")
+        call_info.update(latency=response_time, finish_reason=finish_reason, response_bytes=response_size,
+                         completion_tokens=completion_tokens, truncated=truncated)
+        return content, call_info
+    
+    def tracked_request(current_model):
+        """request()外加遥测记录：第几次尝试、字节数、token用量、延迟和结果；只缓存完整且有效的回复
 
-                response = requests.post(url, json=payload, headers=headers, timeout=60)
-                response.raise_for_status()
-                
-                end_time = time.time()
-                response_time = end_time - start_time
-                
-                # 显示响应信息
-                response_size = len(response.content)
-                speed = response_size / response_time if response_time > 0 else 0
-                console.print(f"  📥 响应数据包大小: {response_size} 字节")
-                console.print(f"  🕒 响应时间: {response_time:.2f} 秒")
-                console.print(f"  🚀 传输速度: {speed:.2f} 字节/秒")
-                
-                result = response.json()
-                return result["choices"][0]["message"]["content"], 2*1024  # 2KB块大小
-                
-            except Exception as e:
-                error_str = str(e)
-                # 检查是否是502或503错误
-                if "502" in error_str or "503" in error_str:
-                    if attempt < max_retries - 1:  # 不是最后一次尝试
-                        if "502" in error_str:
-                            print_warning(f"遇到502错误，等待{retry_delay}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
-                        elif "503" in error_str:
-                            print_warning(f"遇到503错误，等待{retry_delay}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        print_error(f"模型 {current_model} 重试{max_retries}次后仍然失败")
-                else:
-                    print_error(f"API调用失败: {e}")
-                    # 对于非502/503错误，不尝试其他模型
-                    if model_idx == 0:  # 只有主模型才尝试备用模型
-                        break
-                    return None, 2*1024
+        可能发出对冲请求时，流式记录行先收进本次请求自己的缓冲区（调用信息的lines），只转发胜出请求的行
+        """
+        fields = dict(tags, model=current_model, attempt=next(sent), stream=AI_STREAM)
+        start_time = time.time()
+        buffered = [] if on_line and routed else None
+        try:
+            result = request(current_model, buffered.append if buffered is not None else on_line)
+        except Exception as e:
+            telemetry.record('error', latency=time.time() - start_time, error=error_cause(e), **fields)
+            raise
+        call_info = result[1]
+        if call_info['partial']:
+            outcome = 'partial'
+        elif not valid(result):
+            outcome = 'invalid'
+        else:
+            outcome = 'truncated' if call_info['truncated'] else 'ok'
+        call_info['lines'] = buffered
+        if outcome == 'ok':
+            cache.put(dict(payload, model=current_model), result[0], SILICONFLOW_API_URL)
+        telemetry.record(outcome, latency=call_info['latency'], finish_reason=call_info['finish_reason'],
+                         request_bytes=call_info['request_bytes'], response_bytes=call_info['response_bytes'],
+                         prompt_tokens=call_info.get('prompt_tokens'), completion_tokens=call_info['completion_tokens'],
+                         first_record_latency=call_info.get('first_record_latency'),
+                         error=call_info['errors'][0] if call_info['errors'] else None, **fields)
+        return result
     
-    return None, 2*1024
+    for attempt in range(max_retries):
+        # 流式请求同样对冲：各请求的记录行分别缓冲，胜出后才交给on_line，落后请求的行丢弃
+        current_model, result, failures = router.call(tracked_request, models_to_try, preferred=model,
+                                                      validate=valid, hedge=routed, rank=routed, slots=slots)
+        retryable = False
+        for failed_model, error in failures:
+            error_str = str(error)
+            if is_timeout(error):
+                info['errors'].append('timeout')
+                retryable = True
+            elif "502" in error_str or "503" in error_str:
+                info['errors'].append('502' if "502" in error_str else '503')
+                retryable = True
+            if error is None:
+                print_warning(f"模型 {failed_model} 返回内容无效")
+            else:
+                print_warning(f"模型 {failed_model} 调用失败: {error}")
+        
+        if result is not None:
+            if current_model != model:
+                console.print(f"  🔀 由模型 {current_model} 完成")
+            content, call_info = result
+            for line in call_info.pop('lines') or []:
+                on_line(line)
+            info['errors'].extend(call_info.pop('errors'))
+            info.update(call_info)
+            return content, info
+        
+        # 所有模型都遇到超时或502/503时，整体等待后重试；其他错误（如鉴权失败）不重试
+        if not retryable:
+            break
+        if attempt < max_retries - 1:
+            print_warning(f"所有模型均暂时不可用，等待{retry_delay}秒后重试 (尝试 {attempt + 1}/{max_retries})...")
+            time.sleep(retry_delay)
+    
+    print_error(f"API调用失败: 所有模型均未返回有效结果")
+    return None, info
+
+def is_timeout(error):
+    """请求或流式读取超时（读超时在iter_lines中会包装成ConnectionError）"""
+    return (isinstance(error, (requests.exceptions.Timeout, TimeoutError))
+            or 'timed out' in str(error).lower())
+
+def merge_call_info(total, info):
+    """合并同一块多轮续传的调用信息：延迟累加，错误合并，任一轮截断即视为截断"""
+    merged = dict(total)
+    merged.update(model=info['model'], finish_reason=info['finish_reason'], partial=info['partial'],
+                  completion_tokens=info['completion_tokens'])
+    if info['latency'] is not None:
+        merged['latency'] = (total['latency'] or 0) + info['latency']
+    merged['errors'] = total['errors'] + info['errors']
+    merged['truncated'] = total['truncated'] or info['truncated']
+    merged['cached'] = total['cached'] and info['cached']
+    return merged
 
 def parse_fixed_content(content):
     """解析修正后的内容"""
@@ -347,14 +471,33 @@ def parse_fixed_content(content):
     
     return records, failed_items
 
-def process_failed_items(failed_items, api_key, model, available_models, ai_subdir):
-    """处理解析失败的项"""
+def repair_batches(batches, api_key, model, available_models):
+    """用指定模型修正若干批失败项，返回每批的(记录列表, 仍然失败的行)；调用失败时记录为None，整批视为失败
+
+    多批时打包在一个请求中，回复按段标记拆回各批；缺少任一段标记时无法确定记录属于哪一批，返回None
+    """
+    contents = ["\n".join(lines) for lines in batches]
+    content = pack_contents(contents) if len(batches) > 1 else contents[0]
+    fixed_content, _ = call_qwen_api(content, api_key, model, available_models, is_error_processing=True,
+                                     sections=len(batches))
+    if fixed_content is None:
+        return [(None, lines) for lines in batches]
+    replies = split_packed(fixed_content, len(batches)) if len(batches) > 1 else [fixed_content]
+    if None in replies:
+        return None
+    return [parse_fixed_content(reply) for reply in replies]
+
+def process_failed_items(failed_items, api_key, model, available_models, ai_subdir, concurrency=AI_CONCURRENCY, slots=None):
+    """处理解析失败的项
+
+    失败项按REPAIR_BATCH_SIZE分成小批并发发给除主模型外的其他模型，首轮每REPAIR_PACK_SIZE批打包成一个请求；
+    某一批仍有失败时对半拆分单独重发，直到单独一行为止，单行最多尝试REPAIR_MAX_ATTEMPTS次（每次换一个模型），
+    因此个别无法修正的行不会拖累整批，修正耗时只随坏行数增长
+    """
     if not failed_items:
         return []
     
     console.print(f"\n🔧 错误处理阶段 - 处理 {len(failed_items)} 个失败项")
-    processed_records = []
-    remaining_failed_items = failed_items.copy()
     
     # 使用除了当前主模型之外的其他模型进行轮询
     other_models = [m for m in available_models if m != model] if available_models else []
@@ -363,48 +506,80 @@ def process_failed_items(failed_items, api_key, model, available_models, ai_subd
         print_warning("没有其他可用模型来处理错误项")
         return []
     
-    model_index = 0
-    round_num = 0
+    concurrency = max(1, concurrency)
+    if slots is None:
+        slots = threading.BoundedSemaphore(concurrency)
+    results = {}  # 批次起始序号 -> 记录列表，最后按序号合并，保持原顺序
+    dropped = []
+    request_count = 0
     
-    # 不限制轮询次数，直到错误列表为空或所有模型都尝试过
-    while remaining_failed_items and other_models:
-        current_model = other_models[model_index % len(other_models)]
-        round_num += 1
-        console.print(f"\n🔄 错误处理轮次 {round_num} - 使用模型: {current_model}")
-        
-        # 将剩余的失败项组合成一个内容块
-        content_to_process = "\n".join(remaining_failed_items)
-        
-        # 调用AI处理，标记为错误处理阶段
-        fixed_content, _ = call_qwen_api(content_to_process, api_key, current_model, available_models, is_error_processing=True)
-        
-        if fixed_content is None:
-            print_warning(f"使用模型 {current_model} 处理失败项失败")
-            model_index += 1
-            
-            # 如果所有模型都尝试过了，跳出循环
-            if model_index >= len(other_models):
-                break
-            continue
+    context = current_context()
+    
+    def run_batches(batches, current_model):
+        with slots, bind(**dict(context, stage='repair')):
+            return repair_batches(batches, api_key, current_model, available_models)
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = {}
         
-        # 解析处理结果
-        records, newly_failed_items = parse_fixed_content(fixed_content)
-        processed_records.extend(records)
+        def submit(group, attempt=0):
+            """group为[(批次起始序号, 失败项列表)]，在一个请求中发送"""
+            nonlocal request_count
+            current_model = other_models[(group[0][0] + attempt) % len(other_models)]
+            request_count += 1
+            future = executor.submit(run_batches, [lines for _, lines in group], current_model)
+            in_flight[future] = (group, attempt, current_model)
         
-        # 更新剩余失败项
-        remaining_failed_items = newly_failed_items
-        model_index += 1
+        def handle(start, lines, attempt, current_model, records, still_failed):
+            if not still_failed:
+                results[start] = records
+                console.print(f"✅ 修正 {len(lines)} 项 ({current_model}): 新增 {len(records)} 条记录")
+            elif len(lines) > 1:
+                # 整批仍有失败时丢弃这批输出，对半拆分后单独重发，找出无法修正的行
+                half = len(lines) // 2
+                console.print(f"✂️ {len(lines)} 项中仍有失败 ({current_model})，拆分为 {half} + {len(lines) - half} 项重试")
+                submit([(start, lines[:half])])
+                submit([(start + half, lines[half:])])
+            elif attempt + 1 < REPAIR_MAX_ATTEMPTS:
+                print_warning(f"失败项仍未修正 ({current_model})，换模型重试 (第 {attempt + 2}/{REPAIR_MAX_ATTEMPTS} 次): {lines[0]}")
+                submit([(start, lines)], attempt + 1)
+            else:
+                # 最后一次尝试中已修正的记录仍然保留
+                if records:
+                    results[start] = records
+                dropped.extend(still_failed)
         
-        console.print(f"✅ 本轮处理完成: 新增 {len(records)} 条记录, 剩余 {len(remaining_failed_items)} 项待处理")
+        batches = [(start, failed_items[start:start + REPAIR_BATCH_SIZE])
+                   for start in range(0, len(failed_items), REPAIR_BATCH_SIZE)]
+        pack_size = max(1, REPAIR_PACK_SIZE)
+        for i in range(0, len(batches), pack_size):
+            submit(batches[i:i + pack_size])
         
-        # 如果所有模型都尝试过了，重置索引以继续下一轮
-        if model_index >= len(other_models):
-            model_index = 0
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                group, attempt, current_model = in_flight.pop(future)
+                try:
+                    outcomes = future.result()
+                except Exception as e:
+                    print_warning(f"使用模型 {current_model} 处理失败项出错: {e}")
+                    outcomes = [(None, lines) for _, lines in group]
+                if outcomes is None:
+                    # 回复缺少段标记，各批不打包重新发送，不计入尝试次数
+                    print_warning(f"模型 {current_model} 的回复缺少段标记，{len(group)} 批失败项分别重新发送")
+                    for batch in group:
+                        submit([batch], attempt)
+                    continue
+                for (start, lines), (records, still_failed) in zip(group, outcomes):
+                    handle(start, lines, attempt, current_model, records, still_failed)
+    
+    processed_records = [record for start in sorted(results) for record in results[start]]
+    console.print(f"🔧 错误处理完成: {request_count} 次请求, 新增 {len(processed_records)} 条记录")
     
     # 记录最终未能处理的项
-    if remaining_failed_items:
-        console.print(f"\n🗑️ 丢弃 {len(remaining_failed_items)} 个无法处理的项")
-        for item in remaining_failed_items:
+    if dropped:
+        console.print(f"\n🗑️ 丢弃 {len(dropped)} 个无法处理的项")
+        for item in dropped:
             log_error(f"丢弃无法处理的项: {item}")
     
     # 保存错误处理阶段的结果
@@ -417,8 +592,209 @@ def process_failed_items(failed_items, api_key, model, available_models, ai_subd
     
     return processed_records
 
-def process_single_letter(subdir, txt_file, ai_output_dir, api_key, model, available_models):
-    """处理单个字母目录"""
+def count_failed(lines):
+    """字段不足5个的记录行数（与parse_fixed_content的判断一致），用于块大小调优"""
+    return sum(1 for line in lines if len(line.strip('|').split('|')) < 5)
+
+def process_chunk(i, items, journal, api_key, model, available_models, slots=None):
+    """处理一个块（items为[(内容哈希, 条目)]），每个条目的输出记录写入日志，返回(记录行列表, 调用信息)，失败时记录行为None
+
+    记录按英文与条目词头的对应关系归属到条目，输出越过某个条目后该条目即写入日志；
+    流式输出中断或被max_tokens截断时，从中断的条目起只重发剩余部分（进程中断后重新运行同样只发未写入日志的条目）
+    """
+    entries = [entry for _, entry in items]
+    heads = [headword(entry) for entry in entries]
+    chunk_size_bytes = len(''.join(entries).encode('utf-8'))
+    console.print(f"  📦 块 {i+1} 大小: {chunk_size_bytes} 字节, {len(entries)} 个条目")
+    
+    received = []
+    total_info = None
+    start = 0
+    for round_num in range(CHUNK_RESUME_ROUNDS):
+        if start:
+            console.print(f"  ↩️ 块 {i+1} 续传: 从第 {start + 1}/{len(entries)} 个条目起重新发送")
+        state = {'owner': start, 'committed': start, 'fed': 0}
+        owned = {}
+        
+        def commit(upto):
+            for j in range(state['committed'], upto):
+                lines = owned.pop(j, [])
+                journal.put(items[j][0], lines)
+                received.extend(lines)
+            state['committed'] = max(state['committed'], upto)
+        
+        def accept(line):
+            owner = match_owner(heads, state['owner'], line.strip('|').split('|')[0])
+            # 输出已越过的条目不会再有记录，立即写入日志
+            commit(owner)
+            state['owner'] = owner
+            owned.setdefault(owner, []).append(line)
+            state['fed'] += 1
+        
+        fixed_content, info = call_qwen_api(''.join(entries[start:]), api_key, model, available_models,
+                                            is_error_processing=False, on_line=accept, slots=slots)
+        total_info = info if total_info is None else merge_call_info(total_info, info)
+        if fixed_content is None:
+            print_error(f"AI处理块 {i+1} 失败")
+            return None, total_info
+        
+        # 非流式请求或命中缓存时不会逐行回调，在这里统一归属
+        if not state['fed']:
+            for line in fixed_content.splitlines():
+                if is_record_line(line):
+                    accept(line.strip())
+        
+        if not (info['partial'] or info['truncated']):
+            commit(len(entries))
+            break
+        if info['partial'] or state['owner'] > start:
+            # 最后一个条目可能只输出了部分义项，丢弃后从该条目起重发
+            start = state['owner']
+        else:
+            # 单个条目的输出就超过max_tokens，重发也无济于事：保留截断的输出，从下一个条目继续
+            commit(start + 1)
+            start += 1
+            if start >= len(entries):
+                break
+    else:
+        print_error(f"块 {i+1} 续传 {CHUNK_RESUME_ROUNDS} 轮后仍未完成，已完成的 {start} 个条目已写入日志")
+        return None, total_info
+    
+    # 显示AI返回内容的前200个字符用于调试
+    content = '\n'.join(received)
+    preview_content = content[:200] + ("..." if len(content) > 200 else "")
+    console.print(f"  🧾 块 {i+1} AI返回内容预览: {preview_content}")
+    console.print(f"  💾 块 {i+1} 的 {len(entries)} 个条目已写入日志 ({len(received)} 条记录)")
+    return received, total_info
+
+def process_chunks(items, prefix, journal, api_key, model, available_models, concurrency, slots=None, report=None):
+    """用线程池并发处理待处理条目，任一块失败时停止提交新块并返回False
+
+    控制器按模型区分：按路由器当前最可能选中的模型的预算规划下一块，块完成后把延迟、解析失败数、超时/5xx和截断情况
+    反馈给实际完成该块的模型（call_qwen_api返回的调用信息中的model）的控制器。
+    本字母同时在途的块不超过concurrency，并且每个块都要先从slots（多个字母共享的信号量）取得名额，
+    模型级限流由call_qwen_api内的令牌桶负责；report(已完成条目数, 条目总数)用于更新进度条
+    """
+    router = get_router(hedge_ratio=HEDGE_MAX_RATIO, default_hedge_delay=HEDGE_DELAY)
+    candidates = list(available_models or [model])
+    
+    def controller_for(served_model):
+        return get_controller(served_model, decision_log=CHUNK_DECISION_LOG or None)
+    
+    def planned_budget():
+        return controller_for(router.rank(candidates, preferred=model)[0]).current()
+    
+    concurrency = max(1, concurrency)
+    if slots is None:
+        slots = threading.BoundedSemaphore(concurrency)
+    # 块在工作线程中处理，遥测标签（字母）从当前线程带过去
+    context = current_context()
+    console.print(f"  🚦 并发数: {concurrency}，待处理 {len(items)} 个条目")
+    console.print(f"  🧠 当前每块token预算: {planned_budget()}")
+    start_time = time.time()
+    ranges = []
+    next_start = 0
+    done_entries = 0
+    success = True
+    
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        in_flight = {}
+        
+        def run_chunk(i, chunk_items):
+            try:
+                with bind(**dict(context, stage='chunk', chunk=i + 1)):
+                    return process_chunk(i, chunk_items, journal, api_key, model, available_models, slots)
+            finally:
+                slots.release()
+        
+        def submit_next():
+            nonlocal next_start
+            if next_start >= len(items):
+                return
+            # 取得全局名额后再按控制器的当前预算规划下一块
+            slots.acquire()
+            end = next_chunk_end(prefix, next_start, planned_budget())
+            ranges.append((next_start, end))
+            i = len(ranges) - 1
+            in_flight[executor.submit(run_chunk, i, items[next_start:end])] = i
+            next_start = end
+        
+        for _ in range(concurrency):
+            submit_next()
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = in_flight.pop(future)
+                start, end = ranges[i]
+                chunk_tokens = prefix[end] - prefix[start]
+                try:
+                    lines, info = future.result()
+                except Exception as e:
+                    print_error(f"处理块 {i+1} 失败: {e}")
+                    # 打印完整的traceback以便调试
+                    import traceback
+                    traceback.print_exc()
+                    lines, info = None, None
+                
+                if lines is None:
+                    if info and info['errors']:
+                        controller_for(info['model']).observe(chunk_tokens, errors=info['errors'])
+                    # 不再提交新块，已在途的块完成后仍会写入日志，便于断点恢复
+                    success = False
+                    continue
+                
+                failed = count_failed(lines)
+                # 缓存命中没有真实的延迟，不参与调优
+                if not info['cached']:
+                    decision, budget = controller_for(info['model']).observe(
+                        chunk_tokens, info['latency'], len(lines) - failed, failed,
+                        info['errors'], info['truncated'])
+                    if decision != 'hold':
+                        console.print(f"  🎚️ 块 {i+1} 完成后调整 {info['model']} 的预算: {decision} -> {budget} token")
+                done_entries += end - start
+                if report:
+                    report(done_entries, len(items))
+                
+                # 显示实时统计信息（剩余时间按未完成条目的比例估算）
+                elapsed_time = time.time() - start_time
+                remaining_entries = len(items) - done_entries
+                rate = elapsed_time / max(1, done_entries)
+                stats_text = f"[cyan]已处理: {i + 1} 块 ({done_entries}/{len(items)} 条目), "
+                stats_text += f"剩余: {remaining_entries} 条目, "
+                stats_text += f"预计剩余时间: {rate * remaining_entries:.1f} 秒[/cyan]"
+                console.print(stats_text)
+                
+                if success:
+                    submit_next()
+    
+    return success
+
+# 各字母LLM处理每个条目的平均耗时，用于估计本地预解析节省的时间（本字母没有发给LLM的条目时使用）
+_llm_seconds_per_entry = []
+
+def report_local_parse(subdir, pending, offloaded, local_seconds, llm_seconds, sent):
+    """报告本地预解析的条目比例，并按LLM处理每个条目的耗时估计节省的时间"""
+    if sent:
+        _llm_seconds_per_entry.append(llm_seconds / sent)
+        per_entry = _llm_seconds_per_entry[-1]
+    elif _llm_seconds_per_entry:
+        per_entry = sum(_llm_seconds_per_entry) / len(_llm_seconds_per_entry)
+    else:
+        per_entry = None
+    message = (f"本地解析 {offloaded}/{pending} 个条目 ({offloaded / pending * 100:.1f}%)，"
+               f"用时 {local_seconds:.2f} 秒，LLM处理 {sent} 个条目用时 {llm_seconds:.1f} 秒")
+    if per_entry is not None:
+        message += f"，估计节省 {max(0.0, offloaded * per_entry - local_seconds):.1f} 秒"
+    console.print(f"  🧮 {message}")
+    log_error(f"本地预解析 {subdir}: {message}")
+
+def process_single_letter(subdir, txt_file, ai_output_dir, api_key, model, available_models, concurrency=AI_CONCURRENCY,
+                          slots=None, report=None):
+    """处理单个字母目录
+
+    slots为多个字母共享的在途请求信号量，report(已完成条目数, 条目总数)用于更新该字母的进度条
+    """
     try:
         # 创建输出目录
         ai_subdir = os.path.join(ai_output_dir, subdir)
@@ -438,125 +814,65 @@ def process_single_letter(subdir, txt_file, ai_output_dir, api_key, model, avail
         file_size = os.path.getsize(txt_file)
         console.print(f"  📄 文件大小: {file_size} 字节")
         
-        # 先尝试调用API获取合适的块大小
+        # 按条目切分：多行条目不拆分，每个条目按规范化内容的哈希在日志中查找已有输出
         with open(txt_file, 'r', encoding='utf-8') as f:
-            test_content = f.read(1000)  # 读取前1000个字符作为测试
-        
-        # 获取模型和块大小
-        fixed_content, chunk_size = call_qwen_api(test_content, api_key, model, available_models, is_error_processing=False)
-        if fixed_content is None:
-            print_error(f"无法获取模型信息，使用默认块大小")
-            chunk_size = 2*1024  # 默认2KB
-        
-        console.print(f"  🧠 使用模型推荐块大小: {chunk_size} 字节")
-        
-        # 分割文件为指定大小的块
-        chunks = split_file_by_size(txt_file, chunk_size)
-        console.print(f"  🔪 分割为 {len(chunks)} 块")
-        
-        if not chunks:
+            entries = split_entries(f.read().splitlines(True))
+        if not entries:
             print_warning(f"文件 {txt_file} 无法分割")
             return True
+        keys = [entry_key(entry) for entry in entries]
         
-        # 检查是否存在已处理的块文件，实现断点恢复
-        processed_chunks = set()
-        if os.path.exists(ai_subdir):
-            for file_name in os.listdir(ai_subdir):
-                if file_name.startswith("chunk_") and file_name.endswith(".txt"):
-                    try:
-                        chunk_num = int(file_name.split("_")[1].split(".")[0])
-                        processed_chunks.add(chunk_num - 1)  # 转换为0基索引
-                    except:
-                        pass
-        
-        # 收集所有记录和失败项
-        all_records = []
-        all_failed_items = []
-        
-        # 如果有已处理的块，加载它们的记录
-        for chunk_idx in processed_chunks:
-            if chunk_idx < len(chunks):
-                chunk_output_path = os.path.join(ai_subdir, f"chunk_{chunk_idx + 1}.txt")
-                if os.path.exists(chunk_output_path):
-                    try:
-                        with open(chunk_output_path, 'r', encoding='utf-8') as f:
-                            fixed_content = f.read()
-                        records, failed_items = parse_fixed_content(fixed_content)
-                        all_records.extend(records)
-                        all_failed_items.extend(failed_items)
-                        console.print(f"  🔄 恢复已处理块 {chunk_idx + 1}")
-                    except Exception as e:
-                        print_warning(f"恢复块 {chunk_idx + 1} 失败: {e}")
-        
-        # 处理未完成的块
-        start_time = time.time()
-        completed_chunks = len(processed_chunks)
-        total_chunks = len(chunks)
-        
-        for i, chunk in enumerate(chunks):
-            # 如果块已经处理过，跳过
-            if i in processed_chunks:
-                continue
-                
-            try:
-                # 计算剩余时间
-                if completed_chunks > 0:
-                    elapsed_time = time.time() - start_time
-                    avg_time_per_chunk = elapsed_time / completed_chunks
-                    remaining_chunks = total_chunks - completed_chunks
-                    estimated_remaining_time = avg_time_per_chunk * remaining_chunks
-                else:
-                    estimated_remaining_time = 0
-                    
-                # 显示实时统计信息
-                stats_text = f"[cyan]已处理: {completed_chunks}/{total_chunks} 块, "
-                stats_text += f"剩余: {total_chunks - completed_chunks} 块, "
-                stats_text += f"预计剩余时间: {estimated_remaining_time:.1f} 秒[/cyan]"
-                console.print(stats_text)
-                
-                # 显示当前块大小
-                chunk_size_bytes = len(chunk.encode('utf-8'))
-                console.print(f"  📦 块 {i+1} 大小: {chunk_size_bytes} 字节")
-                
-                # 调用AI API处理
-                fixed_content, _ = call_qwen_api(chunk, api_key, model, available_models, is_error_processing=False)
-                if fixed_content is None:
-                    print_error(f"AI处理块 {i+1} 失败")
+        journal = EntryJournal(os.path.join(ai_subdir, JOURNAL_NAME))
+        try:
+            # 断点恢复与增量处理：只发送日志中没有的条目（内容相同的条目只发一次）
+            items = []
+            queued = set()
+            for key, entry in zip(keys, entries):
+                if key not in journal and key not in queued:
+                    queued.add(key)
+                    items.append((key, entry))
+            console.print(f"  🔪 共 {len(entries)} 个条目，日志中已有 {len(entries) - len(items)} 个，待处理 {len(items)} 个")
+            
+            # 本地预解析：高置信的条目直接写入日志，只把剩下的发给LLM
+            pending = len(items)
+            local_seconds = 0.0
+            if AI_LOCAL_PARSE and items:
+                local_start = time.time()
+                residue = []
+                for key, entry in items:
+                    records = parse_entry(entry)
+                    if records is None:
+                        residue.append((key, entry))
+                    else:
+                        journal.put(key, records)
+                items = residue
+                local_seconds = time.time() - local_start
+            
+            llm_seconds = 0.0
+            if report:
+                report(0, len(items))
+            if items:
+                llm_start = time.time()
+                prefix = token_prefix([entry for _, entry in items], model)
+                if not process_chunks(items, prefix, journal, api_key, model, available_models, concurrency,
+                                      slots, report):
                     return False
-                
-                # 显示AI返回内容的前200个字符用于调试
-                preview_content = fixed_content[:200] + ("..." if len(fixed_content) > 200 else "")
-                console.print(f"  🧾 AI返回内容预览: {preview_content}")
-                
-                # 保存AI输出到文件
-                chunk_output_path = os.path.join(ai_subdir, f"chunk_{i+1}.txt")
-                with open(chunk_output_path, 'w', encoding='utf-8') as f:
-                    f.write(fixed_content)
-                
-                # 显示AI输出大小
-                output_size = len(fixed_content.encode('utf-8'))
-                console.print(f"  💾 保存块 {i+1} 输出到: {chunk_output_path} ({output_size} 字节)")
-                
-                # 解析处理结果
-                records, failed_items = parse_fixed_content(fixed_content)
-                all_records.extend(records)
-                all_failed_items.extend(failed_items)
-                
-                completed_chunks += 1
-                
-                # 防止API限流
-                time.sleep(0.5)
-                
-            except Exception as e:
-                print_error(f"处理块 {i+1} 失败: {e}")
-                # 打印完整的traceback以便调试
-                import traceback
-                traceback.print_exc()
-                return False
+                llm_seconds = time.time() - llm_start
+            if AI_LOCAL_PARSE and pending:
+                report_local_parse(subdir, pending, pending - len(items), local_seconds, llm_seconds, len(items))
+            
+            # 按源文件中的条目顺序合并，并去掉日志中已不在源文件里的条目
+            merged_lines = [line for key in keys for line in journal.get(key)]
+            journal.compact(keys)
+        finally:
+            journal.close()
+        
+        all_records, all_failed_items = parse_fixed_content('\n'.join(merged_lines))
         
         # 处理失败项
         if all_failed_items:
-            error_records = process_failed_items(all_failed_items, api_key, model, available_models, ai_subdir)
+            error_records = process_failed_items(all_failed_items, api_key, model, available_models, ai_subdir,
+                                                   concurrency, slots)
             all_records.extend(error_records)
         
         # 保存合并后的结果
@@ -584,7 +900,7 @@ def process_single_letter(subdir, txt_file, ai_output_dir, api_key, model, avail
         traceback.print_exc()
         return False
 
-def batch_process_ai(result_dir='result', ai_output_dir='ai', api_key=None, model="Qwen/QwQ-32B", available_models=None, selected_letters=None):
+def batch_process_ai(result_dir='result', ai_output_dir='ai', api_key=None, model="Qwen/QwQ-32B", available_models=None, selected_letters=None, concurrency=AI_CONCURRENCY):
     """批量处理result目录下的文件，AI处理结果保存到ai目录"""
     if not api_key:
         print_error("未提供API密钥")
@@ -649,53 +965,89 @@ def batch_process_ai(result_dir='result', ai_output_dir='ai', api_key=None, mode
     console.print(table)
     console.print(f"[bold]总计: {len(valid_subdirs)} 个字母, {total_size} 字节[/bold]")
     console.print(f"[bold]使用模型: {model}[/bold]")
+    console.print(f"[bold]并发请求数: {concurrency}，每模型限流: {SILICONFLOW_RPM} RPM / {SILICONFLOW_TPM} TPM[/bold]")
+    
+    # 并发处理各字母目录：所有字母共享concurrency个在途请求名额
+    slots = threading.BoundedSemaphore(max(1, concurrency))
+    letter_workers = max(1, min(AI_LETTER_CONCURRENCY, len(valid_subdirs)))
+    console.print(f"[bold]同时处理字母数: {letter_workers}[/bold]")
+    failed_letters = []
     
-    # 处理每个字母目录
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
         BarColumn(),
+        MofNCompleteColumn(),
         TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
+        console=console,
         expand=True,
         refresh_per_second=10
     ) as progress:
-        # 主进度条 - 字母处理进度
+        # 主进度条 - 字母处理进度；每个字母一个进度条 - 待处理条目进度
         main_task = progress.add_task("总进度", total=len(valid_subdirs))
+        letter_tasks = {subdir: progress.add_task(f"  {subdir} 等待", total=None) for subdir in valid_subdirs}
         
-        for subdir_idx, subdir in enumerate(valid_subdirs):
-            subdir_path = os.path.join(result_dir, subdir)
-            txt_file = os.path.join(subdir_path, f'{subdir}.txt')
-            
-            # 更新主进度条描述
-            progress.update(main_task, description=f"处理 {subdir} ({subdir_idx+1}/{len(valid_subdirs)})")
+        def run_letter(subdir, attempt):
+            task = letter_tasks[subdir]
+            retry_text = f" (第 {attempt + 1}/{MAX_LETTER_ATTEMPTS} 次)" if attempt else ""
+            progress.update(task, description=f"  {subdir} 处理中{retry_text}")
             
-            # 标记首字母是否处理成功
-            letter_processed_successfully = False
-            max_letter_attempts = 3
+            def report(done, total):
+                progress.update(task, completed=done, total=max(total, 1) if total or done else 1)
             
-            for letter_attempt in range(max_letter_attempts):
-                # 处理单个字母
-                result = process_single_letter(subdir, txt_file, ai_output_dir, api_key, model, available_models)
+            txt_file = os.path.join(result_dir, subdir, f'{subdir}.txt')
+            with bind(letter=subdir):
+                return process_single_letter(subdir, txt_file, ai_output_dir, api_key, model, available_models,
+                                             concurrency, slots, report)
+        
+        retries = []  # (到期时间, 字母, 第几次尝试)
+        with ThreadPoolExecutor(max_workers=letter_workers) as executor:
+            futures = {executor.submit(run_letter, subdir, 0): (subdir, 0) for subdir in valid_subdirs}
+            while futures or retries:
+                # 到期的重试重新提交，等待期间不占用工作线程
+                now = time.monotonic()
+                while retries and retries[0][0] <= now:
+                    _, subdir, attempt = heapq.heappop(retries)
+                    futures[executor.submit(run_letter, subdir, attempt)] = (subdir, attempt)
+                timeout = max(0.0, retries[0][0] - now) if retries else None
+                if not futures:
+                    time.sleep(timeout)
+                    continue
                 
-                if result:  # 成功处理
-                    letter_processed_successfully = True
-                    break
-                else:
-                    # 处理失败，需要重新尝试
-                    if letter_attempt < max_letter_attempts - 1:
-                        print_warning(f"首字母 {subdir} 处理失败，等待15秒后重新尝试 (第 {letter_attempt + 2}/{max_letter_attempts} 次)...")
-                        time.sleep(15)
-                        continue
+                done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    subdir, attempt = futures.pop(future)
+                    task = letter_tasks[subdir]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print_error(f"处理 {subdir} 失败: {e}")
+                        result = False
+                    
+                    if result:  # 成功处理
+                        progress.update(task, description=f"  {subdir} ✅ 完成")
+                        progress.advance(main_task)
+                    elif attempt < MAX_LETTER_ATTEMPTS - 1:
+                        # 处理失败，在后台等待后重新尝试，不阻塞其他字母
+                        print_warning(f"首字母 {subdir} 处理失败，{LETTER_RETRY_DELAY}秒后重新尝试 (第 {attempt + 2}/{MAX_LETTER_ATTEMPTS} 次)...")
+                        progress.update(task, description=f"  {subdir} ⏳ 等待重试")
+                        heapq.heappush(retries, (time.monotonic() + LETTER_RETRY_DELAY, subdir, attempt + 1))
                     else:
-                        print_error(f"首字母 {subdir} 处理失败，已尝试 {max_letter_attempts} 次，跳过处理")
-            
-            # 更新主进度条
-            progress.advance(main_task)
-            
-            # 确保有适当的延迟，避免API限流
-            time.sleep(2)
+                        print_error(f"首字母 {subdir} 处理失败，已尝试 {MAX_LETTER_ATTEMPTS} 次，跳过处理")
+                        progress.update(task, description=f"  {subdir} ❌ 失败")
+                        progress.advance(main_task)
+                        failed_letters.append(subdir)
     
+    if failed_letters:
+        print_warning(f"以下字母处理失败: {', '.join(sorted(failed_letters))}")
     print_success(f"AI处理完成，结果保存至: {ai_output_dir}")
+    console.print(get_cache().summary())
+    console.print(get_router().summary())
+    console.print(llm_client.timing_summary())
+    console.print(usage_summary())
+    console.print(run_summary())
+    if AI_JSON_MODE:
+        console.print(json_summary())
     return True
 
 def parse_letter_selection(selection_str, available_letters):
@@ -756,6 +1108,9 @@ def main():
     default_model = available_models[0]
     model = Prompt.ask("请输入模型名称", default=default_model)
     
+    # 获取并发请求数
+    concurrency = int(Prompt.ask("请输入并发请求数", default=str(AI_CONCURRENCY)))
+    
     # 获取所有可用字母
     if os.path.exists(result_dir):
         subdirs = [d for d in os.listdir(result_dir) if os.path.isdir(os.path.join(result_dir, d))]
@@ -786,7 +1141,7 @@ def main():
         return
     
     # 执行AI处理
-    batch_process_ai(result_dir, ai_output_dir, api_key, model, available_models, selected_letters)
+    batch_process_ai(result_dir, ai_output_dir, api_key, model, available_models, selected_letters, concurrency)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
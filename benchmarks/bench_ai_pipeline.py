@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+AI处理流水线离线基准：在本地启动 mock_llm_server，把 ai_processor.batch_process_ai 指向它，
+统计墙钟时间、请求数、注入的错误与截断，用于比较并发、重试、续传与缓存等改动
+用法：python benchmarks/bench_ai_pipeline.py --letters 4 --lines 800 --latency lognormal:-0.7,0.5 --errors 429=0.03,503=0.02 --truncate 0.05
+第二轮及以后的运行复用第一轮的日志与缓存（--runs 2 可观察增量处理的效果），--fresh 每轮清空
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_chunker import make_text
+from mock_llm_server import add_arguments, config_from_args, start_server
+
+
+def prepare_letters(workdir, letters, lines, inputs):
+    """在workdir/result下准备各字母的单词表：指定--input时依次使用这些文件，否则生成模拟数据"""
+    names = [chr(ord('a') + i) for i in range(letters)]
+    for i, letter in enumerate(names):
+        if inputs:
+            with open(inputs[i % len(inputs)], 'r', encoding='utf-8') as f:
+                text = f.read()
+        else:
+            text = make_text(lines, seed=i)
+        os.makedirs(os.path.join(workdir, 'result', letter), exist_ok=True)
+        with open(os.path.join(workdir, 'result', letter, f'{letter}.txt'), 'w', encoding='utf-8') as f:
+            f.write(text)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI处理流水线离线基准')
+    parser.add_argument('--input', nargs='*', default=[], help='单词表txt（不指定时生成模拟数据）')
+    parser.add_argument('--letters', type=int, default=3, help='字母数')
+    parser.add_argument('--lines', type=int, default=500, help='每个字母的模拟条目数')
+    parser.add_argument('--concurrency', type=int, default=4, help='所有字母合计的在途请求数')
+    parser.add_argument('--letter-concurrency', type=int, default=3, help='同时处理的字母数')
+    parser.add_argument('--runs', type=int, default=1, help='运行轮数')
+    parser.add_argument('--fresh', action='store_true', help='每轮清空日志与缓存')
+    parser.add_argument('--no-stream', action='store_true', help='使用一次性返回的请求方式')
+    parser.add_argument('--no-local-parse', action='store_true', help='关闭本地预解析')
+    parser.add_argument('--json', action='store_true', help='使用JSON输出模式（AI_JSON_MODE=1）')
+    parser.add_argument('--workdir', help='工作目录（默认使用临时目录，结束后删除）')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    inputs = [os.path.abspath(path) for path in args.input]
+    workdir = os.path.abspath(args.workdir) if args.workdir else tempfile.mkdtemp(prefix='bench_ai_')
+    os.makedirs(workdir, exist_ok=True)
+    server = start_server(config_from_args(args))
+    url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    # ai_processor在导入时读取这些设置，并把日志写到当前目录
+    os.environ.update({
+        'LLM_BASE_URL': url,
+        'LLM_CACHE_PATH': os.path.join(workdir, 'llm_cache.db'),
+        'MODEL_HEALTH_CACHE': os.path.join(workdir, 'model_health.json'),
+        'AI_LETTER_CONCURRENCY': str(args.letter_concurrency),
+        'AI_STREAM': '0' if args.no_stream else '1',
+        'AI_LOCAL_PARSE': '0' if args.no_local_parse else '1',
+        'AI_JSON_MODE': '1' if args.json else '0',
+    })
+    os.environ.setdefault('SILICONFLOW_RPM', '100000')
+    os.environ.setdefault('SILICONFLOW_TPM', '100000000')
+    os.chdir(workdir)
+    import ai_processor
+    from llm_cache import get_cache
+
+    letters = prepare_letters(workdir, args.letters, args.lines, inputs)
+    available_models = ai_processor.get_available_models('mock', refresh=True)
+    results = []
+    try:
+        for run in range(args.runs):
+            if args.fresh and run:
+                shutil.rmtree(os.path.join(workdir, 'ai'), ignore_errors=True)
+                get_cache().clear()
+            before = dict(server.stats, errors=dict(server.stats['errors']))
+            start = time.perf_counter()
+            ai_processor.batch_process_ai('result', 'ai', 'mock', available_models[0], available_models,
+                                          concurrency=args.concurrency)
+            elapsed = time.perf_counter() - start
+            records = 0
+            for letter in letters:
+                path = os.path.join(workdir, 'ai', letter, f'{letter}.txt')
+                if os.path.exists(path):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        records += sum(1 for line in f if line.startswith('|'))
+            errors = sum(server.stats['errors'].values()) - sum(before['errors'].values())
+            results.append((run + 1, elapsed, server.stats['requests'] - before['requests'],
+                            server.stats['truncated'] - before['truncated'], errors, records))
+    finally:
+        server.shutdown()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n模拟服务: 延迟 {args.latency}, 错误率 {args.errors or '无'}, 截断比例 {args.truncate}, "
+          f"缺陷记录比例 {args.malformed}")
+    print(f"{args.letters} 个字母, 在途请求 {args.concurrency}, 同时处理字母 {args.letter_concurrency}, "
+          f"{'一次性返回' if args.no_stream else '流式'}{', JSON输出' if args.json else ''}")
+    print(f"{'轮次':>4} {'耗时(s)':>9} {'请求数':>7} {'截断':>5} {'错误':>5} {'记录数':>7}")
+    for run, elapsed, requests, truncated, errors, records in results:
+        print(f"{run:>4} {elapsed:>9.2f} {requests:>7} {truncated:>5} {errors:>5} {records:>7}")
+
+
+if __name__ == '__main__':
+    main()
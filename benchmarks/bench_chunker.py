@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+切块基准：原 split_file_by_size（按2KB字节切分）与按条目、按token预算切块的对比
+用法：python benchmarks/bench_chunker.py --input txt/h/h.txt --repeat 200
+统计切块耗时、块数，以及被切到两个块里的多行条目数（这些条目会以“字段不足”失败后重试）。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from entry_chunker import chunk_text, split_entries, estimate_tokens
+
+
+def reference_split_by_size(content, chunk_size=2*1024):
+    """原 ai_processor.split_file_by_size 的切分逻辑（每加一行都重新编码整块）"""
+    if len(content.encode('utf-8')) <= chunk_size:
+        return [content]
+    chunks = []
+    current_chunk = ""
+    for line in content.splitlines(True):
+        test_chunk = current_chunk + line
+        if len(test_chunk.encode('utf-8')) > chunk_size and current_chunk:
+            chunks.append(current_chunk)
+            current_chunk = line
+        else:
+            current_chunk += line
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def make_text(lines, seed=0):
+    """生成模拟单词表：约1/6的条目带续行（中文释义或未闭合括号折到下一行）"""
+    rng = random.Random(seed)
+    out = []
+    for i in range(lines):
+        word = ''.join(rng.choice('abcdefghijklmnop') for _ in range(rng.randint(3, 10)))
+        zh = ''.join(chr(0x4e00 + rng.randint(0, 3000)) for _ in range(rng.randint(2, 8)))
+        kind = rng.random()
+        if kind < 0.08:
+            out.append(f"{word} n. {zh}（详见\n{word}s ）\n")
+        elif kind < 0.16:
+            out.append(f"{word} /'{word}/ vt.\n{zh}；{zh}\n")
+        else:
+            out.append(f"{word} n. {zh}\n")
+    return ''.join(out)
+
+
+def split_entry_count(chunks, text):
+    """统计块边界落在条目中间的次数"""
+    entry_ends = set(itertools.accumulate(len(entry) for entry in split_entries(text.splitlines(True))))
+    chunk_ends = list(itertools.accumulate(len(chunk) for chunk in chunks))[:-1]
+    return sum(1 for end in chunk_ends if end not in entry_ends)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='切块基准')
+    parser.add_argument('--input', help='单词表txt（不指定时生成模拟数据）')
+    parser.add_argument('--repeat', type=int, default=1, help='把输入重复多少次')
+    parser.add_argument('--lines', type=int, default=50000, help='模拟数据的条目数')
+    parser.add_argument('--model', default='Qwen/Qwen2.5-7B-Instruct', help='估算token使用的模型')
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            text = f.read() * args.repeat
+    else:
+        text = make_text(args.lines) * args.repeat
+    print(f"输入: {len(text.encode('utf-8')) / 1e6:.1f} MB, {text.count(chr(10))} 行")
+
+    for name, func in (('按2KB字节', lambda: reference_split_by_size(text)),
+                       ('按条目/token', lambda: chunk_text(text, args.model))):
+        start = time.perf_counter()
+        chunks = func()
+        elapsed = time.perf_counter() - start
+        assert ''.join(chunks) == text
+        tokens = [estimate_tokens(chunk, args.model) for chunk in chunks]
+        print(f"{name:>10}: 耗时 {elapsed:.3f} 秒, {len(chunks)} 块, 平均 {sum(tokens) / len(tokens):.0f} token/块, "
+              f"被拆开的条目 {split_entry_count(chunks, text)} 个")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+读取基准：从 words.xlsx 与 Parquet / Arrow IPC 分区目录加载全部词汇的耗时对比（26个字母）
+用法：python benchmarks/bench_columnar_read.py --rows 20000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_excel_export import make_tables
+from txt_to_excel_and_db import export_to_excel, export_to_columnar, load_columnar
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def read_excel(path):
+    sheets = pd.read_excel(path, sheet_name=None, keep_default_na=False)
+    return pd.concat(sheets, names=['letter']).reset_index(level=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列式格式读取基准')
+    parser.add_argument('--rows', type=int, default=20000, help='每个字母的行数')
+    args = parser.parse_args()
+
+    tables = make_tables(args.rows)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        excel_path = os.path.join(tmp_dir, 'words.xlsx')
+        export_to_excel(tables, excel_path)
+        outputs = {'xlsx': (excel_path, os.path.getsize(excel_path))}
+        for file_format in ('parquet', 'arrow'):
+            output_dir = os.path.join(tmp_dir, file_format)
+            _, elapsed = timed(export_to_columnar, tables, output_dir, file_format)
+            outputs[file_format] = (output_dir, dir_size(output_dir))
+            print(f"{file_format} 写入耗时 {elapsed:.2f} 秒")
+
+        print(f"26个字母 × {args.rows} 行")
+        excel_df, excel_time = timed(read_excel, excel_path)
+        print(f"   xlsx: 读取 {excel_time:.3f} 秒, 文件 {outputs['xlsx'][1] / 1e6:.1f} MB")
+        for file_format in ('parquet', 'arrow'):
+            output_dir, size = outputs[file_format]
+            df, elapsed = timed(load_columnar, output_dir, file_format)
+            assert len(df) == len(excel_df), f'{file_format} 行数与xlsx不一致'
+            print(f"{file_format:>7}: 读取 {elapsed:.3f} 秒, 文件 {size / 1e6:.1f} MB, "
+                  f"比xlsx快 {excel_time / elapsed:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Excel导出基准：pandas ExcelWriter 与 constant_memory 流式写入对比（26个sheet）
+用法：python benchmarks/bench_excel_export.py --rows 20000
+每种方式在独立子进程中运行，分别统计耗时与峰值RSS。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import resource
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_tables(rows_per_sheet, seed=0):
+    """生成26个字母、每个rows_per_sheet行的模拟记录"""
+    rng = random.Random(seed)
+    pos_list = ['n.', 'vt.', 'adj.', '']
+    tables = {}
+    for letter in 'abcdefghijklmnopqrstuvwxyz':
+        records = []
+        for i in range(rows_per_sheet):
+            words = [letter + ''.join(rng.choice('abcdefghij') for _ in range(rng.randint(2, 9)))
+                     for _ in range(rng.choice((1, 1, 1, 2, 4)))]
+            records.append({
+                'english': ' '.join(words),
+                'pos': rng.choice(pos_list),
+                'chinese': ''.join(chr(0x4e00 + rng.randint(0, 3000)) for _ in range(rng.randint(2, 10))),
+            })
+        tables[letter] = records
+    return tables
+
+
+def run_mode(mode, rows, output_path):
+    import pandas as pd
+    from txt_to_excel_and_db import enhance_records, export_to_excel
+    tables = make_tables(rows)
+    start = time.perf_counter()
+    if mode == 'pandas':
+        with pd.ExcelWriter(output_path) as writer:
+            for table_name, records in tables.items():
+                df = pd.DataFrame(enhance_records(records, table_letter=table_name))
+                df.to_excel(writer, sheet_name=table_name, index=False)
+    else:
+        export_to_excel(tables, output_path)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"RESULT {mode} {elapsed:.2f} {peak_mb:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Excel导出基准')
+    parser.add_argument('--rows', type=int, default=20000, help='每个sheet的行数')
+    parser.add_argument('--mode', choices=['pandas', 'stream'], help='内部使用：只运行一种方式')
+    parser.add_argument('--output', help='内部使用：输出文件')
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.rows, args.output)
+        return
+
+    print(f"26个sheet × {args.rows} 行")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in ('pandas', 'stream'):
+            output = os.path.join(tmp_dir, f'{mode}.xlsx')
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--rows', str(args.rows),
+                                   '--mode', mode, '--output', output],
+                                  capture_output=True, text=True, check=True)
+            line = [l for l in proc.stdout.splitlines() if l.startswith('RESULT')][-1]
+            _, _, elapsed, peak_mb = line.split()
+            print(f"{mode:>7}: 耗时 {elapsed} 秒, 峰值RSS {peak_mb} MB, 文件 {os.path.getsize(output) / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+列式计算基准：增强记录（逐行字典 / Excel行）与 process_txt_file 的逐行循环版本与列式版本对比
+用法：python benchmarks/bench_vectorized.py --records 200000
+两种实现的输出先做逐字节一致性检查，再比较吞吐量。
+逐行字典在本机上列式计算后再拼回字典只有0.6-0.8x，因此enhance_records保留逐条循环，列式计算只用于Excel/Parquet导出。
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from txt_to_excel_and_db import (ENHANCED_COLUMNS, detect_type, enhance_records, iter_enhanced_rows,
+                                 process_txt_file)
+
+
+def reference_enhance_records(records, table_letter=None):
+    """原逐条循环实现"""
+    result = []
+    for idx, rec in enumerate(records, 1):
+        eng = rec.get('english', '') or ''
+        zh = rec.get('chinese', '') or ''
+        pro = rec.get('pos', '') or ''
+        if '.' in eng:
+            typ = 1
+        else:
+            words = eng.split()
+            if len(words) == 1:
+                typ = 0
+            elif len(words) > 1:
+                typ = -1
+            else:
+                typ = 0
+        en_clean = eng.strip()
+        promt = ''
+        if typ in (-1, 1) and table_letter:
+            found = [w for w in en_clean.split() if w.lower().startswith(table_letter.lower())]
+            promt = ','.join(found)
+        result.append({'index': idx, 'en': en_clean, 'zh': zh, 'promt': promt,
+                       'num': 0, 'type': typ, 'pro': pro})
+    return result
+
+
+def reference_process_txt_file(txt_path):
+    """原逐行apply + 显式循环传播last_word的实现"""
+    data = []
+    with open(txt_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if '\t' in line:
+                zh, en = line.split('\t', 1)
+            else:
+                zh, en = '', line
+            data.append({'zh': zh, 'en': en})
+    df = pd.DataFrame(data)
+    if df.empty:
+        return df
+    df['Type'] = df['en'].apply(detect_type)
+    df['index'] = range(1, len(df)+1)
+    df['Num'] = 0
+    last_word = ''
+    zh_list = df['zh'].tolist()
+    en_list = df['en'].tolist()
+    type_list = df['Type'].tolist()
+    for i in range(len(df)):
+        if type_list[i] == 0:
+            last_word = en_list[i].strip()
+        elif type_list[i] in (-1, 1) and last_word:
+            zh_list[i] = zh_list[i] + f'（{last_word}）'
+    df['zh'] = zh_list
+    return df[['index', 'zh', 'en', 'Type', 'Num']]
+
+
+def make_english(rng, letter):
+    kind = rng.random()
+    words = [rng.choice((letter, letter.upper(), 'x')) + ''.join(rng.choice('abcdefghij') for _ in range(rng.randint(1, 8)))
+             for _ in range(rng.choice((1, 1, 1, 2, 3, 6)))]
+    separator = rng.choice((' ', ' ', '  ', '　', '\xa0', '\t'))
+    text = separator.join(words)
+    if kind < 0.15:
+        text += '.'
+    elif kind < 0.2:
+        text = ' ' + text + ' '
+    elif kind < 0.22:
+        text = ''
+    return text
+
+
+def make_records(count, letter='a', seed=0):
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        records.append({
+            'english': rng.choice((make_english(rng, letter), make_english(rng, letter), None)),
+            'pos': rng.choice(('n.', 'vt.', 'adj.', '', None)),
+            'chinese': ''.join(chr(0x4e00 + rng.randint(0, 3000)) for _ in range(rng.randint(0, 8))),
+        })
+    return records
+
+
+def write_txt(path, count, seed=0):
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for _ in range(count):
+            zh = ''.join(chr(0x4e00 + rng.randint(0, 3000)) for _ in range(rng.randint(1, 6)))
+            en = make_english(rng, 'a') or 'abc'
+            choice = rng.random()
+            if choice < 0.05:
+                f.write('\n')
+            elif choice < 0.1:
+                f.write(f'  {en}\r\n')
+            else:
+                f.write(f'{zh}\t{en}\n')
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def report(name, count, loop_time, vector_time):
+    print(f"{name}: 循环 {count / loop_time:,.0f} 条/秒, 列式 {count / vector_time:,.0f} 条/秒, "
+          f"提速 {loop_time / vector_time:.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='列式计算基准')
+    parser.add_argument('--records', type=int, default=200000, help='记录数(默认: 200000)')
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    expected, loop_time = timed(reference_enhance_records, records, table_letter='a')
+    assert repr(expected) == repr(enhance_records(records, table_letter='a')), 'enhance_records 输出不一致'
+    actual, vector_time = timed(lambda: [dict(zip(ENHANCED_COLUMNS, row))
+                                         for row in iter_enhanced_rows(records, table_letter='a')])
+    assert repr(expected) == repr(actual), '逐行字典输出不一致'
+    report('逐行字典', args.records, loop_time, vector_time)
+
+    # Excel导出路径：原先由增强字典再取出各列，现在直接产出列顺序元组
+    expected, loop_time = timed(lambda: [[row[k] for k in ENHANCED_COLUMNS]
+                                         for row in reference_enhance_records(records, table_letter='a')])
+    actual, vector_time = timed(lambda: [list(row) for row in iter_enhanced_rows(records, table_letter='a')])
+    assert repr(expected) == repr(actual), 'Excel行输出不一致'
+    report('Excel行', args.records, loop_time, vector_time)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        txt_path = os.path.join(tmp_dir, 'a.txt')
+        write_txt(txt_path, args.records)
+        expected, loop_time = timed(reference_process_txt_file, txt_path)
+        actual, vector_time = timed(process_txt_file, txt_path)
+    assert expected.to_csv(index=False) == actual.to_csv(index=False), 'process_txt_file 输出不一致'
+    assert expected.dtypes.astype(str).tolist() == actual.dtypes.astype(str).tolist(), 'process_txt_file 列类型不一致'
+    report('process_txt_file', len(expected), loop_time, vector_time)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+中文释义二元组倒排索引 - 存放在同一个SQLite库中，支持入库时增量建立
+索引表 chinese_bigram(gram, sense_id)，sense_id 为 senses.id（vocabulary_view 的 id）
+用法：
+    python chinese_index.py rebuild --db vocab.db
+    python chinese_index.py search --db vocab.db --term 注意到
+"""
+import os
+import re
+import sqlite3
+import argparse
+
+INDEX_TABLE = 'chinese_bigram'
+
+_CJK_RUN_RE = re.compile(r'[\u4e00-\u9fff]+')
+
+
+def chinese_grams(text):
+    """提取中文二元组；每段连续汉字的末字另记为单字，保证单字查询也能命中"""
+    grams = set()
+    if not text:
+        return grams
+    for run in _CJK_RUN_RE.findall(text):
+        for i in range(len(run) - 1):
+            grams.add(run[i:i + 2])
+        grams.add(run[-1])
+    return grams
+
+
+def init_chinese_index(conn):
+    """创建倒排索引表（WITHOUT ROWID，按gram聚簇存放）
+
+    旧版索引表的列名为entry_id（实际存的也是senses.id），发现时删除重建为空表并返回True，由调用方重建索引
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({INDEX_TABLE})")}
+    migrated = 'entry_id' in columns
+    if migrated:
+        conn.execute(f"DROP TABLE {INDEX_TABLE}")
+    conn.execute(f'''CREATE TABLE IF NOT EXISTS {INDEX_TABLE} (
+                        gram TEXT NOT NULL,
+                        sense_id INTEGER NOT NULL,
+                        PRIMARY KEY (gram, sense_id)
+                    ) WITHOUT ROWID''')
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{INDEX_TABLE}_sense ON {INDEX_TABLE} (sense_id)")
+    return migrated
+
+
+def index_chinese(conn, senses):
+    """增量索引 [(sense_id, chinese)]，返回写入的gram数"""
+    rows = [(gram, sense_id) for sense_id, chinese in senses for gram in chinese_grams(chinese)]
+    if rows:
+        conn.executemany(f"INSERT OR IGNORE INTO {INDEX_TABLE} (gram, sense_id) VALUES (?, ?)", rows)
+    return len(rows)
+
+
+def rebuild_chinese_index(conn, table='senses', id_column='id', text_column='chinese'):
+    """清空并根据表中全部释义重建索引"""
+    init_chinese_index(conn)
+    conn.execute(f"DELETE FROM {INDEX_TABLE}")
+    cursor = conn.execute(f"SELECT {id_column}, {text_column} FROM {table}")
+    total = 0
+    while True:
+        batch = cursor.fetchmany(5000)
+        if not batch:
+            break
+        total += index_chinese(conn, batch)
+    conn.commit()
+    return total
+
+
+def ensure_chinese_index(conn, table='senses', id_column='id', text_column='chinese'):
+    """旧库没有索引时补建"""
+    init_chinese_index(conn)
+    has_index = conn.execute(f"SELECT 1 FROM {INDEX_TABLE} LIMIT 1").fetchone()
+    has_rows = conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone()
+    if has_rows and not has_index:
+        rebuild_chinese_index(conn, table, id_column, text_column)
+
+
+def search_chinese(conn, query, limit=50, table='senses', id_column='id', text_column='chinese'):
+    """按命中的二元组数排序（同分时释义越短越靠前），返回[(sense_id, 命中数, 查询gram总数)]"""
+    grams = {gram for gram in chinese_grams(query) if len(gram) == 2}
+    if grams:
+        placeholders = ','.join('?' * len(grams))
+        rows = conn.execute(
+            f"""SELECT g.sense_id, COUNT(*) AS score FROM {INDEX_TABLE} g
+                JOIN {table} t ON t.{id_column} = g.sense_id
+                WHERE g.gram IN ({placeholders})
+                GROUP BY g.sense_id
+                ORDER BY score DESC, LENGTH(t.{text_column}), g.sense_id LIMIT ?""",
+            (*grams, limit)).fetchall()
+        return [(sense_id, score, len(grams)) for sense_id, score in rows]
+    chars = _CJK_RUN_RE.findall(query or '')
+    if not chars:
+        return []
+    # 单字查询：以该字开头的gram做范围扫描
+    char = chars[0][0]
+    rows = conn.execute(
+        f"""SELECT g.sense_id FROM {INDEX_TABLE} g
+            JOIN {table} t ON t.{id_column} = g.sense_id
+            WHERE g.gram >= ? AND g.gram < ?
+            GROUP BY g.sense_id
+            ORDER BY LENGTH(t.{text_column}), g.sense_id LIMIT ?""",
+        (char, chr(ord(char) + 1), limit)).fetchall()
+    return [(sense_id, 1, 1) for (sense_id,) in rows]
+
+
+if __name__ == '__main__':
+    import time
+    parser = argparse.ArgumentParser(description='中文释义二元组倒排索引')
+    parser.add_argument('command', choices=['rebuild', 'search'], help='命令: rebuild-重建索引, search-中文查询')
+    parser.add_argument('--db', default='vocab.db', help='统一词汇库路径(默认: vocab.db)')
+    parser.add_argument('--term', help='中文查询词(用于search命令)')
+    parser.add_argument('--limit', type=int, default=20, help='返回候选数量')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件 '{args.db}' 不存在")
+        exit(1)
+
+    conn = sqlite3.connect(args.db)
+    if args.command == 'rebuild':
+        start = time.time()
+        total = rebuild_chinese_index(conn)
+        print(f"已写入 {total} 个二元组，用时 {time.time() - start:.2f} 秒")
+    else:
+        if not args.term:
+            print("错误: 请使用 --term 指定查询词")
+            exit(1)
+        ensure_chinese_index(conn)
+        start = time.perf_counter()
+        hits = search_chinese(conn, args.term, args.limit)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for sense_id, score, total in hits:
+            row = conn.execute("SELECT english, pos, chinese FROM vocabulary_view WHERE id = ?", (sense_id,)).fetchone()
+            if row:
+                print(f"{row[0]} ({row[1]}) - {row[2]}  [{score}/{total}]")
+        print(f"查询用时 {elapsed_ms:.3f} 毫秒")
+    conn.close()
@@ -5,12 +5,12 @@
 """
 
 import os
-import sqlite3
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, BarColumn, TextColumn
 from rich.prompt import Prompt, Confirm
 from rich.table import Table
 from rich.panel import Panel
+from vocab_store import init_store, upsert_records
 
 console = Console()
 
@@ -62,53 +62,10 @@ def parse_ai_output_file(file_path):
     
     return records
 
-def create_database(db_path, table_name):
-    """创建数据库和表"""
+def insert_records_to_db(db_path, letter, records, source):
+    """将记录批量写入统一词汇库，覆盖该来源在该字母下的旧数据"""
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # 创建表，使用与txt_to_excel_and_db.py相同的结构，但不包含index
-        table_structure = [
-            'en TEXT',
-            'zh TEXT',
-            'promt TEXT',
-            'num INTEGER DEFAULT 0',
-            'type INTEGER',
-            'pro TEXT'
-        ]
-        create_table_sql = f"CREATE TABLE IF NOT EXISTS {table_name} (id INTEGER PRIMARY KEY AUTOINCREMENT, {', '.join(table_structure)})"
-        cursor.execute(create_table_sql)
-        
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        print_error(f"创建数据库失败: {e}")
-        return False
-
-def insert_records_to_db(db_path, table_name, records):
-    """将记录插入数据库"""
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # 插入数据，不包含index字段
-        for record in records:
-            cursor.execute(f"""
-                INSERT INTO {table_name} (en, zh, promt, num, type, pro)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                record.get('en', ''),
-                record.get('zh', ''),
-                record.get('promt', None),
-                0,  # num
-                record.get('type', 0),
-                record.get('pro', None)
-            ))
-        
-        conn.commit()
-        conn.close()
+        upsert_records(db_path, records, source, kind='ai', letter=letter, replace=True)
         return True
     except Exception as e:
         print_error(f"插入数据库记录失败: {e}")
@@ -122,8 +79,10 @@ def batch_extract_db(ai_output_dir='ai', db_path='words_ai.db'):
         return False
     
     # 创建数据库
-    db_name = os.path.splitext(os.path.basename(db_path))[0]
-    if not create_database(db_path, db_name):
+    try:
+        init_store(db_path)
+    except Exception as e:
+        print_error(f"创建数据库失败: {e}")
         return False
     
     print_step_header(1, "数据库提取", f"从目录提取: {ai_output_dir}")
@@ -190,18 +149,12 @@ def batch_extract_db(ai_output_dir='ai', db_path='words_ai.db'):
                 # 处理文件
                 console.print(f"\n:database: 提取: {subdir}")
                 
-                # 确保表存在
-                if not create_database(db_path, subdir):
-                    print_error(f"创建表 {subdir} 失败")
-                    progress.advance(main_task)
-                    continue
-                
                 # 解析AI输出文件
                 records = parse_ai_output_file(txt_file)
                 
                 if records:
                     # 写入数据库
-                    if insert_records_to_db(db_path, subdir, records):
+                    if insert_records_to_db(db_path, subdir, records, txt_file):
                         print_success(f"完成提取: {subdir} ({len(records)} 条记录)")
                     else:
                         print_error(f"数据库写入失败: {subdir}")
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+按条目切块 - 把单词表的行归并为逻辑条目（词头行 + 续行），再按目标模型的token预算线性打包成块
+多行条目不会被拆到两个块里，避免AI返回“字段不足”后再走错误处理重试
+"""
+import re
+import hashlib
+import unicodedata
+from bisect import bisect_right
+from itertools import accumulate
+
+# 各模型系列的token估算系数：(每个汉字的token数, 每个其他字符的token数)
+MODEL_TOKEN_RATIOS = {
+    'qwen': (0.7, 0.27),
+    'glm': (0.7, 0.27),
+    'deepseek': (0.75, 0.27),
+    'internlm': (0.8, 0.3),
+}
+DEFAULT_TOKEN_RATIO = (1.0, 0.3)
+
+# 输出按“|en|zh|pro|type|promt|”展开、多义项拆行后约为输入的2~3倍，输入预算按max_tokens的1/3估算
+DEFAULT_MAX_OUTPUT_TOKENS = 2048
+OUTPUT_EXPANSION = 3.0
+
+_HEADWORD_RE = re.compile(r"[A-Za-z][A-Za-z'-]*")
+_BRACKET_RE = re.compile(r'[(（\[【)）\]】]')
+# 括号未闭合时最多再并入几行，防止OCR丢失右括号后把后文全部吞进一个条目
+MAX_BRACKET_CONTINUATION = 3
+
+
+def token_ratio(model=None):
+    name = (model or '').lower()
+    for family, ratio in MODEL_TOKEN_RATIOS.items():
+        if family in name:
+            return ratio
+    return DEFAULT_TOKEN_RATIO
+
+
+def _estimate(text, ratio):
+    # 汉字及全角符号在UTF-8中占3字节，ASCII占1字节，用字节数差近似汉字数，避免逐字符扫描
+    cjk_ratio, other_ratio = ratio
+    length = len(text)
+    cjk = (len(text.encode('utf-8')) - length) // 2
+    return int(cjk * cjk_ratio + (length - cjk) * other_ratio) + 1
+
+
+def estimate_tokens(text, model=None):
+    """按模型系列估算文本的token数（汉字与其他字符分别计）"""
+    return _estimate(text, token_ratio(model))
+
+
+def token_budget(max_output_tokens=DEFAULT_MAX_OUTPUT_TOKENS):
+    """每块的输入token预算，保证展开后的输出不超过max_output_tokens"""
+    return int(max_output_tokens / OUTPUT_EXPANSION)
+
+
+def _bracket_delta(line):
+    if not _BRACKET_RE.search(line):
+        return 0
+    return (line.count('(') + line.count('（') + line.count('[') + line.count('【')
+            - line.count(')') - line.count('）') - line.count(']') - line.count('】'))
+
+
+def is_entry_start(line):
+    """以英文字母开头的行是新条目的词头行；以汉字、标点、括号、数字开头的是上一条的续行"""
+    stripped = line.lstrip()
+    return bool(stripped) and stripped[0].isascii() and stripped[0].isalpha()
+
+
+def split_entries(lines):
+    """把行归并为逻辑条目，返回条目字符串列表（拼接后与原文完全一致）
+
+    上一条目括号未闭合时，接下来至多MAX_BRACKET_CONTINUATION行无论以什么开头都视为续行
+    """
+    entries = []
+    current = []
+    depth = 0
+    for line in lines:
+        open_bracket = depth > 0 and len(current) <= MAX_BRACKET_CONTINUATION
+        if current and not open_bracket and is_entry_start(line):
+            entries.append(''.join(current))
+            current = []
+            depth = 0
+        current.append(line)
+        depth += _bracket_delta(line)
+    if current:
+        entries.append(''.join(current))
+    return entries
+
+
+def token_prefix(entries, model=None):
+    """各条目估算token数的前缀和，prefix[i]为前i个条目的token总数"""
+    ratio = token_ratio(model)
+    return list(accumulate((_estimate(entry, ratio) for entry in entries), initial=0))
+
+
+def next_chunk_end(prefix, start, budget):
+    """从第start个条目开始，在预算内尽量多装条目，返回块结束位置（不含）；至少装一个条目"""
+    end = bisect_right(prefix, prefix[start] + budget) - 1
+    return min(max(end, start + 1), len(prefix) - 1)
+
+
+def chunk_text(text, model=None, budget=None):
+    """把文本按条目打包成不超过token预算的块；单个条目超出预算时独占一块"""
+    if budget is None:
+        budget = token_budget()
+    entries = split_entries(text.splitlines(True))
+    prefix = token_prefix(entries, model)
+    chunks = []
+    start = 0
+    while start < len(entries):
+        end = next_chunk_end(prefix, start, budget)
+        chunks.append(''.join(entries[start:end]))
+        start = end
+    return chunks
+
+
+def headword(text):
+    """条目或记录en字段的首个英文单词（小写），用于把AI输出的记录对应回输入条目"""
+    match = _HEADWORD_RE.match(text.lstrip())
+    return match.group(0).lower() if match else ''
+
+
+def entry_key(entry):
+    """条目的内容哈希：NFKC规范化并合并空白后取sha256，只改动空白、换行或全半角不会导致重新处理"""
+    text = ' '.join(unicodedata.normalize('NFKC', entry).split())
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def match_owner(heads, cursor, en, lookahead=5):
+    """返回记录所属的条目序号：在cursor起的lookahead个条目中找词头与en相同的（允许跳过被AI丢弃的条目），
+    找不到时仍归属cursor（同一条目的其他义项、词组或句子）"""
+    key = headword(en)
+    for j in range(cursor, min(len(heads), cursor + lookahead)):
+        if heads[j] and heads[j] == key:
+            return j
+    return cursor
+
+
+def chunk_file(file_path, model=None, budget=None):
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return chunk_text(f.read(), model, budget)
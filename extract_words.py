@@ -6,6 +6,10 @@ import argparse
 import csv
 import traceback
 from collections import defaultdict
+from fuzzy_index import FuzzyIndex, build_index_from_db, load_or_build_index, normalize_headword, DEFAULT_MAX_DISTANCE
+from pos_lexicon import find_pos_tags
+from chinese_index import search_chinese
+from vocab_store import init_store, upsert_records, close_pool, is_store
 
 def safe_json_loads(data):
     """安全解析JSON数据，处理可能的格式问题"""
@@ -17,6 +21,9 @@ def safe_json_loads(data):
         fixed_data = re.sub(r':\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*([,\]}])', r':"\1"\2', fixed_data)
         return json.loads(fixed_data)
 
+# 词典之外的词性标签，与词典匹配互补
+_GENERIC_POS_RE = re.compile(r'\b[a-z]+\.', re.IGNORECASE)
+
 def parse_entry(entry_text):
     """解析单个词汇条目，返回结构化数据"""
     # 提取英文部分（可能包含多个单词）
@@ -28,13 +35,13 @@ def parse_entry(entry_text):
     if not english_part:
         return None
     
-    # 提取所有词性标签
-    pos_tags = []
-    pos_matches = re.findall(r'(\b[a-z]+\.(?:/[a-z]+\.)*)', entry_text.lower())
-    for match in pos_matches:
-        # 分割组合词性如"n./v."
-        combined = [p for p in match.split('/') if p.endswith('.')]
-        pos_tags.extend(combined)
+    # 提取所有词性标签：先按词性词典匹配（v.link.、[U]. 等），词典之外的“单词+点”（conj.、num.、Adj. 等）
+    # 按通用规则补充；组合词性如"n./v."会分别命中
+    spans = find_pos_tags(entry_text)
+    pos_tags = [tag for _, _, tag in spans]
+    for match in _GENERIC_POS_RE.finditer(entry_text):
+        if not any(start < match.end() and match.start() < end for start, end, _ in spans):
+            pos_tags.append(match.group(0).lower())
     
     # 如果没有显式词性标签，尝试推断
     if not pos_tags:
@@ -129,50 +136,16 @@ def process_json_file(json_path):
         return {}
 
 def init_database(db_path):
-    """初始化数据库并创建表"""
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    
-    # 创建表（如果不存在）
-    c.execute('''CREATE TABLE IF NOT EXISTS vocabulary (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    english TEXT NOT NULL,
-                    pos TEXT NOT NULL,
-                    chinese TEXT NOT NULL,
-                    source_file TEXT,
-                    UNIQUE(english, pos, chinese)
-                )''')
-    
-    # 创建索引
-    c.execute("CREATE INDEX IF NOT EXISTS idx_english ON vocabulary (english)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_pos ON vocabulary (pos)")
-    c.execute("CREATE INDEX IF NOT EXISTS idx_chinese ON vocabulary (chinese)")
-    
-    conn.commit()
-    conn.close()
+    """初始化统一词汇库（entries / senses / sources）"""
+    init_store(db_path)
 
 def save_to_database(data, db_path, source_file):
-    """将词汇数据保存到SQLite数据库"""
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    
-    # 插入数据
-    total_count = 0
-    for eng, pos_data in data.items():
-        for pos, chn_list in pos_data.items():
-            for chn in chn_list:
-                try:
-                    c.execute('''INSERT OR IGNORE INTO vocabulary 
-                                (english, pos, chinese, source_file) 
-                                VALUES (?, ?, ?, ?)''',
-                             (eng, pos, chn, source_file))
-                    total_count += 1
-                except sqlite3.IntegrityError:
-                    pass  # 忽略重复条目
-    
-    conn.commit()
-    conn.close()
-    return total_count
+    """将词汇数据批量写入统一词汇库，中文索引随写入增量更新"""
+    records = [{'en': eng, 'pro': pos, 'zh': chn}
+               for eng, pos_data in data.items()
+               for pos, chn_list in pos_data.items()
+               for chn in chn_list]
+    return upsert_records(db_path, records, source_file, kind='json')
 
 def export_to_csv(db_path, csv_path):
     """从数据库导出为CSV文件"""
@@ -180,7 +153,7 @@ def export_to_csv(db_path, csv_path):
     c = conn.cursor()
     
     # 查询所有数据
-    c.execute("SELECT english, pos, chinese, source_file FROM vocabulary ORDER BY english, pos")
+    c.execute("SELECT english, pos, chinese, source FROM vocabulary_view ORDER BY english, pos")
     rows = c.fetchall()
     
     # 写入CSV
@@ -192,8 +165,38 @@ def export_to_csv(db_path, csv_path):
     conn.close()
     return len(rows)
 
-def process_folder(folder_path, output_db):
-    """处理文件夹中的所有JSON文件"""
+# 疑似OCR损坏的词头：词内夹着撇号或点（如 prr'fe），常见的缩写形式除外
+_CONTRACTION_RE = re.compile(r"'(?:t|s|ll|re|ve|d|m)\b|\bo'clock\b", re.IGNORECASE)
+_DAMAGED_RE = re.compile(r"[a-zA-Z]['.][a-zA-Z]")
+
+def looks_damaged(headword):
+    return bool(_DAMAGED_RE.search(_CONTRACTION_RE.sub('', headword)))
+
+def correct_headwords(vocabulary, index, max_distance=DEFAULT_MAX_DISTANCE):
+    """把疑似OCR损坏且不在索引中的词头纠正为索引中最接近的词头，释义合并到该词头下；返回(新词汇表, 纠正数)
+
+    只处理looks_damaged的词头，拼写正常的词头即使与其他词头相近（如bat/bet）也保持不变
+    """
+    corrected = {}
+    fixes = 0
+    for eng, pos_data in vocabulary.items():
+        target = eng
+        if max_distance and looks_damaged(eng) and normalize_headword(eng) not in index.terms:
+            match = index.correct(eng, max_distance)
+            if match:
+                print(f"  纠正词头: {eng} -> {match}")
+                target = match
+                fixes += 1
+        merged = corrected.setdefault(target, {})
+        for pos, chn_list in pos_data.items():
+            merged.setdefault(pos, []).extend(chn for chn in chn_list if chn not in merged.get(pos, []))
+    return corrected, fixes
+
+def process_folder(folder_path, output_db, max_distance=DEFAULT_MAX_DISTANCE):
+    """处理文件夹中的所有JSON文件
+
+    先解析全部文件，用拼写正常的词头建立模糊索引，入库前把疑似OCR损坏的词头纠正为最接近的词头（max_distance为0时不纠正）
+    """
     # 获取所有JSON文件并按数字排序
     files = [f for f in os.listdir(folder_path) if f.endswith('.json')]
     
@@ -206,6 +209,7 @@ def process_folder(folder_path, output_db):
     
     # 初始化数据库
     if os.path.exists(output_db):
+        close_pool(output_db)
         # 备份旧数据库
         backup_db = os.path.splitext(output_db)[0] + "_backup.db"
         os.rename(output_db, backup_db)
@@ -217,16 +221,26 @@ def process_folder(folder_path, output_db):
     
     total_entries = 0
     processed_files = 0
+    total_fixes = 0
     
+    # 先解析全部JSON文件，再用其中拼写正常的词头作为纠错参照
+    parsed_files = []
     for filename in files:
-        json_path = os.path.join(folder_path, filename)
+        print(f"解析文件: {filename}")
+        parsed_files.append((filename, process_json_file(os.path.join(folder_path, filename))))
+    reference = FuzzyIndex(max_distance=max(max_distance, 1))
+    for _, vocab_data in parsed_files:
+        for eng in vocab_data:
+            if not looks_damaged(eng):
+                reference.add(eng)
+    
+    for filename, vocab_data in parsed_files:
         print(f"处理文件: {filename}")
         
         try:
-            # 解析JSON文件
-            vocab_data = process_json_file(json_path)
-            
             if vocab_data:
+                vocab_data, fixes = correct_headwords(vocab_data, reference, max_distance)
+                total_fixes += fixes
                 # 保存到数据库
                 count = save_to_database(vocab_data, output_db, filename)
                 total_entries += count
@@ -238,6 +252,13 @@ def process_folder(folder_path, output_db):
         except Exception as e:
             print(f"  处理出错: {str(e)}")
     
+    if total_fixes:
+        print(f"按模糊索引纠正了 {total_fixes} 个疑似OCR损坏的词头")
+    
+    # 重建英文模糊索引，供search命令容错查询
+    fuzzy_index = build_index_from_db(output_db)
+    print(f"已构建模糊索引: {len(fuzzy_index)} 个词头")
+    
     # 导出CSV
     csv_path = os.path.splitext(output_db)[0] + ".csv"
     csv_count = export_to_csv(output_db, csv_path)
@@ -248,29 +269,44 @@ def process_folder(folder_path, output_db):
     print(f"CSV文件已导出到: {csv_path}")
     print(f"总记录数: {csv_count}")
 
-def query_database(db_path, search_term):
-    """在数据库中搜索词汇"""
+def query_database(db_path, search_term, max_distance=DEFAULT_MAX_DISTANCE):
+    """在数据库中搜索词汇，英文无匹配时按编辑距离模糊查找"""
     if not os.path.exists(db_path):
         print(f"错误: 数据库文件 '{db_path}' 不存在")
         return
+    if not is_store(db_path):
+        print(f"错误: '{db_path}' 是旧结构数据库，请先运行 python vocab_store.py migrate --db <新库> {db_path}")
+        return
     
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
     
     # 判断搜索类型
     if re.search(r'[\u4e00-\u9fa5]', search_term):
-        # 中文搜索
-        c.execute("SELECT english, pos, chinese, source_file FROM vocabulary WHERE chinese LIKE ?", 
-                 (f'%{search_term}%',))
+        # 中文搜索：走二元组倒排索引，按命中程度排序
+        results = []
+        for sense_id, _, _ in search_chinese(conn, search_term):
+            c.execute("SELECT english, pos, chinese, source FROM vocabulary_view WHERE id = ?", (sense_id,))
+            results.extend(c.fetchall())
     else:
         # 英文搜索
-        c.execute("SELECT english, pos, chinese, source_file FROM vocabulary WHERE english LIKE ?", 
+        c.execute("SELECT english, pos, chinese, source FROM vocabulary_view WHERE english LIKE ?", 
                  (f'%{search_term}%',))
-    
-    results = c.fetchall()
+        results = c.fetchall()
+    
+    if not results and max_distance > 0 and not re.search(r'[\u4e00-\u9fa5]', search_term):
+        # OCR损坏的词头：在模糊索引中查找最接近的词头后精确查询
+        matches = load_or_build_index(db_path).lookup(search_term, max_distance)
+        if matches:
+            print("未找到精确匹配，模糊匹配候选: " + ", ".join(f"{w}(距离{d})" for w, d in matches))
+            for headword, _ in matches:
+                c.execute("SELECT english, pos, chinese, source FROM vocabulary_view WHERE english = ?",
+                         (headword,))
+                results.extend(c.fetchall())
     
     if not results:
         print("未找到匹配结果")
+        conn.close()
         return
     
     print(f"\n找到 {len(results)} 条匹配记录:")
@@ -287,6 +323,7 @@ if __name__ == "__main__":
     parser.add_argument('--input', help='JSON文件夹路径(用于process命令)')
     parser.add_argument('--db', default='vocabulary.db', help='SQLite数据库路径(默认: vocabulary.db)')
     parser.add_argument('--term', help='搜索关键词(用于search命令)')
+    parser.add_argument('--distance', type=int, default=DEFAULT_MAX_DISTANCE, help='英文模糊查询与入库纠错的最大编辑距离，0为关闭(默认: 2)')
     
     args = parser.parse_args()
     
@@ -299,11 +336,11 @@ if __name__ == "__main__":
             print(f"错误: 文件夹 '{args.input}' 不存在或不是目录")
             exit(1)
             
-        process_folder(args.input, args.db)
+        process_folder(args.input, args.db, args.distance)
         
     elif args.command == 'search':
         if not args.term:
             print("错误: 请使用 --term 指定搜索关键词")
             exit(1)
             
-        query_database(args.db, args.term)
\ No newline at end of file
+        query_database(args.db, args.term, args.distance)
\ No newline at end of file
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+英文词头模糊索引 - SymSpell风格的删除字典，用于容忍OCR造成的拼写错误
+用法：
+    python fuzzy_index.py build --db vocab.db
+    python fuzzy_index.py lookup --db vocab.db --term "prr'fe" --distance 2
+"""
+import os
+import re
+import pickle
+import sqlite3
+import argparse
+
+DEFAULT_MAX_DISTANCE = 2
+# 只对词头前缀生成删除变体，控制索引体积（SymSpell的prefix length做法）
+DEFAULT_PREFIX_LENGTH = 7
+INDEX_VERSION = 1
+
+_PHONETIC_RE = re.compile(r'/[^/\n]*(/|$)')
+_NON_WORD_RE = re.compile(r"[^a-z\s\-]")
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_headword(text):
+    """规范化英文词头：去掉音标片段、数字与杂质符号，统一小写"""
+    if not text:
+        return ''
+    text = _PHONETIC_RE.sub(' ', text.lower())
+    text = _NON_WORD_RE.sub('', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+def _pattern_masks(pattern):
+    """为Myers位并行算法预计算每个字符在pattern中的位置掩码"""
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | (1 << i)
+    return masks
+
+
+def edit_distance(a, b, max_distance, masks=None):
+    """Myers位并行Levenshtein距离，超过max_distance时返回max_distance+1
+
+    masks为a的预计算掩码，同一查询词对多个候选计算时可复用
+    """
+    if a == b:
+        return 0
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > max_distance:
+        return max_distance + 1
+    if not a or not b:
+        return max(len_a, len_b)
+    if masks is None:
+        masks = _pattern_masks(a)
+    full = (1 << len_a) - 1
+    high = 1 << (len_a - 1)
+    pv, mv, score = full, 0, len_a
+    for char in b:
+        eq = masks.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score if score <= max_distance else max_distance + 1
+
+
+def _deletes(word, max_distance):
+    """生成word删除至多max_distance个字符后的所有变体（含自身）"""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            if len(item) <= 1:
+                continue
+            for i in range(len(item)):
+                variant = item[:i] + item[i + 1:]
+                if variant not in result:
+                    result.add(variant)
+                    next_frontier.add(variant)
+        frontier = next_frontier
+    return result
+
+
+class FuzzyIndex:
+    """英文词头的删除字典索引，查询“编辑距离k以内最接近的词头”"""
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, prefix_length=DEFAULT_PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.terms = {}      # 规范化词头 -> 原始词头
+        self.counts = {}     # 规范化词头 -> 出现次数
+        self.deletes = {}    # 删除变体 -> 规范化词头列表
+
+    def __len__(self):
+        return len(self.terms)
+
+    def add(self, headword):
+        """加入一个词头，返回规范化结果（为空则不入索引）"""
+        term = normalize_headword(headword)
+        if not term:
+            return ''
+        if term in self.terms:
+            self.counts[term] += 1
+            return term
+        self.terms[term] = headword.strip()
+        self.counts[term] = 1
+        for variant in _deletes(term[:self.prefix_length], self.max_distance):
+            self.deletes.setdefault(variant, []).append(term)
+        return term
+
+    def lookup(self, text, max_distance=None, limit=5):
+        """返回[(原始词头, 编辑距离)]，按距离、出现次数排序"""
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+        query = normalize_headword(text)
+        if not query:
+            return []
+        masks = _pattern_masks(query)
+        seen = set()
+        matches = []
+        for variant in _deletes(query[:self.prefix_length], max_distance):
+            for term in self.deletes.get(variant, ()):
+                if term in seen:
+                    continue
+                seen.add(term)
+                distance = edit_distance(query, term, max_distance, masks)
+                if distance <= max_distance:
+                    matches.append((distance, -self.counts[term], term))
+        matches.sort()
+        return [(self.terms[term], distance) for distance, _, term in matches[:limit]]
+
+    def correct(self, text, max_distance=None):
+        """返回最接近的词头，没有候选时返回None（extract_words入库前纠正OCR损坏的词头）"""
+        matches = self.lookup(text, max_distance, limit=1)
+        return matches[0][0] if matches else None
+
+    def save(self, path):
+        data = {
+            'version': INDEX_VERSION,
+            'max_distance': self.max_distance,
+            'prefix_length': self.prefix_length,
+            'terms': self.terms,
+            'counts': self.counts,
+            'deletes': self.deletes,
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"索引版本不匹配: {path}")
+        index = cls(data['max_distance'], data['prefix_length'])
+        index.terms = data['terms']
+        index.counts = data['counts']
+        index.deletes = data['deletes']
+        return index
+
+
+def default_index_path(db_path):
+    return os.path.splitext(db_path)[0] + '.fuzzy.pkl'
+
+
+def build_index_from_db(db_path, index_path=None, max_distance=DEFAULT_MAX_DISTANCE):
+    """从统一词汇库entries表的english列构建索引并保存到磁盘"""
+    index = FuzzyIndex(max_distance=max_distance)
+    conn = sqlite3.connect(db_path)
+    try:
+        for (english,) in conn.execute("SELECT english FROM entries"):
+            if english:
+                index.add(english)
+    finally:
+        conn.close()
+    index.save(index_path or default_index_path(db_path))
+    return index
+
+
+def load_or_build_index(db_path, index_path=None):
+    """优先加载磁盘上的索引；索引不存在或比数据库旧时重新构建"""
+    index_path = index_path or default_index_path(db_path)
+    if os.path.exists(index_path) and os.path.getmtime(index_path) >= os.path.getmtime(db_path):
+        try:
+            return FuzzyIndex.load(index_path)
+        except Exception as e:
+            print(f"加载模糊索引失败，重新构建: {e}")
+    return build_index_from_db(db_path, index_path)
+
+
+if __name__ == '__main__':
+    import time
+    parser = argparse.ArgumentParser(description='英文词头模糊索引')
+    parser.add_argument('command', choices=['build', 'lookup'], help='命令: build-构建索引, lookup-模糊查询')
+    parser.add_argument('--db', default='vocab.db', help='统一词汇库路径(默认: vocab.db)')
+    parser.add_argument('--index', help='索引文件路径(默认与数据库同名.fuzzy.pkl)')
+    parser.add_argument('--term', help='查询词(用于lookup命令)')
+    parser.add_argument('--distance', type=int, default=DEFAULT_MAX_DISTANCE, help='最大编辑距离')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"错误: 数据库文件 '{args.db}' 不存在")
+        exit(1)
+
+    if args.command == 'build':
+        start = time.time()
+        index = build_index_from_db(args.db, args.index, args.distance)
+        print(f"已索引 {len(index)} 个词头，用时 {time.time() - start:.2f} 秒")
+    else:
+        if not args.term:
+            print("错误: 请使用 --term 指定查询词")
+            exit(1)
+        index = load_or_build_index(args.db, args.index)
+        start = time.perf_counter()
+        matches = index.lookup(args.term, args.distance)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for headword, distance in matches:
+            print(f"{headword} (距离 {distance})")
+        print(f"查询用时 {elapsed_ms:.3f} 毫秒")
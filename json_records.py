@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+JSON输出模式 - 让LLM按JSON逐行输出记录（AI_JSON_MODE=1），在本地按RECORD_SCHEMA校验并修复常见的小错误，
+再转换为 |en|zh|pro|type|promt| 记录行，后续的条目归属、日志、解析流程不变
+提示词要求每条记录单独占一行（外层为 {"records": [ ... ]}，可配合接口的 response_format=json_object 使用），
+但解析不依赖分行：整段回复是合法JSON时直接按文档解析，否则由RecordDecoder按括号结构切出每条记录，
+流式输出时记录一闭合就转换，截断时只丢最后一条。可在本地修复的情况：
+- 多余或缺少的逗号、引号用单引号、缺少结尾的 }、Python风格的None/True、未加引号的键；
+- 键名别名（english、chinese、pos、prompt等）或按顺序给出的5元素数组；
+- type缺失或为字符串（按英文重新判定）、pro/promt为null或空、字段中含有 | 或换行
+无法修复的记录和括号之外的文字以 "|原始内容" 的形式保留，由 parse_fixed_content 归入失败项，仍走错误处理流程
+"""
+import re
+import json
+import threading
+
+from txt_to_excel_and_db import detect_type
+
+RECORD_FIELDS = ('en', 'zh', 'pro', 'type', 'promt')
+
+# 单条记录的JSON Schema，用于提示词说明；校验由下面的validate_record完成（字段固定，不依赖jsonschema）
+RECORD_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "en": {"type": "string", "minLength": 1},
+        "zh": {"type": "string"},
+        "pro": {"type": ["string", "null"]},
+        "type": {"type": "integer", "enum": [-1, 0, 1]},
+        "promt": {"type": ["string", "null"]},
+    },
+    "required": ["en", "zh", "pro", "type", "promt"],
+    "additionalProperties": False,
+}
+
+_KEY_ALIASES = {
+    'english': 'en', 'word': 'en', 'eng': 'en',
+    'chinese': 'zh', 'meaning': 'zh', 'cn': 'zh', 'translation': 'zh',
+    'pos': 'pro', 'part_of_speech': 'pro', 'speech': 'pro',
+    'kind': 'type', 'en_type': 'type',
+    'prompt': 'promt', 'hint': 'promt',
+}
+_NULLS = {'', 'null', 'none', 'nil', 'n/a'}
+_SECTION_RE = re.compile(r"^\s*#+\s*第\s*\d+\s*段\s*$")
+_TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+_BARE_KEY_RE = re.compile(r'([{,]\s*)([A-Za-z_]+)\s*:')
+_POS_RE = re.compile(r'^[a-z]+$')
+
+_stats = {'valid': 0, 'repaired': 0, 'failed': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def validate_record(obj):
+    """按RECORD_SCHEMA校验，返回不符合的字段列表（空列表表示通过）"""
+    if not isinstance(obj, dict):
+        return ['object']
+    problems = [key for key in obj if key not in RECORD_FIELDS]
+    for key in RECORD_FIELDS:
+        if key not in obj:
+            problems.append(key)
+    if problems:
+        return problems
+    if not isinstance(obj['en'], str) or not obj['en'].strip():
+        problems.append('en')
+    if not isinstance(obj['zh'], str):
+        problems.append('zh')
+    for key in ('pro', 'promt'):
+        if obj[key] is not None and not isinstance(obj[key], str):
+            problems.append(key)
+    if isinstance(obj['type'], bool) or obj['type'] not in (-1, 0, 1):
+        problems.append('type')
+    return problems
+
+
+def _loads(text):
+    """解析一个JSON对象，失败时依次尝试常见的修复，返回(对象, 是否经过修复)，无法解析时对象为None"""
+    candidates = [text]
+    fixed = _TRAILING_COMMA_RE.sub(r'\1', text)
+    if fixed.count('{') > fixed.count('}'):
+        fixed += '}' * (fixed.count('{') - fixed.count('}'))
+    candidates.append(fixed)
+    if '"' not in fixed:
+        fixed = fixed.replace("'", '"')
+        candidates.append(fixed)
+    fixed = re.sub(r'\bNone\b', 'null', fixed)
+    fixed = re.sub(r'\bTrue\b', 'true', re.sub(r'\bFalse\b', 'false', fixed))
+    fixed = _BARE_KEY_RE.sub(r'\1"\2":', fixed)
+    candidates.append(fixed)
+    for i, candidate in enumerate(candidates):
+        try:
+            return json.loads(candidate), i > 0
+        except ValueError:
+            continue
+    return None, True
+
+
+def _text(value):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        value = str(value)
+    # | 是记录的分隔符，换行会拆开记录
+    value = ' '.join(value.replace('|', '/').split())
+    return None if value.lower() in _NULLS else value
+
+
+def repair_record(obj):
+    """把解析出的对象修复为符合RECORD_SCHEMA的记录，无法修复时返回None"""
+    if isinstance(obj, list) and len(obj) in (4, 5):
+        obj = dict(zip(RECORD_FIELDS, obj))
+    if not isinstance(obj, dict):
+        return None
+    record = {}
+    for key, value in obj.items():
+        key = str(key).strip().lower()
+        key = _KEY_ALIASES.get(key, key)
+        if key in RECORD_FIELDS and key not in record:
+            record[key] = value
+    en = _text(record.get('en'))
+    zh = _text(record.get('zh'))
+    if not en or not zh:
+        return None
+    pro = _text(record.get('pro'))
+    if pro and _POS_RE.match(pro):
+        pro += '.'
+    kind = record.get('type')
+    try:
+        kind = int(str(kind).strip())
+    except ValueError:
+        kind = None
+    if kind not in (-1, 0, 1):
+        kind = detect_type(en)
+    return {'en': en, 'zh': zh, 'pro': pro, 'type': kind, 'promt': _text(record.get('promt'))}
+
+
+def to_pipe(record):
+    return (f"|{record['en']}|{record['zh']}|{record['pro'] or 'NULL'}|{record['type']}|"
+            f"{record['promt'] or 'NULL'}|")
+
+
+def _convert_object(text):
+    """把一个记录对象（或5元素数组）的文本转换为记录行，无法修复时返回 "|原始内容"，交给错误处理阶段"""
+    obj, fixed = _loads(text)
+    record = repair_record(obj) if obj is not None else None
+    if record is None:
+        _count('failed')
+        return '|' + ' '.join(text.split())
+    # 符合schema的记录也要规范化（去掉字段中的 | 与换行）
+    _count('repaired' if fixed or validate_record(obj) else 'valid')
+    return to_pipe(record)
+
+
+class RecordDecoder:
+    """逐行接收模型输出，按括号结构切出记录对象并转换为记录行，用于流式读取
+
+    不要求固定的分行方式：每行一条、整段格式化缩进或整个文档写在一行都可以。
+    不含子对象的对象（或位于数组中的扁平数组）视为一条记录，{"records": [...]} 等外层结构只用于定位；
+    对象中直接出现新的 { 或不匹配的 ] 时，视为上一条记录缺少结尾的 } 并就地补上。
+    括号之外的段标记与 |...| 记录行原样输出，其余无法解析的文本以 "|原始内容" 输出，不会被丢弃
+    """
+
+    def __init__(self):
+        self._buf = ''
+        # 打开的容器：[括号, 在_buf中的起始位置, 是否含有子容器]
+        self._stack = []
+
+    def feed(self, line):
+        """处理一行输出，返回这一行完成的记录行列表"""
+        text = line.strip()
+        if not self._stack or self._stack[-1][0] == '[':
+            if _SECTION_RE.match(text) or text.startswith('|'):
+                return [text]
+            if not text or text.startswith('```'):
+                return []
+        out = []
+        stray = False
+        in_string = escaped = False
+        for ch in line.rstrip('\r\n') + '\n':
+            if self._stack:
+                self._buf += ch
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+                stray = stray or not self._stack
+            elif ch in '{[':
+                top = self._stack[-1] if self._stack else None
+                if ch == '{' and top and top[0] == '{' and not top[2] and ':' in self._buf[top[1]:-1]:
+                    self._buf = self._buf[:-1]
+                    out.append(self._close_unterminated())
+                    self._buf += ch
+                    top = self._stack[-1] if self._stack else None
+                if top:
+                    top[2] = True
+                else:
+                    self._buf = ch
+                self._stack.append([ch, len(self._buf) - 1, False])
+            elif ch in '}]':
+                opener = '{' if ch == '}' else '['
+                while self._stack and self._stack[-1][0] != opener and self._stack[-1][0] == '{' \
+                        and not self._stack[-1][2]:
+                    self._buf = self._buf[:-1]
+                    out.append(self._close_unterminated())
+                    self._buf += ch
+                if not self._stack or self._stack[-1][0] != opener:
+                    stray = stray or not self._stack
+                    continue
+                kind, begin, has_child = self._stack.pop()
+                parent = self._stack[-1][0] if self._stack else None
+                if not has_child and (kind == '{' or parent in (None, '[')):
+                    out.append(_convert_object(self._buf[begin:]))
+            elif not self._stack and not ch.isspace() and ch != ',':
+                stray = True
+        if not self._stack:
+            self._buf = ''
+        # 括号之外的文字（说明、缺少括号的记录等）交给错误处理阶段
+        if stray and not out:
+            _count('failed')
+            out.append('|' + text)
+        return out
+
+    def _close_unterminated(self):
+        kind, begin, _ = self._stack.pop()
+        return _convert_object(self._buf[begin:].rstrip().rstrip(',') + '}')
+
+    def finish(self):
+        """输出结束时处理未闭合的最后一条记录（外层结构未闭合的部分忽略）"""
+        out = []
+        while self._stack:
+            kind, begin, has_child = self._stack[-1]
+            if kind == '{' and not has_child and self._buf[begin:].strip('{ \n'):
+                out.append(self._close_unterminated())
+            else:
+                self._stack.pop()
+        self._buf = ''
+        return out
+
+
+def _document_records(content):
+    """整段回复是合法JSON时直接取出记录列表，否则返回None"""
+    text = content.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[-1].rsplit('```', 1)[0]
+    try:
+        document = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(document, dict) and isinstance(document.get('records'), list):
+        return document['records']
+    if isinstance(document, list):
+        return document
+    if isinstance(document, dict):
+        return [document]
+    return None
+
+
+def convert_output(content):
+    """转换一次性返回的完整输出，返回记录行文本
+
+    先把整段回复作为JSON文档解析并逐条按schema校验；不是合法JSON（含段标记、单条记录有小错误等）时按括号结构逐行切分
+    """
+    items = _document_records(content)
+    if items is not None:
+        lines = []
+        for item in items:
+            record = repair_record(item)
+            if record is None:
+                _count('failed')
+                lines.append('|' + json.dumps(item, ensure_ascii=False))
+                continue
+            _count('repaired' if validate_record(item) else 'valid')
+            lines.append(to_pipe(record))
+        return '\n'.join(lines)
+    decoder = RecordDecoder()
+    lines = []
+    for line in content.splitlines():
+        lines.extend(decoder.feed(line))
+    lines.extend(decoder.finish())
+    return '\n'.join(lines)
+
+
+def json_summary():
+    """本次运行JSON记录的校验统计，用于结束时打印"""
+    with _stats_lock:
+        total = sum(_stats.values())
+        if not total:
+            return "JSON输出: 无记录"
+        return (f"JSON输出: 记录 {total} 条, 直接通过 {_stats['valid']} 条, 本地修复 {_stats['repaired']} 条, "
+                f"无法修复 {_stats['failed']} 条（交给错误处理阶段）")
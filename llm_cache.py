@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+LLM响应缓存 - ai_processor、recover、llm_txt_to_db 共用的SQLite磁盘缓存
+键为接口地址与请求内容（model、messages、temperature、max_tokens等）的sha256，超过容量时按最近使用时间淘汰
+只应缓存调用方校验通过的完整回复；读取时调用方仍需校验，不合格的条目用delete删除
+用法：
+    python llm_cache.py stats
+    python llm_cache.py clear
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+
+DEFAULT_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+DEFAULT_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+# 参与缓存键的请求字段；stream等只影响传输方式的字段不参与
+KEY_FIELDS = ('model', 'messages', 'temperature', 'max_tokens', 'top_p', 'response_format')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used);
+'''
+
+
+def cache_key(payload, endpoint=None):
+    """接口地址与请求内容的规范化JSON的sha256（不同服务地址的同名模型互不命中，例如本地模拟服务）"""
+    fields = {field: payload[field] for field in KEY_FIELDS if field in payload}
+    if endpoint:
+        fields['endpoint'] = endpoint
+    text = json.dumps(fields, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """线程安全的LLM响应缓存，hits/misses为本进程内的命中统计"""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        # 总字节数只在打开时统计一次，之后随写入、删除与淘汰增减，避免每次写入都扫描全表
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, payload, endpoint=None, count=True):
+        """命中时返回缓存的响应内容并刷新使用时间，否则返回None
+
+        count=False时不计入命中统计：一次逻辑请求要查多个候选键（如各备选模型）时，由调用方用record_lookup记一次
+        """
+        key = cache_key(payload, endpoint)
+        with self._lock:
+            row = self._conn.execute("SELECT content FROM responses WHERE key = ?", (key,)).fetchone()
+            if count:
+                self._count(row is not None)
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                               (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def _count(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def record_lookup(self, hit):
+        """记录一次逻辑请求的命中或未命中（配合get(count=False)使用）"""
+        with self._lock:
+            self._count(hit)
+
+    def put(self, payload, content, endpoint=None):
+        if content is None:
+            return
+        size = len(content.encode('utf-8'))
+        now = time.time()
+        key = cache_key(payload, endpoint)
+        with self._lock:
+            self._total -= self._size(key)
+            self._conn.execute(
+                '''INSERT OR REPLACE INTO responses (key, model, content, size, created_at, last_used)
+                   VALUES (?, ?, ?, ?, ?, ?)''',
+                (key, payload.get('model'), content, size, now, now))
+            self._total += size
+            self._evict()
+            self._conn.commit()
+
+    def delete(self, payload, endpoint=None):
+        """删除一条缓存（读取后校验不通过的响应）"""
+        key = cache_key(payload, endpoint)
+        with self._lock:
+            self._total -= self._size(key)
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def _size(self, key):
+        row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _evict(self):
+        """总大小超过上限时，按最近使用时间从旧到新删除，直到降到上限的90%"""
+        if self._total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if self._total <= target:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._total -= size
+
+    def stats(self):
+        with self._lock:
+            entries, total, hits = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM responses").fetchone()
+        return {'entries': entries, 'bytes': total, 'total_hits': hits,
+                'hits': self.hits, 'misses': self.misses}
+
+    def summary(self):
+        """本次运行的命中统计，用于各脚本结束时打印"""
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0
+        return f"LLM缓存: 命中 {self.hits} 次, 未命中 {self.misses} 次, 命中率 {rate:.1f}%"
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total = 0
+            self._conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_cache():
+    """进程内共享的缓存实例"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = LLMCache()
+        return _shared_cache
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LLM响应缓存')
+    parser.add_argument('command', choices=['stats', 'clear'], help='命令: stats-查看统计, clear-清空缓存')
+    parser.add_argument('--path', default=DEFAULT_CACHE_PATH, help='缓存数据库路径(默认: llm_cache.db)')
+    args = parser.parse_args()
+
+    cache = LLMCache(args.path)
+    if args.command == 'stats':
+        stats = cache.stats()
+        print(f"缓存条目: {stats['entries']}, 占用: {stats['bytes'] / 1024 / 1024:.2f} MB "
+              f"(上限 {cache.max_bytes / 1024 / 1024:.0f} MB), 累计命中: {stats['total_hits']}")
+    else:
+        cache.clear()
+        print(f"已清空缓存: {args.path}")
+    cache.close()
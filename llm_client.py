@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+LLM HTTP客户端 - ai_processor、recover、llm_txt_to_db 共用的连接池
+按服务地址（scheme://host）和API密钥复用keep-alive的requests.Session，请求头只构造一次；
+每个请求记录DNS解析、建立TCP连接、TLS握手、首字节（TTFB）和总耗时，可注册回调或在结束时打印汇总
+"""
+import os
+import time
+import socket
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'total')
+
+# 当前线程正在进行的请求的计时，由连接对象在新建连接时写入
+_local = threading.local()
+
+
+def _record(phase, seconds):
+    timing = getattr(_local, 'timing', None)
+    if timing is not None:
+        timing[phase] = timing.get(phase, 0.0) + seconds
+
+
+class _TimedConnectionMixin:
+    """新建连接时分别记录DNS解析和TCP连接耗时；复用连接时不会调用这里"""
+
+    def _new_conn(self):
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, allowed_gai_family(), socket.SOCK_STREAM)
+        except socket.gaierror:
+            # 解析失败时交给urllib3，由其抛出统一的NameResolutionError
+            return super()._new_conn()
+        resolved = time.perf_counter()
+        _record('dns', resolved - start)
+        host = self._dns_host
+        try:
+            # 依次连接解析出的地址（与urllib3的create_connection一致），TLS的SNI与证书校验仍使用原主机名
+            for i, (_, _, _, _, sockaddr) in enumerate(addresses):
+                self._dns_host = sockaddr[0]
+                try:
+                    sock = super()._new_conn()
+                    break
+                except NewConnectionError:
+                    if i == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = host
+        _record('connect', time.perf_counter() - resolved)
+        return sock
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+
+    def connect(self):
+        timing = getattr(_local, 'timing', None)
+        before = dict(timing) if timing is not None else None
+        start = time.perf_counter()
+        super().connect()
+        if timing is not None:
+            # connect()包含_new_conn中的DNS与TCP连接，余下的为TLS握手
+            socket_time = sum(timing.get(p, 0.0) - before.get(p, 0.0) for p in ('dns', 'connect'))
+            _record('tls', time.perf_counter() - start - socket_time)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_hooks = []
+_stats = {'requests': 0, 'new_connections': 0, 'errors': 0}
+_totals = dict.fromkeys(PHASES, 0.0)
+_stats_lock = threading.Lock()
+
+
+def chat_url(default_base, env=None):
+    """聊天补全接口地址：服务商的环境变量（如SILICONFLOW_BASE_URL）> LLM_BASE_URL > 默认地址
+
+    LLM_BASE_URL可把所有脚本指向同一个兼容OpenAI的服务，例如本地的 mock_llm_server.py
+    """
+    base = (env and os.getenv(env)) or os.getenv("LLM_BASE_URL") or default_base
+    return base.rstrip('/') + '/chat/completions'
+
+
+def base_url(url):
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def get_session(url, api_key=None):
+    """获取服务地址对应的共享Session（连接池大小为LLM_POOL_SIZE，不在连接层重试）"""
+    key = (base_url(url), api_key)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = _TimedAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=0)
+            session.mount(key[0] + '/', adapter)
+            session.headers.update({"Content-Type": "application/json"})
+            if api_key:
+                session.headers["Authorization"] = f"Bearer {api_key}"
+            _sessions[key] = session
+        return session
+
+
+def add_timing_hook(hook):
+    """注册计时回调：每个请求结束后调用hook(timing)，timing含url、status、reused及各阶段秒数"""
+    _hooks.append(hook)
+
+
+def _finish(timing):
+    timing['reused'] = 'connect' not in timing
+    with _stats_lock:
+        _stats['requests'] += 1
+        _stats['new_connections'] += not timing['reused']
+        _stats['errors'] += timing.get('status') is None or timing['status'] >= 400
+        for phase in PHASES:
+            _totals[phase] += timing.get(phase, 0.0)
+    logger.debug("LLM请求计时 %s", timing)
+    for hook in _hooks:
+        hook(timing)
+
+
+def post(url, payload, api_key=None, timeout=None, stream=False):
+    """通过共享连接池发送JSON POST请求，返回requests.Response
+
+    timeout默认为(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT)；stream=True时总耗时记到响应关闭为止
+    """
+    session = get_session(url, api_key)
+    timing = {'url': url, 'status': None}
+    start = time.perf_counter()
+
+    def on_response(response, *args, **kwargs):
+        # requests在读取响应体之前调用响应钩子，此时为首字节时间
+        timing['ttfb'] = time.perf_counter() - start
+        timing['status'] = response.status_code
+
+    _local.timing = timing
+    try:
+        response = session.post(url, json=payload, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT),
+                                stream=stream, hooks={'response': on_response})
+    except Exception:
+        timing['total'] = time.perf_counter() - start
+        _finish(timing)
+        raise
+    finally:
+        _local.timing = None
+
+    if not stream:
+        timing['total'] = time.perf_counter() - start
+        _finish(timing)
+        return response
+
+    close = response.close
+
+    def close_and_record():
+        close()
+        if 'total' not in timing:
+            timing['total'] = time.perf_counter() - start
+            _finish(timing)
+
+    response.close = close_and_record
+    return response
+
+
+def timing_summary():
+    """本次运行的请求计时汇总，用于各脚本结束时打印"""
+    with _stats_lock:
+        count = _stats['requests']
+        if not count:
+            return "LLM连接: 无请求"
+        new = _stats['new_connections']
+        averages = ", ".join(f"{phase} {_totals[phase] / (new if phase in ('dns', 'connect', 'tls') else count):.3f}s"
+                             for phase in PHASES if phase in ('ttfb', 'total') or new)
+        return (f"LLM连接: 请求 {count} 次, 新建连接 {new} 次（复用率 {(count - new) / count * 100:.1f}%）, "
+                f"失败 {_stats['errors']} 次, 平均 {averages}")
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+流式补全 - 读取OpenAI兼容接口的SSE（stream=True）响应，边接收边拼出完整的行，
+每收到一条完整的 |en|zh|pro|type|promt| 记录就回调一次，便于及时落盘；
+连接中断或超过总时限时返回已收到的完整行，由调用方只重发未完成的部分
+"""
+import json
+import time
+
+
+class StreamResult:
+    """一次流式请求的结果：complete为False表示中途中断，content只包含已收到的完整行"""
+
+    def __init__(self):
+        self.content = ''
+        self.finish_reason = None
+        self.usage = {}
+        self.complete = False
+        self.error = None
+        self.first_line_latency = None
+        self.lines = 0
+
+
+def iter_sse_data(lines):
+    """从SSE响应的行中取出data字段并解析为JSON，遇到[DONE]结束"""
+    for raw in lines:
+        if not raw:
+            continue
+        line = raw.decode('utf-8') if isinstance(raw, bytes) else raw
+        if not line.startswith('data:'):
+            continue
+        data = line[5:].strip()
+        if data == '[DONE]':
+            return
+        yield json.loads(data)
+
+
+def is_record_line(line):
+    """与parse_fixed_content一致：以|开头的行视为记录（字段不足的由解析阶段归入失败项）"""
+    return line.strip().startswith('|')
+
+
+def read_stream(response, on_line=None, deadline=None, decoder=None):
+    """逐个事件读取流式响应，返回StreamResult
+
+    on_line(line)在每条完整的记录行到达时调用；deadline为time.monotonic()的截止时间，
+    超过后停止读取。网络错误和超时不抛出，记录在result.error中。
+    decoder把模型输出转换为记录行（如JSON输出模式的json_records.RecordDecoder）：每个完整行调用一次
+    decoder.feed(行)、正常结束时调用decoder.finish()，返回转换出的行列表
+    """
+    result = StreamResult()
+    start = time.monotonic()
+    done_text = []
+    buffer = ''
+    try:
+        raw_lines = response.iter_lines()
+        for event in iter_sse_data(raw_lines):
+            if event.get('usage'):
+                result.usage = event['usage']
+            for choice in event.get('choices') or []:
+                delta = (choice.get('delta') or {}).get('content') or ''
+                if choice.get('finish_reason'):
+                    result.finish_reason = choice['finish_reason']
+                if not delta:
+                    continue
+                buffer += delta
+                if '\n' not in buffer:
+                    continue
+                *lines, buffer = buffer.split('\n')
+                if decoder is not None:
+                    lines = [converted for line in lines for converted in decoder.feed(line)]
+                for line in lines:
+                    done_text.append(line + '\n')
+                    if is_record_line(line):
+                        if result.first_line_latency is None:
+                            result.first_line_latency = time.monotonic() - start
+                        result.lines += 1
+                        if on_line:
+                            on_line(line.strip())
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError('流式响应超过总时限')
+        # 读完[DONE]之后的剩余响应体（分块结束标记），连接才能放回连接池复用
+        for _ in raw_lines:
+            pass
+        # 正常结束时最后一行可能没有换行符
+        tail = [buffer] if buffer else []
+        if decoder is not None:
+            tail = [converted for line in tail for converted in decoder.feed(line)] + decoder.finish()
+        done_text.append('\n'.join(tail))
+        for line in tail:
+            if is_record_line(line):
+                result.lines += 1
+                if on_line:
+                    on_line(line.strip())
+        result.complete = True
+    except Exception as e:
+        result.error = e
+    finally:
+        response.close()
+    result.content = ''.join(done_text)
+    return result
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+LLM调用遥测 - ai_processor每次实际发出的请求（含重试、对冲、缓存命中）记录一行到SQLite（llm_telemetry.db）：
+模型、字母、块号、请求/响应字节数、接口返回的token用量、延迟、第几次尝试和结果（成功/截断/中断/无效/失败原因）
+用法：
+    python llm_telemetry.py report                 # 最近一次运行，按模型和字母汇总吞吐量、p50/p95延迟与失败原因
+    python llm_telemetry.py report --run all --by model
+    python llm_telemetry.py runs
+    python llm_telemetry.py export calls.jsonl --run all
+设置 LLM_TELEMETRY=0 关闭记录
+"""
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+DEFAULT_TELEMETRY_PATH = os.getenv("LLM_TELEMETRY_PATH", "llm_telemetry.db")
+TELEMETRY_ENABLED = os.getenv("LLM_TELEMETRY", "1") == "1"
+
+FIELDS = ('run_id', 'ts', 'letter', 'stage', 'chunk', 'model', 'attempt', 'stream', 'request_bytes',
+          'response_bytes', 'prompt_tokens', 'completion_tokens', 'latency', 'first_record_latency',
+          'finish_reason', 'outcome', 'error')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    letter TEXT,
+    stage TEXT,
+    chunk INTEGER,
+    model TEXT,
+    attempt INTEGER,
+    stream INTEGER,
+    request_bytes INTEGER,
+    response_bytes INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    latency REAL,
+    first_record_latency REAL,
+    finish_reason TEXT,
+    outcome TEXT NOT NULL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_calls_run ON calls (run_id);
+'''
+
+# 结果：ok-正常完成，truncated-达到max_tokens，partial-流式中断，invalid-没有记录行，error-请求失败，cached-命中缓存
+FAILED_OUTCOMES = ('error', 'invalid')
+
+# 当前线程的标签（字母、阶段、块号），由处理流程在提交任务时绑定
+_context = threading.local()
+
+
+def current_context():
+    return dict(getattr(_context, 'tags', {}))
+
+
+@contextmanager
+def bind(**tags):
+    """在当前线程上附加标签，退出时恢复"""
+    previous = getattr(_context, 'tags', {})
+    _context.tags = dict(previous, **tags)
+    try:
+        yield
+    finally:
+        _context.tags = previous
+
+
+def error_cause(error):
+    """把异常归类为失败原因：timeout、http 429等状态码，或异常类型名"""
+    if error is None:
+        return None
+    response = getattr(error, 'response', None)
+    if response is not None and getattr(response, 'status_code', None):
+        return f"http {response.status_code}"
+    if isinstance(error, TimeoutError) or 'timed out' in str(error).lower() or 'Timeout' in type(error).__name__:
+        return 'timeout'
+    return type(error).__name__
+
+
+def percentile(values, q):
+    """最近秩法的分位数"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values) + 0.5)) - 1))]
+
+
+class TelemetryStore:
+    """线程安全的调用记录表，每个进程一个run_id"""
+
+    def __init__(self, path=DEFAULT_TELEMETRY_PATH, run_id=None):
+        self.path = path
+        self.run_id = run_id or time.strftime('%Y%m%d-%H%M%S') + f"-{os.getpid()}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def record(self, outcome, **fields):
+        row = dict(fields, run_id=self.run_id, ts=time.time(), outcome=outcome)
+        if 'stream' in row:
+            row['stream'] = int(bool(row['stream']))
+        columns = [field for field in FIELDS if row.get(field) is not None]
+        with self._lock:
+            self._conn.execute(f"INSERT INTO calls ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                               [row[field] for field in columns])
+            self._conn.commit()
+
+    def runs(self):
+        with self._lock:
+            return self._conn.execute(
+                '''SELECT run_id, MIN(ts), MAX(ts), COUNT(*) FROM calls
+                   GROUP BY run_id ORDER BY MIN(ts)''').fetchall()
+
+    def rows(self, run='latest'):
+        """run为run_id、latest（最近一次运行）或all"""
+        if run == 'latest':
+            latest = self.runs()
+            run = latest[-1][0] if latest else None
+        query = f"SELECT {', '.join(FIELDS)} FROM calls"
+        params = ()
+        if run != 'all':
+            query += " WHERE run_id = ?"
+            params = (run,)
+        with self._lock:
+            return [dict(zip(FIELDS, row)) for row in self._conn.execute(query + " ORDER BY id", params)]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class _NullTelemetry:
+    run_id = None
+
+    def record(self, outcome, **fields):
+        pass
+
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_telemetry():
+    """进程内共享的遥测记录器，LLM_TELEMETRY=0时不记录"""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = TelemetryStore() if TELEMETRY_ENABLED else _NullTelemetry()
+        return _shared
+
+
+def summarize(rows, key):
+    """按key分组汇总：调用数、各结果数、重试数、p50/p95延迟、输出吞吐量与主要失败原因"""
+    groups = defaultdict(list)
+    for row in rows:
+        groups[row[key] or '-'].append(row)
+    summary = []
+    for name, items in sorted(groups.items()):
+        sent = [row for row in items if row['outcome'] != 'cached']
+        done = [row for row in sent if row['outcome'] not in FAILED_OUTCOMES and row['latency'] is not None]
+        latencies = [row['latency'] for row in done]
+        busy = sum(latencies)
+        tokens = sum(row['completion_tokens'] or 0 for row in done)
+        causes = Counter(row['error'] or row['outcome'] for row in sent if row['outcome'] in FAILED_OUTCOMES)
+        summary.append({
+            'name': name,
+            'calls': len(sent),
+            'cached': len(items) - len(sent),
+            'ok': sum(1 for row in sent if row['outcome'] == 'ok'),
+            'truncated': sum(1 for row in sent if row['outcome'] == 'truncated'),
+            'partial': sum(1 for row in sent if row['outcome'] == 'partial'),
+            'failed': sum(causes.values()),
+            'retries': sum(1 for row in sent if (row['attempt'] or 1) > 1),
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'tokens_per_second': tokens / busy if busy else None,
+            'bytes': sum(row['response_bytes'] or 0 for row in done),
+            'causes': causes,
+        })
+    return summary
+
+
+def format_report(rows, by=('model', 'letter')):
+    if not rows:
+        return "没有遥测记录"
+    start = min(row['ts'] for row in rows)
+    end = max(row['ts'] for row in rows)
+    sent = [row for row in rows if row['outcome'] != 'cached']
+    tokens = sum(row['completion_tokens'] or 0 for row in sent)
+    minutes = max(end - start, 1e-9) / 60
+    lines = [f"运行 {', '.join(sorted({row['run_id'] for row in rows}))}: "
+             f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start))} 起 {end - start:.1f} 秒, "
+             f"请求 {len(sent)} 次（{len(sent) / minutes:.1f} 次/分钟）, 缓存命中 {len(rows) - len(sent)} 次, "
+             f"输出 {tokens} token"]
+    labels = {'model': '模型', 'letter': '字母', 'stage': '阶段'}
+    for key in by:
+        lines.append(f"\n按{labels.get(key, key)}汇总:")
+        lines.append(f"{'调用':>6}{'缓存':>6}{'成功':>6}{'截断':>6}{'中断':>6}{'失败':>6}{'重试':>6}"
+                     f"{'p50(s)':>9}{'p95(s)':>9}{'token/s':>9}  {labels.get(key, key)} / 失败原因")
+        for item in summarize(rows, key):
+            p50 = f"{item['p50']:.2f}" if item['p50'] is not None else '-'
+            p95 = f"{item['p95']:.2f}" if item['p95'] is not None else '-'
+            speed = f"{item['tokens_per_second']:.1f}" if item['tokens_per_second'] is not None else '-'
+            causes = ', '.join(f"{cause} {n}" for cause, n in item['causes'].most_common(3))
+            lines.append(f"{item['calls']:>6}{item['cached']:>6}{item['ok']:>6}{item['truncated']:>6}"
+                         f"{item['partial']:>6}{item['failed']:>6}{item['retries']:>6}{p50:>9}{p95:>9}{speed:>9}"
+                         f"  {item['name']}{' / ' + causes if causes else ''}")
+    return '\n'.join(lines)
+
+
+def run_summary():
+    """本次运行的简要统计，用于ai_processor结束时打印"""
+    telemetry = get_telemetry()
+    if not isinstance(telemetry, TelemetryStore):
+        return "LLM遥测: 未开启"
+    rows = telemetry.rows(telemetry.run_id)
+    failed = sum(1 for row in rows if row['outcome'] in FAILED_OUTCOMES)
+    return (f"LLM遥测: 记录 {len(rows)} 次调用（失败 {failed} 次）到 {telemetry.path}，"
+            f"运行 python llm_telemetry.py report --run {telemetry.run_id} 查看汇总")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='LLM调用遥测')
+    parser.add_argument('command', choices=['report', 'runs', 'export'],
+                        help='命令: report-汇总报告, runs-列出运行, export-导出为JSONL')
+    parser.add_argument('output', nargs='?', help='export的输出文件')
+    parser.add_argument('--path', default=DEFAULT_TELEMETRY_PATH, help='遥测数据库路径(默认: llm_telemetry.db)')
+    parser.add_argument('--run', default='latest', help='运行ID，latest（默认）或all')
+    parser.add_argument('--by', default='model,letter', help='汇总维度，逗号分隔: model, letter, stage')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        raise SystemExit(f"遥测数据库不存在: {args.path}")
+    store = TelemetryStore(args.path)
+    if args.command == 'runs':
+        for run_id, start, end, count in store.runs():
+            print(f"{run_id}  {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start))}  "
+                  f"{end - start:8.1f} 秒  {count} 次调用")
+    elif args.command == 'export':
+        if not args.output:
+            parser.error("export需要指定输出文件")
+        rows = store.rows(args.run)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        print(f"已导出 {len(rows)} 条记录到 {args.output}")
+    else:
+        print(format_report(store.rows(args.run), [key.strip() for key in args.by.split(',') if key.strip()]))
+    store.close()
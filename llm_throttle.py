@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+LLM请求限流 - 按模型维护令牌桶（每分钟请求数RPM + 每分钟token数TPM），多线程共享
+"""
+import time
+import threading
+
+
+class TokenBucket:
+    """线程安全的令牌桶：rate为每秒补充的令牌数，capacity为桶容量（允许的突发量）
+
+    acquire时令牌可以透支，调用方按透支量在锁外等待，先到先得、不会饿死
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """预留amount个令牌，返回需要等待的秒数"""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def acquire(self, amount=1):
+        """阻塞直到拿到amount个令牌，返回实际等待的秒数"""
+        wait = self.reserve(amount)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class ModelLimiter:
+    """单个模型的限流器：请求数桶 + token数桶"""
+
+    def __init__(self, rpm, tpm=None):
+        self.requests = TokenBucket(rpm / 60, max(1, rpm // 60))
+        self.tokens = TokenBucket(tpm / 60, tpm) if tpm else None
+
+    def acquire(self, tokens=0):
+        waited = self.requests.acquire()
+        if self.tokens and tokens:
+            waited += self.tokens.acquire(tokens)
+        return waited
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model, rpm, tpm=None):
+    """获取模型的限流器（同一进程内按模型名共享）"""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = _limiters[model] = ModelLimiter(rpm, tpm)
+        return limiter
+
+
+def throttle(model, rpm, tpm=None, tokens=0):
+    """发请求前调用：按模型限流，返回等待的秒数"""
+    return get_limiter(model, rpm, tpm).acquire(tokens)
+
@@ -1,9 +1,12 @@
 import argparse
 import concurrent.futures
-import requests
-import sqlite3
 import os
 from tqdm import tqdm
+from vocab_store import upsert_records
+from llm_cache import get_cache
+import llm_client
+
+API_URL = llm_client.chat_url("https://openrouter.ai/api/v1", "OPENROUTER_BASE_URL")
 
 def call_llm_api(batch_lines, api_key):
     prompt = (
@@ -17,10 +20,6 @@ def call_llm_api(batch_lines, api_key):
         + '\n'.join(batch_lines) +
         "\n请严格按照上述格式输出。"
     )
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
     data = {
         "model": "deepseek/deepseek-v3-base:free",
         "messages": [
@@ -30,10 +29,21 @@ def call_llm_api(batch_lines, api_key):
         "max_tokens": 2048,
         "temperature": 0.2
     }
-    resp = requests.post("https://openrouter.ai/api/v1/chat/completions", headers=headers, json=data, timeout=120)
+    # 相同请求直接返回缓存结果
+    cache = get_cache()
+    cached = cache.get(data, API_URL)
+    if cached is not None:
+        return cached
+    resp = llm_client.post(API_URL, data, api_key,
+                           timeout=(llm_client.CONNECT_TIMEOUT, 120))
     resp.raise_for_status()
     result = resp.json()
-    return result["choices"][0]["message"]["content"]
+    choice = result["choices"][0]
+    content = choice["message"]["content"]
+    # 只缓存完整的非空回复，被max_tokens截断的结果重跑时应重新请求
+    if content and content.strip() and choice.get("finish_reason") != "length":
+        cache.put(data, content, API_URL)
+    return content
 
 def parse_llm_result(result_txt):
     records = []
@@ -51,15 +61,8 @@ def parse_llm_result(result_txt):
     return records
 
 def write_to_db(records, db_path, table):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
-        en TEXT, pro TEXT, zh TEXT
-    )''')
-    for rec in records:
-        c.execute(f'INSERT INTO {table} (en, pro, zh) VALUES (?, ?, ?)', (rec['en'], rec['pro'], rec['zh']))
-    conn.commit()
-    conn.close()
+    # 写入统一词汇库，table作为来源名，字母按英文首字母归类
+    return upsert_records(db_path, records, table, kind='llm')
 
 def main(txt_path, db_path, api_key, table='words'):
     with open(txt_path, 'r', encoding='utf-8') as f:
@@ -73,12 +76,14 @@ def main(txt_path, db_path, api_key, table='words'):
             all_records.extend(parse_llm_result(result_txt))
     write_to_db(all_records, db_path, table)
     print(f'已写入{len(all_records)}条记录到{db_path}')
+    print(get_cache().summary())
+    print(llm_client.timing_summary())
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='大模型纠错+分割+入库')
     parser.add_argument('--input', type=str, required=True, help='输入txt文件')
     parser.add_argument('--db', type=str, required=True, help='输出sqlite db文件')
-    parser.add_argument('--table', type=str, default='words', help='表名')
+    parser.add_argument('--table', type=str, default='words', help='来源名（统一词汇库sources表）')
     parser.add_argument('--api_key', type=str, required=True, help='OpenRouter API KEY')
     args = parser.parse_args()
     main(args.input, args.db, args.api_key, args.table) 
\ No newline at end of file
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+本地预解析 - 格式已经规整的条目（如 "abandon vt. 放弃"）直接在本地转换为 |en|zh|pro|type|promt| 记录，
+只有无法高置信解析的条目才发给LLM。基于 txt_to_excel_and_db.parse_line 与 detect_type，
+判定从严：宁可多发给LLM，也不输出可能有误的记录
+用法：python local_parser.py txt/h/1_merged.txt   # 统计可在本地处理的条目比例
+"""
+import re
+import argparse
+
+from entry_chunker import split_entries
+from pos_lexicon import iter_pos_tags
+from txt_to_excel_and_db import detect_type, parse_line, remove_inline_slash_content
+
+# 可以在本地输出的词性（[C]、[U]等带方括号的标注交给LLM）
+LOCAL_POS = {"v.", "vt.", "vi.", "n.", "adj.", "adv.", "prep.", "pron.", "aux.", "mod."}
+
+# 英文部分只能是一个单词（允许连字符）；OCR常把音标开头的'粘在单词末尾，去掉后再判断
+_WORD_RE = re.compile(r"[A-Za-z][a-z]*(?:-[A-Za-z][a-z]*)*")
+# 中文释义只允许汉字和中文标点，出现括号、英文、数字等说明需要AI判断
+_CHINESE_RE = re.compile(r"[\u4e00-\u9fff，、…；;]+")
+# 词性之间只隔着这些字符时（如 n./adj.），共用后面的释义
+_POS_JOINERS = set('/&, ')
+_SENSE_SEPARATOR = re.compile(r'[；;]')
+
+
+def parse_entry(entry):
+    """高置信时返回条目对应的记录行列表，否则返回None"""
+    line = entry.strip()
+    if not line or '\n' in line:
+        return None
+    # 音标放在/.../中，要求成对出现
+    if line.count('/') % 2:
+        return None
+    senses = parse_line(line)
+    if not senses or not all(sense['pos'] for sense in senses):
+        return None
+
+    # parse_line会清理掉括号等字符，这里按同样的词性位置取原文，用来判断英文和释义本身是否干净
+    text = remove_inline_slash_content(line)
+    matches = list(iter_pos_tags(text))
+    english = text[:matches[0].start()].strip().rstrip("'")
+    if (not _WORD_RE.fullmatch(english) or english != senses[0]['english'].strip()
+            or detect_type(english) != 0):
+        return None
+
+    records = []
+    shared_pos = []
+    for i, match in enumerate(matches):
+        pos = match.group(0)
+        if pos not in LOCAL_POS:
+            return None
+        shared_pos.append(pos)
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        chinese = text[match.end():end].strip()
+        if not chinese or set(chinese) <= _POS_JOINERS:
+            continue
+        if not _CHINESE_RE.fullmatch(chinese):
+            return None
+        meanings = [meaning.strip('，、 ') for meaning in _SENSE_SEPARATOR.split(chinese)]
+        if not all(meanings):
+            return None
+        records.extend(f"|{english}|{meaning}|{pos}|0|NULL|" for pos in shared_pos for meaning in meanings)
+        shared_pos = []
+    if shared_pos or not records:
+        return None
+    return records
+
+
+def split_local(entries):
+    """把条目分为本地可解析的和需要发给LLM的，返回({条目序号: 记录行列表}, [需要LLM的条目序号])"""
+    local = {}
+    residue = []
+    for i, entry in enumerate(entries):
+        records = parse_entry(entry)
+        if records is None:
+            residue.append(i)
+        else:
+            local[i] = records
+    return local, residue
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='统计可在本地解析的条目比例')
+    parser.add_argument('files', nargs='+', help='单词表txt文件')
+    parser.add_argument('--show', type=int, default=0, help='显示前N条本地解析结果')
+    args = parser.parse_args()
+
+    total = offloaded = 0
+    shown = 0
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = split_entries(f.read().splitlines(True))
+        local, residue = split_local(entries)
+        total += len(entries)
+        offloaded += len(local)
+        print(f"{path}: {len(local)}/{len(entries)} 个条目可本地解析 ({len(local) / max(1, len(entries)) * 100:.1f}%)")
+        for i, records in local.items():
+            if shown >= args.show:
+                break
+            print(f"  {entries[i].strip()}  ->  {' '.join(records)}")
+            shown += 1
+    print(f"合计: {offloaded}/{total} ({offloaded / max(1, total) * 100:.1f}%)")
@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+本地模拟LLM服务 - 兼容OpenAI的 /v1/chat/completions（含stream=True的SSE）与 /v1/models，
+按提示词中的原始内容生成看起来合理的记录，可注入延迟分布、429/502/503错误率、被截断的输出和有缺陷的记录，
+用于离线压测 ai_processor、recover、llm_txt_to_db 的并发、重试与缓存，不消耗免费额度
+用法：python mock_llm_server.py --port 8900 --latency lognormal:0.5,0.4 --errors 429=0.05,503=0.02 --truncate 0.05
+      LLM_BASE_URL=http://127.0.0.1:8900/v1 python main.py
+同一个请求体第n次到达时的延迟、错误和截断由(--seed, 请求体, n)决定，与并发顺序无关，结果可复现
+"""
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from entry_chunker import estimate_tokens, split_entries
+from local_parser import parse_entry
+from pos_lexicon import iter_pos_tags
+from txt_to_excel_and_db import detect_type, remove_inline_slash_content
+
+DEFAULT_MODELS = ["THUDM/GLM-4-9B-0414", "Qwen/Qwen2.5-7B-Instruct", "deepseek/deepseek-v3-base:free"]
+
+_CHINESE_RE = re.compile(r"[\u4e00-\u9fff，、…；]+")
+_ENGLISH_RE = re.compile(r"[A-Za-z][A-Za-z'\-., ]*")
+
+
+def parse_latency(spec):
+    """解析延迟分布，返回rng -> 秒数：fixed:0.5、uniform:0.2,1.5、lognormal:mu,sigma（中位数为e^mu秒）"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.uniform(*values)
+    if kind == 'lognormal' and len(values) == 2:
+        return lambda rng: rng.lognormvariate(*values)
+    raise ValueError(f"无法识别的延迟分布: {spec}")
+
+
+def parse_errors(spec):
+    """解析错误率，如 429=0.05,502=0.01,503=0.02"""
+    rates = {}
+    for item in filter(None, (spec or '').split(',')):
+        status, _, rate = item.partition('=')
+        rates[int(status)] = float(rate)
+    return rates
+
+
+class MockConfig:
+    """模拟服务的行为参数"""
+
+    def __init__(self, latency='lognormal:-0.5,0.5', errors=None, truncate=0.0, token_delay=0.0,
+                 chunk_chars=16, seed=0, models=None, malformed=0.0, json_layout='lines'):
+        self.latency_spec = latency
+        self.latency = parse_latency(latency)
+        self.errors = errors or {}
+        self.truncate = truncate
+        self.token_delay = token_delay
+        self.chunk_chars = chunk_chars
+        self.seed = seed
+        self.models = models or DEFAULT_MODELS
+        self.malformed = malformed
+        self.json_layout = json_layout
+
+
+def extract_content(prompt):
+    """取出提示词中“原始内容如下：”与“请严格按照”之间的单词表，探测请求等其他提示词原样返回"""
+    if '原始内容如下：\n' not in prompt:
+        return prompt
+    content = prompt.split('原始内容如下：\n', 1)[1]
+    return content.rsplit('\n请严格按照', 1)[0]
+
+
+def mock_records(entry):
+    """为一个条目生成 |en|zh|pro|type|promt| 记录；格式规整的沿用本地解析结果"""
+    records = parse_entry(entry)
+    if records:
+        return records
+    if entry.lstrip().startswith('|'):
+        # 错误处理阶段的输入是栏数不足的记录，补足5栏
+        fields = [field.strip() or 'NULL' for field in entry.strip().strip('|').split('|')][:5]
+        if not fields[0] or fields[0] == 'NULL':
+            return []
+        fields += ['NULL'] * (5 - len(fields))
+        if fields[3] not in ('0', '1', '-1'):
+            fields[3] = str(detect_type(fields[0]))
+        return ["|" + "|".join(fields) + "|"]
+    text = remove_inline_slash_content(' '.join(entry.split()))
+    match = next(iter(iter_pos_tags(text)), None)
+    head = text[:match.start()] if match else text
+    english = _ENGLISH_RE.match(head.strip())
+    if not english:
+        return []
+    english = english.group(0).strip(" '-")
+    if not english:
+        return []
+    chinese = '；'.join(_CHINESE_RE.findall(text)) or 'NULL'
+    kind = detect_type(english)
+    pos = match.group(0) if match and kind == 0 else 'NULL'
+    promt = english.split()[0] if kind else 'NULL'
+    return [f"|{english}|{chinese}|{pos}|{kind}|{promt}|"]
+
+
+def malformed_json(record, rng):
+    """模拟模型常见的JSON小错误"""
+    kind = rng.randrange(5)
+    if kind == 0:
+        record.pop('type')
+    elif kind == 1:
+        record['type'] = str(record['type'])
+    text = json.dumps(record, ensure_ascii=False)
+    if kind == 2:
+        return text.replace('"', "'").replace('null', 'None')
+    if kind == 3:
+        return text[:-1]
+    if kind == 4:
+        return text[:-1] + ',}'
+    return text
+
+
+def json_document(items, layout):
+    """按layout把JSON记录（及段标记）拼成 {"records": [...]} 文档：
+    lines-每条记录一行（提示词要求的格式），pretty-缩进格式化，compact-整个文档写在一行（段标记仍单独成行）
+    """
+    last = max((i for i, (is_marker, _) in enumerate(items) if not is_marker), default=None)
+    parts = ['{"records": [']
+    for i, (is_marker, text) in enumerate(items):
+        if is_marker:
+            parts.append(f"\n{text}\n")
+            continue
+        comma = ',' if i != last and not text.endswith(',') else ''
+        if layout == 'pretty' and text.startswith('{"'):
+            text = json.dumps(json.loads(text), ensure_ascii=False, indent=2)
+        if layout == 'pretty':
+            text = '    ' + text.replace('\n', '\n    ')
+        separator = ' ' if layout == 'compact' else '\n'
+        if not parts[-1].endswith('\n'):
+            parts.append(separator)
+        parts.append(text + comma)
+    parts.append('' if parts[-1].endswith('\n') or layout == 'compact' else '\n')
+    parts.append(']}')
+    return ''.join(parts)
+
+
+def mock_completion(prompt, rng=None, malformed=0.0, json_layout='lines'):
+    """按提示词要求的格式生成补全内容：ai_processor要求5栏记录（或JSON输出模式下的JSON记录，分行方式由json_layout决定），
+    recover与llm_txt_to_db要求“英文 词性. 中文”；malformed为输出有缺陷记录的比例（5栏记录少一栏，JSON有小错误）
+    """
+    content = extract_content(prompt)
+    if content is prompt:
+        return "Hello"
+    json_mode = '{"records": [' in prompt
+    broken = (lambda: rng.random() < malformed) if rng is not None and malformed else (lambda: False)
+    # 打包的多段内容逐段处理，原样输出段标记
+    sections = re.split(r'^(#+\s*第\d+段)\s*$', content, flags=re.M)
+    output = []
+    for i, text in enumerate(sections):
+        if i % 2:
+            output.append((True, text) if json_mode else text)
+            continue
+        records = [record for entry in split_entries(text.strip('\n').splitlines(True))
+                   for record in mock_records(entry)]
+        for record in records:
+            en, zh, pos, kind, promt = record.strip('|').split('|')[:5]
+            if json_mode:
+                item = {'en': en, 'zh': zh, 'pro': None if pos == 'NULL' else pos, 'type': int(kind),
+                        'promt': None if promt == 'NULL' else promt}
+                output.append((False, malformed_json(item, rng) if broken() else json.dumps(item, ensure_ascii=False)))
+            elif '5栏' in prompt:
+                output.append(f"|{en}|{zh}|{pos}|{kind}|" if broken() else record)
+            else:
+                output.append(f"{en} {pos if pos != 'NULL' else 'phr.'} {zh}")
+    if json_mode:
+        return json_document(output, json_layout)
+    return '\n'.join(output)
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.stats = {'requests': 0, 'streams': 0, 'truncated': 0, 'errors': {}}
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def request_rng(self, body):
+        """同一请求体第n次到达时使用固定的随机序列"""
+        digest = hashlib.sha256(body).hexdigest()
+        with self._lock:
+            n = self._seen.get(digest, 0)
+            self._seen[digest] = n + 1
+        return random.Random(f"{self.config.seed}:{digest}:{n}")
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def count_error(self, status):
+        with self._lock:
+            self.stats['errors'][status] = self.stats['errors'].get(status, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            errors = ', '.join(f"{status} {n} 次" for status, n in sorted(self.stats['errors'].items())) or '无'
+            return (f"模拟服务: 请求 {self.stats['requests']} 次（流式 {self.stats['streams']}）, "
+                    f"截断 {self.stats['truncated']} 次, 注入错误 {errors}")
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            models = [{'id': model, 'object': 'model', 'owned_by': 'mock'} for model in self.server.config.models]
+            self._send_json(200, {'object': 'list', 'data': models})
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+        try:
+            payload = json.loads(body)
+            prompt = payload['messages'][-1]['content']
+        except (ValueError, KeyError, IndexError, TypeError):
+            self._send_json(400, {'error': {'message': 'invalid request body'}})
+            return
+
+        server = self.server
+        config = server.config
+        rng = server.request_rng(body)
+        server.count('requests')
+
+        # 注入错误：按状态码依次掷骰子
+        for status, rate in sorted(config.errors.items()):
+            if rng.random() < rate:
+                server.count_error(status)
+                time.sleep(min(config.latency(rng), 1.0) * 0.1)
+                headers = {'Retry-After': '1'} if status == 429 else None
+                self._send_json(status, {'error': {'message': f'mock error {status}', 'code': status}}, headers)
+                return
+
+        model = payload.get('model') or config.models[0]
+        max_tokens = int(payload.get('max_tokens') or 2048)
+        content = mock_completion(prompt, rng, config.malformed, config.json_layout)
+        finish_reason = 'stop'
+        completion_tokens = estimate_tokens(content, model)
+        keep = None
+        if completion_tokens > max_tokens:
+            keep = max_tokens / completion_tokens
+        elif content != "Hello" and rng.random() < config.truncate:
+            keep = rng.uniform(0.3, 0.9)
+        if keep is not None:
+            # 截断在某一行中间，与真实服务达到max_tokens时一致
+            content = content[:max(1, math.floor(len(content) * keep))]
+            finish_reason = 'length'
+            completion_tokens = max_tokens
+            server.count('truncated')
+        usage = {'prompt_tokens': estimate_tokens(prompt, model), 'completion_tokens': completion_tokens}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        created = int(time.time())
+        completion_id = f"mock-{rng.getrandbits(48):012x}"
+
+        # 首字节前的延迟（排队 + 预填充）
+        time.sleep(config.latency(rng))
+
+        if not payload.get('stream'):
+            self._send_json(200, {
+                'id': completion_id, 'object': 'chat.completion', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                             'finish_reason': finish_reason}],
+                'usage': usage,
+            })
+            return
+
+        server.count('streams')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def event(delta, finish=None, extra=None):
+            data = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                    'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish}]}
+            data.update(extra or {})
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+        try:
+            self._write_chunk(event({'role': 'assistant', 'content': ''}))
+            for start in range(0, len(content), config.chunk_chars):
+                if config.token_delay:
+                    time.sleep(config.token_delay)
+                self._write_chunk(event({'content': content[start:start + config.chunk_chars]}))
+            self._write_chunk(event({}, finish_reason, {'usage': usage}))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端超过总时限后主动断开
+            self.close_connection = True
+
+
+def start_server(config, host='127.0.0.1', port=0):
+    """在后台线程启动模拟服务，返回server（server.server_port为实际端口），用完调用server.shutdown()"""
+    server = MockLLMServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency', default='lognormal:-0.5,0.5',
+                        help='首字节延迟分布：fixed:秒 / uniform:最小,最大 / lognormal:mu,sigma')
+    parser.add_argument('--errors', default='', help='注入错误率，如 429=0.05,502=0.01,503=0.02')
+    parser.add_argument('--truncate', type=float, default=0.0, help='输出被截断（finish_reason=length）的比例')
+    parser.add_argument('--malformed', type=float, default=0.0,
+                        help='有缺陷记录的比例（5栏记录少一栏，JSON输出有引号、逗号、缺字段等小错误）')
+    parser.add_argument('--json-layout', choices=['lines', 'pretty', 'compact'], default='lines',
+                        help='JSON输出的分行方式: lines-每条记录一行, pretty-缩进格式化, compact-整个文档一行')
+    parser.add_argument('--token-delay', type=float, default=0.0, help='流式输出每个片段之间的间隔（秒）')
+    parser.add_argument('--chunk-chars', type=int, default=16, help='流式输出每个片段的字符数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+
+
+def config_from_args(args):
+    return MockConfig(latency=args.latency, errors=parse_errors(args.errors), truncate=args.truncate,
+                      token_delay=args.token_delay, chunk_chars=args.chunk_chars, seed=args.seed,
+                      malformed=args.malformed, json_layout=args.json_layout)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='兼容OpenAI接口的本地模拟LLM服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8900, help='监听端口')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockLLMServer((args.host, args.port), config_from_args(args))
+    print(f"模拟LLM服务已启动: http://{args.host}:{server.server_port}/v1")
+    print(f"使用方法: LLM_BASE_URL=http://{args.host}:{server.server_port}/v1 python main.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(server.summary())
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+模型健康检查 - 并发探测模型可用性与响应延迟，结果带TTL缓存到磁盘，供后续按速度排序模型
+缓存按接口地址分开保存，本地模拟服务或其他地址的探测结果不会用于真实接口
+"""
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_CACHE_PATH = 'model_health.json'
+DEFAULT_TTL = 30 * 60  # 秒
+FAILURE_TTL = 60  # 探测失败的记录只缓存很短时间，模型恢复后很快会被重新探测
+
+_cache_lock = threading.Lock()
+
+
+def _load_endpoints(cache_path):
+    """读取整个缓存文件，返回 {接口地址: {模型: 健康记录}}（旧版不分接口地址的缓存忽略，重新探测）"""
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('endpoints', {})
+    except (OSError, ValueError):
+        return {}
+
+
+def load_health(cache_path=DEFAULT_CACHE_PATH, endpoint=''):
+    """读取某接口地址的缓存，返回 {模型: {'ok': bool, 'latency': 秒或None, 'checked_at': 时间戳}}"""
+    return _load_endpoints(cache_path).get(endpoint, {})
+
+
+def save_health(health, cache_path=DEFAULT_CACHE_PATH, endpoint=''):
+    endpoints = _load_endpoints(cache_path)
+    endpoints[endpoint] = health
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'endpoints': endpoints}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+def is_fresh(entry, ttl=DEFAULT_TTL, now=None, failure_ttl=FAILURE_TTL):
+    """记录是否仍在有效期内；探测失败的记录的有效期不超过failure_ttl"""
+    if entry is None:
+        return False
+    if not entry.get('ok'):
+        ttl = min(ttl, failure_ttl)
+    return (now or time.time()) - entry.get('checked_at', 0) < ttl
+
+
+def check_models(models, probe, cache_path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_workers=8,
+                 on_result=None, endpoint='', failure_ttl=FAILURE_TTL):
+    """并发探测models（自动去重），缓存未过期的模型不再探测；endpoint为probe所用的接口地址，缓存按它区分
+
+    probe(model)返回延迟秒数，不可用时返回None；on_result(model, entry, cached)在每个结果产生时回调
+    返回 {模型: 健康记录}
+    """
+    models = list(dict.fromkeys(models))
+    with _cache_lock:
+        health = load_health(cache_path, endpoint)
+    now = time.time()
+    results = {}
+    to_probe = []
+    for model in models:
+        entry = health.get(model)
+        if is_fresh(entry, ttl, now, failure_ttl):
+            results[model] = entry
+            if on_result:
+                on_result(model, entry, True)
+        else:
+            to_probe.append(model)
+
+    if to_probe:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(to_probe)))) as executor:
+            futures = {executor.submit(probe, model): model for model in to_probe}
+            for future in as_completed(futures):
+                model = futures[future]
+                try:
+                    latency = future.result()
+                except Exception:
+                    latency = None
+                entry = {'ok': latency is not None, 'latency': latency, 'checked_at': time.time()}
+                results[model] = entry
+                if on_result:
+                    on_result(model, entry, False)
+        with _cache_lock:
+            health = load_health(cache_path, endpoint)
+            health.update({model: results[model] for model in to_probe})
+            save_health(health, cache_path, endpoint)
+
+    return {model: results[model] for model in models}
+
+
+def rank_models(health):
+    """可用模型按探测延迟从快到慢排序"""
+    available = [(entry['latency'], model) for model, entry in health.items() if entry.get('ok')]
+    return [model for _, model in sorted(available)]
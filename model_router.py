@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+模型路由 - 按模型维护响应延迟与成功率的EWMA，每个请求发给当前得分最好的模型；
+主请求超过该模型的p95延迟仍未返回时，向次优模型发出对冲请求，先返回有效结果者胜出。
+对冲请求数受比例上限约束，避免在免费额度上重复花费过多请求；传入slots时对冲请求另占一个全局在途名额，没有空闲名额就不对冲
+"""
+import time
+import math
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+EWMA_ALPHA = 0.2
+PRIOR_LATENCY = 30.0        # 尚无统计的模型的假定延迟（秒）
+MIN_SUCCESS = 0.05          # 成功率的下限，避免得分除以0
+LATENCY_WINDOW = 50         # 计算p95时保留的最近成功请求数
+MIN_SAMPLES = 5             # 样本不足时用默认对冲等待时间
+DEFAULT_HEDGE_DELAY = 30.0
+MIN_HEDGE_DELAY = 2.0
+HEDGE_MAX_RATIO = 0.1       # 对冲请求数不超过主请求数的10%（另加HEDGE_BURST次）
+HEDGE_BURST = 2
+
+
+class ModelStats:
+    """单个模型的统计：成功请求延迟的EWMA与滑动窗口、成功率的EWMA"""
+
+    def __init__(self):
+        self.latency = None
+        self.success = 1.0
+        self.window = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def record(self, latency, ok):
+        self.requests += 1
+        self.success += EWMA_ALPHA * ((1.0 if ok else 0.0) - self.success)
+        if ok:
+            self.window.append(latency)
+            self.latency = latency if self.latency is None else self.latency + EWMA_ALPHA * (latency - self.latency)
+        else:
+            self.failures += 1
+
+    def score(self):
+        """期望耗时：延迟 / 成功率，越小越好"""
+        latency = PRIOR_LATENCY if self.latency is None else self.latency
+        return latency / max(self.success, MIN_SUCCESS)
+
+    def p95(self):
+        if len(self.window) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.window)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+class ModelRouter:
+    """线程安全的模型路由器"""
+
+    def __init__(self, hedge_ratio=HEDGE_MAX_RATIO, hedge_burst=HEDGE_BURST,
+                 default_hedge_delay=DEFAULT_HEDGE_DELAY, max_workers=32):
+        self.hedge_ratio = hedge_ratio
+        self.hedge_burst = hedge_burst
+        self.default_hedge_delay = default_hedge_delay
+        self.stats = {}
+        self.primaries = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='router')
+
+    def _stats(self, model):
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = ModelStats()
+        return stats
+
+    def record(self, model, latency, ok):
+        with self._lock:
+            self._stats(model).record(latency, ok)
+
+    def rank(self, models, preferred=None):
+        """按得分从好到差排序；得分相同（如都没有统计）时preferred在前，其余保持原顺序"""
+        with self._lock:
+            scores = {m: self._stats(m).score() for m in models}
+        order = sorted(range(len(models)), key=lambda i: (scores[models[i]], models[i] != preferred, i))
+        return [models[i] for i in order]
+
+    def hedge_delay(self, model):
+        """主请求等待多久后发出对冲：该模型的p95延迟，样本不足时用默认值"""
+        with self._lock:
+            p95 = self._stats(model).p95()
+        return max(MIN_HEDGE_DELAY, p95 if p95 is not None else self.default_hedge_delay)
+
+    def _take_hedge(self, model):
+        """检查对冲配额，允许时计数并返回True"""
+        with self._lock:
+            if self.hedges >= self.hedge_ratio * self.primaries + self.hedge_burst:
+                return False
+            self.hedges += 1
+            self._stats(model).hedges += 1
+            return True
+
+    def _run(self, call, model):
+        """执行一次调用，返回(模型, 结果, 异常, 耗时)"""
+        start = time.monotonic()
+        try:
+            result = call(model)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        elapsed = time.monotonic() - start
+        return model, result, error, elapsed
+
+    def call(self, call, models, preferred=None, validate=None, hedge=True, rank=True, slots=None):
+        """依次把请求路由给得分最好的模型，返回(模型, 结果, 失败列表)
+
+        call(model)返回结果或抛出异常；validate(结果)为False时视为失败。
+        主请求超过p95延迟时向下一个模型发出对冲请求，先返回有效结果者胜出，落后的请求在后台完成并计入统计。
+        slots为调用方共享的在途请求信号量（主请求的名额由调用方持有），对冲请求非阻塞地另取一个名额，请求结束时归还。
+        rank=False时按给定顺序尝试。所有模型都失败时模型和结果为None；失败列表为[(模型, 异常或None)]
+        """
+        order = self.rank(list(models), preferred) if rank else list(models)
+        failures = []
+        with self._lock:
+            self.primaries += 1
+        in_flight = {}
+        position = 0
+
+        def launch(is_hedge=False, slot=False):
+            nonlocal position
+            model = order[position]
+            position += 1
+            future = self._executor.submit(self._run, call, model)
+            if slot:
+                # 落后的对冲请求同样要等它真正结束才归还名额
+                future.add_done_callback(lambda _: slots.release())
+            in_flight[future] = (model, is_hedge)
+            return future
+
+        launch()
+        while in_flight:
+            timeout = None
+            if hedge and len(in_flight) == 1 and position < len(order):
+                primary_model = next(iter(in_flight.values()))[0]
+                timeout = self.hedge_delay(primary_model)
+            done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # 主请求超过p95仍未返回，配额允许且有空闲的全局名额时向次优模型发出对冲请求；
+                # 名额已满时本轮不对冲，再等一个p95后重试
+                slot = slots is not None
+                if slot and not slots.acquire(blocking=False):
+                    continue
+                if self._take_hedge(order[position]):
+                    launch(is_hedge=True, slot=slot)
+                else:
+                    if slot:
+                        slots.release()
+                    hedge = False
+                continue
+            for future in done:
+                model, is_hedge = in_flight.pop(future)
+                _, result, error, elapsed = future.result()
+                ok = error is None and (validate is None or validate(result))
+                self.record(model, elapsed, ok)
+                if ok:
+                    if is_hedge:
+                        with self._lock:
+                            self._stats(model).hedge_wins += 1
+                    # 落后的请求不能中途取消，完成后在后台记入统计
+                    for pending, (other, _) in in_flight.items():
+                        pending.add_done_callback(self._late_result(other, validate))
+                    return model, result, failures
+                failures.append((model, error))
+            # 已在途的请求都失败了，立即换下一个模型（不等待）
+            if not in_flight and position < len(order):
+                launch()
+        return None, None, failures
+
+    def _late_result(self, model, validate):
+        def callback(future):
+            _, result, error, elapsed = future.result()
+            self.record(model, elapsed, error is None and (validate is None or validate(result)))
+        return callback
+
+    def summary(self):
+        """各模型的统计，用于运行结束时打印"""
+        with self._lock:
+            lines = [f"模型路由: 主请求 {self.primaries} 次, 对冲 {self.hedges} 次"]
+            for model, stats in sorted(self.stats.items(), key=lambda item: item[1].score()):
+                if not stats.requests:
+                    continue
+                latency = f"{stats.latency:.2f}s" if stats.latency is not None else "-"
+                p95 = stats.p95()
+                lines.append(f"  {model}: 请求 {stats.requests}, 失败 {stats.failures}, "
+                             f"延迟EWMA {latency}, p95 {f'{p95:.2f}s' if p95 is not None else '-'}, "
+                             f"成功率 {stats.success:.2f}, 对冲 {stats.hedges}（胜出 {stats.hedge_wins}）")
+        return "\n".join(lines)
+
+
+_shared_router = None
+_shared_lock = threading.Lock()
+
+
+def get_router(**kwargs):
+    """进程内共享的路由器实例"""
+    global _shared_router
+    with _shared_lock:
+        if _shared_router is None:
+            _shared_router = ModelRouter(**kwargs)
+        return _shared_router
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+近似重复检测 - 在整个统一词汇库（跨字母、跨来源）中查找OCR变体、标点差异、重复扫描造成的近似重复释义
+先做全角/半角、空白、标点规范化，规范化后完全相同的记录直接归组；
+其余记录用字符3-gram的MinHash签名 + LSH分桶找候选对，再以精确Jaccard相似度确认，整体近线性。
+用法：
+    python near_duplicates.py --db vocab.db --output merge_candidates.csv --threshold 0.7
+"""
+import csv
+import zlib
+import sqlite3
+import argparse
+import unicodedata
+
+import numpy as np
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16            # 16个band × 4行，候选阈值约为 (1/16)^(1/4) ≈ 0.5
+MAX_BUCKET = 200      # 超大的桶只与桶内第一条配对，避免平方级膨胀
+BLOCK_SIZE = 5000     # 分块计算签名，控制内存
+_MERSENNE = np.uint64((1 << 61) - 1)
+
+
+def normalize_text(text):
+    """全角转半角、统一小写，去掉空白和标点，只保留字母数字与汉字"""
+    text = unicodedata.normalize('NFKC', text or '').lower()
+    return ''.join(c for c in text if c.isalnum())
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """字符n-gram的crc32哈希集合；短于n的文本整体作为一个shingle"""
+    if len(text) <= size:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + size].encode('utf-8')) for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def minhash_signatures(shingle_sets, num_perm=NUM_PERM, seed=1):
+    """批量计算MinHash签名矩阵 (记录数, num_perm)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 31, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 31, num_perm, dtype=np.uint64)
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+    for start in range(0, len(shingle_sets), BLOCK_SIZE):
+        block = shingle_sets[start:start + BLOCK_SIZE]
+        lengths = np.fromiter((len(s) for s in block), dtype=np.int64, count=len(block))
+        hashes = np.fromiter((h for s in block for h in s), dtype=np.uint64, count=int(lengths.sum()))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        values = (hashes[:, None] * a + b) % _MERSENNE
+        signatures[start:start + len(block)] = np.minimum.reduceat(values, offsets, axis=0)
+    return signatures
+
+
+def lsh_candidate_pairs(signatures, bands=BANDS, max_bucket=MAX_BUCKET):
+    """按band分桶，同桶记录两两成为候选对（下标对，小的在前）"""
+    count, num_perm = signatures.shape
+    rows = num_perm // bands
+    mixers = np.random.default_rng(7).integers(1, 1 << 63, rows, dtype=np.uint64) | np.uint64(1)
+    pairs = set()
+    for band in range(bands):
+        band_sig = signatures[:, band * rows:(band + 1) * rows]
+        keys = np.bitwise_xor.reduce(band_sig * mixers, axis=1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_keys)) + 1))
+        ends = np.append(starts[1:], count)
+        shared = ends - starts >= 2     # 只遍历成员数≥2的桶
+        for start, end in zip(starts[shared].tolist(), ends[shared].tolist()):
+            members = sorted(order[start:end].tolist())
+            if len(members) > max_bucket:
+                first = members[0]
+                pairs.update((first, other) for other in members[1:])
+            else:
+                for i in range(len(members)):
+                    for j in range(i + 1, len(members)):
+                        pairs.add((members[i], members[j]))
+    return pairs
+
+
+def find_near_duplicates(items, threshold=0.7):
+    """items为[(id, text)]，返回[(id_a, id_b, 相似度)]，按相似度降序
+
+    规范化后完全相同的记录与组内第一条配对（相似度1.0），其余经MinHash/LSH找候选后精确确认
+    """
+    groups = {}
+    for item_id, text in items:
+        groups.setdefault(normalize_text(text), []).append(item_id)
+
+    results = []
+    representatives = []
+    for key, ids in groups.items():
+        results.extend((ids[0], other, 1.0) for other in ids[1:])
+        if key:
+            representatives.append((ids[0], key))
+
+    if len(representatives) > 1:
+        shingle_sets = [shingles(key) for _, key in representatives]
+        signatures = minhash_signatures(shingle_sets)
+        for i, j in lsh_candidate_pairs(signatures):
+            similarity = jaccard(shingle_sets[i], shingle_sets[j])
+            if similarity >= threshold:
+                results.append((representatives[i][0], representatives[j][0], round(similarity, 4)))
+
+    results.sort(key=lambda r: (-r[2], r[0], r[1]))
+    return results
+
+
+def find_store_duplicates(db_path, threshold=0.7):
+    """对统一词汇库中全部释义做近似重复检测，返回(记录字典, 候选对)"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('''SELECT id, letter, english, pos, chinese, source
+                               FROM vocabulary_view ORDER BY id''').fetchall()
+    finally:
+        conn.close()
+    records = {row[0]: row for row in rows}
+    # 与remove_duplicates一致，以英文+中文判断重复
+    items = [(row[0], f"{row[2]} {row[4]}") for row in rows]
+    return records, find_near_duplicates(items, threshold)
+
+
+def write_candidates_csv(records, pairs, csv_path):
+    with open(csv_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['相似度',
+                         'id_a', '字母_a', '英文_a', '词性_a', '中文_a', '来源_a',
+                         'id_b', '字母_b', '英文_b', '词性_b', '中文_b', '来源_b'])
+        for id_a, id_b, similarity in pairs:
+            writer.writerow([similarity, *records[id_a], *records[id_b]])
+
+
+if __name__ == '__main__':
+    import time
+    parser = argparse.ArgumentParser(description='统一词汇库近似重复检测')
+    parser.add_argument('--db', default='vocab.db', help='统一词汇库路径(默认: vocab.db)')
+    parser.add_argument('--output', default='merge_candidates.csv', help='合并候选CSV输出路径')
+    parser.add_argument('--threshold', type=float, default=0.7, help='Jaccard相似度阈值(默认: 0.7)')
+    args = parser.parse_args()
+
+    start = time.time()
+    records, pairs = find_store_duplicates(args.db, args.threshold)
+    write_candidates_csv(records, pairs, args.output)
+    print(f"检查 {len(records)} 条释义，找到 {len(pairs)} 对合并候选，用时 {time.time() - start:.2f} 秒")
+    print(f"结果已保存到: {args.output}")
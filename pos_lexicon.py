@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+词性标签词典 - formatter、txt_to_excel_and_db、extract_words 共用同一份词性列表和预编译匹配器
+"""
+import re
+
+# 词性列表
+POS_TAGS = [
+    "v.","vr.", "vt.", "vi.", "v.link.", "mod.", "aux.", "n.", "[c].", "[pl.]", "[Cpl.]", "[Csing.]", "[U].",
+    "adj.", "adv.", "prep.", "pron."
+]
+
+# 模块加载时编译一次；按长度降序排列备选项，保证最长匹配优先（如 v.link. 优先于 v.）
+_POS_PATTERN = re.compile('|'.join(re.escape(tag) for tag in sorted(POS_TAGS, key=len, reverse=True)))
+
+
+def iter_pos_tags(text):
+    """按出现顺序迭代行内所有词性标签的匹配对象（不重叠，最长匹配优先）"""
+    return _POS_PATTERN.finditer(text)
+
+
+def find_pos_tags(text):
+    """返回行内所有词性标签的位置列表 [(start, end, tag)]"""
+    return [(m.start(), m.end(), m.group(0)) for m in _POS_PATTERN.finditer(text)]
+
+
+def match_pos_at(text, pos=0):
+    """text在pos处以词性标签开头时返回该标签，否则返回None"""
+    m = _POS_PATTERN.match(text, pos)
+    return m.group(0) if m else None
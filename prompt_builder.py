@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+提示词构建 - ai_processor发给LLM的指令与原始内容的拼装，以及指令开销的统计
+指令部分与每块约2KB的内容差不多大、每个请求都要重发，因此提供：
+1. 精简版指令（AI_COMPACT_PROMPT=1），只保留格式定义和两个示例；
+2. 多段打包：把若干段内容用“### 第k段”标记放进一个请求，回复按同样的标记拆回各段；
+3. 统计实际发出的请求中指令与内容各占的token数，运行结束时打印
+用法：python prompt_builder.py txt/h/1_merged.txt   # 比较各种指令在该文件上的token占比
+"""
+import re
+import argparse
+import threading
+
+from entry_chunker import chunk_text, estimate_tokens
+
+FULL_HEADER = (
+    "请将以下单词表内容修正为标准格式，每行一个单词，格式如下：。\n"
+    "每一行都由个元素组成，分别为：\n"
+    "en：英文单词/词组/句子\n"
+    "zh：中文释义，如果中文释义中间存在分号，则分号分割了2个不同的释义。\n"
+    "pro：词性（注：只有单词有词性，词组与句子的词性设为NULL）\n"
+    "type：en类型（注：句子的type为1,单词的type为0,词组的type为-1）\n"
+    "promt：对于type为词组和句子的en,根据上文（不查找下文）找出最有可能的原单词，即该词组中保有的最低有效提示单词\n"
+    "如果原始内容有格式错误、缺失、顺序混乱、缺少词性等，请自动补全和修正。\n"
+    "同时，对于多个解释，请另起一行，重复英文，并继续输出相关内容。其中“/”之间可能混有音标，这个不管，直接丢弃。\n"
+    "单词性、单释义示例：\n"
+    "|abandon|放弃|vt.|0|NULL|\n"
+    "多词性、多释义示例：\n"
+    "输入为：contrary/'kontrari/ n./adj. 相反\n 输出为：\n"
+    "|contrary|相反|n.|0|NULL|\n"
+    "|contrary|相反|adj.|0|NULL|\n"
+    "或者：\n"
+    "输入为：shoulder/feulde/ n. 肩膀 vt. 挑起，扛起；担负 \n"
+    "输出为：\n"
+    "|shoulder|肩膀|n.|0|NULL|\n"
+    "|shoulder|挑起，扛起；担负|vt.|0|NULL|\n"
+    "输入：host n. 主人 vt. 做东\n"
+    "输出：|host|主人|n.|0|NULL|\n"
+    "|host|做东|vt.|0|NULL|\n"
+    "单词性、多释义示例：\n"
+    "输入为：consume /ken'sju:m/ vt.消费；吃，喝；消耗\n"
+    "输出为：\n |consume|消费|vt.|0|NULL|\n |consume|吃，喝|vt.|0|NULL|\n |consume|消耗|vt.|0|NULL|\n"
+    "词组示例：\n"
+    "|consider doing|考虑做……|NULL|-1|consider|\n"
+    "句子示例：\n"
+    "输入为：As we get older, we often find it difficult to understand(v.) music. 年龄增长时，我们常常发现难以理解音乐。\n"
+    "输出为：\n |As we get older, we often find it difficult to understand music.|年龄增长时，我们常常发现难以理解音乐。|NULL|1|understand|\n"
+    "如果有多词性或多义项，请分多行输出。不要输出多余解释和说明，只输出修正后的内容。同时，在句子或者词组中，如果英文部分有用括号包裹的词性，则也丢弃\n"
+    "如果有明显的语义缺失、无法有效根据上下文补全的，丢弃这一行\n"
+    "每一列由\"|\"分割，\"|\"与内容之间不要添加空格\n"
+    "原始内容如下：\n"
+)
+FULL_TRAILER = (
+    "请严格按照上述格式输出。**务必要输出5栏**，如果实在没有找到相关项，就用NULL代替！！！"
+)
+ERROR_SUFFIX = (
+    "\n\n"
+    "重要提醒：该列表为处理错误的列表，可能缺少一列，请自动分割英文、中文、词性、类型与提示词。\n"
+    "**输出的列表一定有5列，即存在6个\"|\"**，请仔细检查确保每行都有正确的格式。"
+)
+
+COMPACT_HEADER = (
+    "将单词表修正为每行一条记录：|en|zh|pro|type|promt|\n"
+    "en为英文；zh为中文释义；pro为词性（词组、句子为NULL）；type：单词0，词组-1，句子1；"
+    "promt：词组或句子中根据上文最可能的原单词，单词为NULL。\n"
+    "多词性、多释义（分号分隔）分多行输出并重复英文；丢弃/…/之间的音标和英文中括号里的词性；"
+    "自动补全缺失的词性等，无法补全的行丢弃。\"|\"两侧不加空格，只输出记录。\n"
+    "例：shoulder/feulde/ n. 肩膀 vt. 挑起；担负\n"
+    "|shoulder|肩膀|n.|0|NULL|\n"
+    "|shoulder|挑起|vt.|0|NULL|\n"
+    "|shoulder|担负|vt.|0|NULL|\n"
+    "|consider doing|考虑做……|NULL|-1|consider|\n"
+    "原始内容如下：\n"
+)
+COMPACT_TRAILER = "请严格按照上述格式输出，每行5栏，缺项用NULL。"
+COMPACT_ERROR_SUFFIX = "\n注意：上述内容为格式有误的记录，可能缺少一栏，请重新分割为5栏。"
+
+# JSON输出模式（AI_JSON_MODE=1）：每条记录一个JSON对象、单独一行，由json_records在本地校验并转换为记录行
+JSON_TRAILER = (
+    "请严格按照上述字段输出，但改用JSON格式，不要使用“|”分隔：第一行为 {\"records\": [ ，之后每行一条记录，"
+    "字段为en、zh、pro、type、promt（pro、promt没有时为null，type为整数），例如：\n"
+    "{\"en\": \"abandon\", \"zh\": \"放弃\", \"pro\": \"vt.\", \"type\": 0, \"promt\": null},\n"
+    "{\"en\": \"consider doing\", \"zh\": \"考虑做……\", \"pro\": null, \"type\": -1, \"promt\": \"consider\"}\n"
+    "最后一行为 ]} 。多词性、多释义同样分多条记录输出，不要输出其他内容。"
+)
+JSON_ERROR_SUFFIX = "\n注意：上述内容为格式有误的记录，可能缺少一栏，请重新分割为en、zh、pro、type、promt五个字段。"
+
+SECTION_MARK = "### 第{}段"
+_SECTION_RE = re.compile(r"^\s*#+\s*第\s*(\d+)\s*段\s*$")
+
+
+def pack_note(sections):
+    return (f"原始内容分为{sections}段，每段以“{SECTION_MARK.format('k')}”开头。"
+            "请逐段处理，先原样输出该段的标记行，再输出该段的记录，不要合并或遗漏段落。\n")
+
+
+def build_prompt(content, compact=False, is_error_processing=False, sections=1, json_output=False):
+    """拼装发给LLM的提示词；sections>1时content应为pack_contents的结果，json_output要求按JSON逐行输出"""
+    header, trailer, error = ((COMPACT_HEADER, COMPACT_TRAILER, COMPACT_ERROR_SUFFIX) if compact
+                              else (FULL_HEADER, FULL_TRAILER, ERROR_SUFFIX))
+    if json_output:
+        trailer, error = JSON_TRAILER, JSON_ERROR_SUFFIX
+    if sections > 1:
+        header += pack_note(sections)
+    prompt = f"{header}{content}\n{trailer}"
+    if is_error_processing:
+        prompt += error
+    return prompt
+
+
+def pack_contents(contents):
+    """把多段内容用段标记拼成一个请求的内容"""
+    return "\n".join(f"{SECTION_MARK.format(i)}\n{content.strip(chr(10))}" for i, content in enumerate(contents, 1))
+
+
+def split_packed(reply, sections):
+    """按段标记把回复拆回各段，返回长度为sections的列表，缺失的段为None"""
+    parts = {}
+    current = None
+    for line in reply.splitlines():
+        match = _SECTION_RE.match(line)
+        if match:
+            current = int(match.group(1))
+            parts.setdefault(current, [])
+        elif current is not None:
+            parts[current].append(line)
+    return ["\n".join(parts[i]) if i in parts else None for i in range(1, sections + 1)]
+
+
+def instruction_tokens(prompt, content, model=None):
+    """提示词中指令部分（不含原始内容）的token数"""
+    return estimate_tokens(prompt, model) - estimate_tokens(content, model)
+
+
+_stats = {'requests': 0, 'instruction': 0, 'content': 0}
+_stats_lock = threading.Lock()
+
+
+def record_request(prompt, content, model=None):
+    """记录一次实际发出的请求中指令与内容的token数"""
+    content_tokens = estimate_tokens(content, model)
+    with _stats_lock:
+        _stats['requests'] += 1
+        _stats['instruction'] += estimate_tokens(prompt, model) - content_tokens
+        _stats['content'] += content_tokens
+
+
+def usage_summary():
+    """本次运行发出的请求中指令与内容的token占比"""
+    with _stats_lock:
+        total = _stats['instruction'] + _stats['content']
+        if not _stats['requests']:
+            return "提示词: 无请求"
+        return (f"提示词: 请求 {_stats['requests']} 次, 指令 {_stats['instruction']} token, "
+                f"内容 {_stats['content']} token（内容占 {_stats['content'] / total * 100:.1f}%）")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='比较各种指令在单词表上的token占比')
+    parser.add_argument('files', nargs='+', help='单词表txt文件')
+    parser.add_argument('--model', default='Qwen/Qwen2.5-7B-Instruct', help='估算token使用的模型')
+    parser.add_argument('--pack', type=int, default=4, help='打包时每个请求的段数')
+    args = parser.parse_args()
+
+    chunks = []
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            chunks.extend(chunk_text(f.read(), args.model))
+    if not chunks:
+        raise SystemExit("没有内容")
+    packs = [chunks[i:i + args.pack] for i in range(0, len(chunks), args.pack)]
+    print(f"{len(chunks)} 个块，平均每块 {sum(estimate_tokens(c, args.model) for c in chunks) / len(chunks):.0f} token")
+    print(f"{'请求数':>6}{'指令token':>10}{'内容token':>10}{'内容占比':>9}  指令")
+    for name, compact, error, pack in [('完整', False, False, 1), ('完整+错误处理', False, True, 1),
+                                       ('精简', True, False, 1), ('精简+错误处理', True, True, 1),
+                                       (f'完整+打包{args.pack}段', False, False, args.pack),
+                                       (f'精简+打包{args.pack}段', True, False, args.pack)]:
+        groups = packs if pack > 1 else [[c] for c in chunks]
+        instruction = content_tokens = 0
+        for group in groups:
+            content = pack_contents(group) if len(group) > 1 else group[0]
+            prompt = build_prompt(content, compact, error, len(group))
+            instruction += instruction_tokens(prompt, content, args.model)
+            content_tokens += sum(estimate_tokens(c, args.model) for c in group)
+        print(f"{len(groups):>9}{instruction:>10}{content_tokens:>10}"
+              f"{content_tokens / (instruction + content_tokens) * 100:>12.1f}%  {name}")
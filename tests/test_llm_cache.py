@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""LLM缓存测试：命中统计按逻辑请求计数，而非按候选模型计数"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from llm_cache import LLMCache
+from mock_llm_server import MockConfig, start_server
+
+
+def test_get_without_count(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.db'))
+    payload = {'model': 'm', 'messages': [{'role': 'user', 'content': 'x'}]}
+    assert cache.get(payload, count=False) is None
+    cache.put(payload, '| a | b |')
+    assert cache.get(payload, count=False) == '| a | b |'
+    assert (cache.hits, cache.misses) == (0, 0)
+    cache.record_lookup(False)
+    assert cache.get(payload) == '| a | b |'
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_uncached_call_counts_one_miss(tmp_path, monkeypatch):
+    server = start_server(MockConfig(latency='fixed:0.01'))
+    try:
+        # ai_processor在导入时读取这些设置，并把日志写到当前目录
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv('LLM_BASE_URL', f"http://127.0.0.1:{server.server_port}/v1")
+        monkeypatch.setenv('LLM_CACHE_PATH', str(tmp_path / 'llm_cache.db'))
+        monkeypatch.setenv('MODEL_HEALTH_CACHE', str(tmp_path / 'model_health.json'))
+        monkeypatch.setenv('LLM_TELEMETRY', '0')
+        import ai_processor
+        from llm_cache import get_cache
+
+        models = ai_processor.get_available_models('mock', refresh=True)
+        assert len(models) > 1
+        cache = get_cache()
+        hits, misses = cache.hits, cache.misses
+        content, info = ai_processor.call_qwen_api('apple n. 苹果', 'mock', models[0], models)
+        assert content and not info.get('cached')
+        assert (cache.hits - hits, cache.misses - misses) == (0, 1)
+    finally:
+        server.shutdown()
+
+
+def test_eviction_tracks_total(tmp_path):
+    cache = LLMCache(str(tmp_path / 'cache.db'), max_bytes=1000)
+    for i in range(30):
+        cache.put({'model': 'm', 'messages': [{'role': 'user', 'content': str(i)}]}, 'x' * 100)
+    stats = cache.stats()
+    assert stats['bytes'] == cache._total <= 1000
+    cache.put({'model': 'm', 'messages': [{'role': 'user', 'content': '29'}]}, 'y' * 50)
+    cache.delete({'model': 'm', 'messages': [{'role': 'user', 'content': '28'}]})
+    assert cache.stats()['bytes'] == cache._total
+    cache.close()
+    assert LLMCache(str(tmp_path / 'cache.db'))._total == stats['bytes'] - 150
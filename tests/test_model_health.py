@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""模型健康检查测试：失败的探测结果只缓存很短时间"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from model_health import check_models, is_fresh
+
+
+def test_failure_uses_short_ttl():
+    now = 1000.0
+    assert is_fresh({'ok': True, 'checked_at': now - 600}, ttl=1800, now=now, failure_ttl=60)
+    assert not is_fresh({'ok': False, 'checked_at': now - 600}, ttl=1800, now=now, failure_ttl=60)
+    assert is_fresh({'ok': False, 'checked_at': now - 30}, ttl=1800, now=now, failure_ttl=60)
+
+
+def test_failed_model_is_reprobed(tmp_path):
+    cache_path = str(tmp_path / 'model_health.json')
+    probed = []
+
+    def probe(model):
+        probed.append(model)
+        return 0.1 if model == 'up' else None
+
+    check_models(['up', 'down'], probe, cache_path, ttl=1800, failure_ttl=0)
+    check_models(['up', 'down'], probe, cache_path, ttl=1800, failure_ttl=0)
+    assert sorted(probed) == ['down', 'down', 'up']
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""模型路由测试：对冲请求占用共享的在途名额"""
+import os
+import sys
+import time
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import model_router
+from model_router import ModelRouter
+
+
+def slow_primary(model):
+    time.sleep(0.3 if model == 'slow' else 0.05)
+    return model
+
+
+def test_hedge_takes_free_slot(monkeypatch):
+    monkeypatch.setattr(model_router, 'MIN_HEDGE_DELAY', 0.1)
+    router = ModelRouter(default_hedge_delay=0.1)
+    slots = threading.BoundedSemaphore(2)
+    slots.acquire()  # 主请求的名额由调用方持有
+    model, result, _ = router.call(slow_primary, ['slow', 'fast'], rank=False, slots=slots)
+    assert (model, router.hedges) == ('fast', 1)
+    time.sleep(0.4)
+    slots.release()
+    # 落后的对冲请求结束后名额全部归还
+    assert slots.acquire(blocking=False) and slots.acquire(blocking=False)
+
+
+def test_no_hedge_without_free_slot(monkeypatch):
+    monkeypatch.setattr(model_router, 'MIN_HEDGE_DELAY', 0.1)
+    router = ModelRouter(default_hedge_delay=0.1)
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    model, result, _ = router.call(slow_primary, ['slow', 'fast'], rank=False, slots=slots)
+    assert (model, router.hedges) == ('slow', 0)
@@ -1,17 +1,22 @@
 # -*- coding: utf-8 -*-
 """
-将txt单词表自动分组导出到excel和sqlite db，支持括号跨行清理
+将txt单词表自动分组导出到excel和统一词汇库（sqlite db），支持括号跨行清理
 """
 import re
 import os
+from itertools import islice, repeat
+import numpy as np
 import pandas as pd
-import sqlite3
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import xlsxwriter
+from pos_lexicon import POS_TAGS, iter_pos_tags
+from vocab_store import upsert_records
 
-# 词性列表
-POS_LIST = [
-    "v.","vr.", "vt.", "vi.", "v.link.", "mod.", "aux.", "n.", "[c].", "[pl.]", "[Cpl.]", "[Csing.]", "[U].",
-    "adj.", "adv.", "prep.", "pron."
-]
+# 词性列表（统一维护在pos_lexicon.POS_TAGS）
+POS_LIST = POS_TAGS
 
 def remove_brackets_cross_lines(text):
     lefts = ['(', '（']
@@ -42,7 +47,6 @@ def remove_brackets_cross_lines(text):
     result.append(text[last:])
     return ''.join(result)
 
-<<<<<<< HEAD
 def clean_text_keep_punct(text):
     # 保留中英文的'.'和','，去除其他特殊字符
     import re
@@ -59,29 +63,24 @@ def remove_inline_slash_content(line):
     return re.sub(r'/[^/\n]*/', '', line)
 
 
-=======
->>>>>>> 8e7781ddd5932940ce6300496ab4a8827ce32409
 def parse_line(line):
     # 支持一行多词性多中文解释的精确拆分，返回多行结构
     line = line.strip()
     if not line:
         return []
-<<<<<<< HEAD
     # 先丢弃英文部分的/xxx/，不跨行
     line = remove_inline_slash_content(line)
-    import re
-    pos_pattern = r'(' + '|'.join([re.escape(p) for p in POS_LIST]) + r')'
-    pos_matches = list(re.finditer(pos_pattern, line))
+    pos_matches = list(iter_pos_tags(line))
     results = []
     if pos_matches:
         # 原始英文部分为第一个词性前的内容
-        first_pos_start = pos_matches[0].start(1)
+        first_pos_start = pos_matches[0].start()
         eng = line[:first_pos_start].strip()
         eng_clean = clean_text_keep_punct(eng) if eng else ''
         for i, m in enumerate(pos_matches):
-            pos = m.group(1)
-            pos_end = m.end(1)
-            next_pos_start = pos_matches[i+1].start(1) if i+1 < len(pos_matches) else len(line)
+            pos = m.group(0)
+            pos_end = m.end()
+            next_pos_start = pos_matches[i+1].start() if i+1 < len(pos_matches) else len(line)
             chn = line[pos_end:next_pos_start].strip()
             chn_clean = clean_text_keep_punct(chn) if chn else ''
             results.append({'english': eng_clean, 'pos': pos, 'chinese': chn_clean})
@@ -94,38 +93,63 @@ def parse_line(line):
         eng_clean = clean_text_keep_punct(eng) if eng else ''
         chn_clean = clean_text_keep_punct(chn) if chn else ''
         results.append({'english': eng_clean, 'pos': '', 'chinese': chn_clean})
-=======
-    # 英文部分
-    eng_match = re.match(r'^([A-Za-z][A-Za-z\s\-\"]*)', line)
-    eng = eng_match.group(1).strip() if eng_match else None
-    # 词性+中文解释部分
-    rest = line[len(eng):] if eng else line
-    # 匹配所有“词性. 中文”片段
-    pos_chn_pattern = re.compile(r'((?:' + '|'.join([re.escape(p) for p in POS_LIST]) + r'))\s*([\u4e00-\u9fff][^' + ''.join([re.escape(p) for p in POS_LIST]) + r']*)')
-    matches = list(pos_chn_pattern.finditer(rest))
-    results = []
-    if matches:
-        for m in matches:
-            pos = m.group(1).strip()
-            chn = m.group(2).strip()
-            results.append({'english': eng, 'pos': pos, 'chinese': chn})
-    else:
-        # 没有词性，直接找中文
-        chn_match = re.search(r'[\u4e00-\u9fff].*', rest)
-        chn = chn_match.group(0).strip() if chn_match else None
-        results.append({'english': eng, 'pos': '', 'chinese': chn})
->>>>>>> 8e7781ddd5932940ce6300496ab4a8827ce32409
     return results
 
-def process_txt(input_path):
-    # 先整体清理括号（支持跨行）
+BRACKET_LEFTS = '(（'
+BRACKET_RIGHTS = ')）'
+_BRACKET_RE = re.compile(r'[()（）]')
+
+def iter_clean_lines(input_path, chunk_size=64*1024):
+    """按固定大小分块读取文件，跨块维护括号嵌套状态，逐行产出清理后的文本
+
+    结果与 remove_brackets_cross_lines(全文).splitlines() 完全一致。
+    只有尚未闭合的括号内容需要暂存（闭合则整段丢弃，到文件末尾仍未闭合则按原逻辑保留），
+    因此内存占用取决于最长的括号跨度而不是文件大小。
+    """
+    depth = 0
+    bracket_buffer = []  # 最外层未闭合括号起的内容
+    pending = ''         # 已清理但尚未形成完整行的文本
     with open(input_path, 'r', encoding='utf-8') as f:
-        text = f.read()
-    text = remove_brackets_cross_lines(text)
-    lines = text.splitlines()
-    # 解析
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            kept = []
+            last = 0
+            for m in _BRACKET_RE.finditer(chunk):
+                idx = m.start()
+                if depth == 0:
+                    if m.group(0) in BRACKET_RIGHTS:
+                        continue  # 没有配对的右括号原样保留
+                    kept.append(chunk[last:idx])
+                    last = idx
+                    depth = 1
+                elif m.group(0) in BRACKET_LEFTS:
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        # 最外层括号闭合，整段丢弃
+                        bracket_buffer.clear()
+                        last = idx + 1
+            if depth == 0:
+                kept.append(chunk[last:])
+            else:
+                bracket_buffer.append(chunk[last:])
+            # 文本模式已统一换行符，最后一段没有换行符时留到下一块
+            lines = (pending + ''.join(kept)).splitlines(True)
+            pending = lines.pop() if lines and lines[-1].splitlines()[0] == lines[-1] else ''
+            for line in lines:
+                yield line.splitlines()[0]
+    if depth > 0:
+        # 文件末尾仍有未闭合的左括号：该括号保留，其内部已配对的括号照常删除
+        pending += remove_brackets_cross_lines(''.join(bracket_buffer))
+    yield from pending.splitlines()
+
+def process_txt(input_path):
+    # 流式读取并清理括号（支持跨行、跨块）
     records = []
-    for line in lines:
+    for line in iter_clean_lines(input_path):
         parsed_list = parse_line(line)
         for parsed in parsed_list:
             if parsed:
@@ -194,63 +218,168 @@ def group_by_first_letter(records):
         groups[first].append(rec)
     return groups
 
-def enhance_records(records, table_letter=None):
-    # 增加index、type、num、promt、pro列，en/zh/promt/num/type/pro
-    enhanced = []
-    for rec in records:
+# 增强后的列顺序
+ENHANCED_COLUMNS = ['index', 'en', 'zh', 'promt', 'num', 'type', 'pro']
+# 列式增强时每批的记录数
+ENHANCE_BATCH_SIZE = 50000
+# Parquet / Arrow IPC 导出的列类型；字母作为分区目录（letter=a），不存入文件
+COLUMNAR_SCHEMA = pa.schema([
+    ('index', pa.int32()),
+    ('en', pa.string()),
+    ('zh', pa.string()),
+    ('promt', pa.string()),
+    ('num', pa.int32()),
+    ('type', pa.int8()),
+    ('pro', pa.dictionary(pa.int16(), pa.string())),
+])
+
+def split_words(en):
+    """按空白切分为单词列表（pyarrow ListArray），与str.split()结果一致"""
+    return pc.utf8_split_whitespace(pc.utf8_trim_whitespace(en))
+
+def detect_types(en, words=None):
+    """按列判定Type：含'.'为句子(1)，多个词为词组(-1)，否则为单词(0)，与detect_type逐行结果一致"""
+    if words is None:
+        words = split_words(en)
+    is_sentence = pc.match_substring(en, '.').to_numpy(zero_copy_only=False)
+    is_phrase = pc.list_value_length(words).to_numpy(zero_copy_only=False) > 1
+    return np.select([is_sentence, is_phrase], [1, -1], 0)
+
+def extract_promts(words, types, table_letter):
+    """按列提取提示词：Type为-1/1的行中以table_letter开头的单词，逗号连接"""
+    if not table_letter:
+        return [''] * len(words)
+    flat = pc.list_flatten(words)
+    rows = pc.list_parent_indices(words).to_numpy(zero_copy_only=False)
+    keep = (types[rows] != 0) & pc.starts_with(pc.utf8_lower(flat), table_letter.lower()).to_numpy(zero_copy_only=False)
+    offsets = np.concatenate(([0], np.cumsum(np.bincount(rows[keep], minlength=len(words)))))
+    found = pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), flat.filter(pa.array(keep)))
+    return pc.binary_join(found, ',').to_pylist()
+
+def enhance_columns(records, table_letter=None):
+    """列式计算增强记录的en/zh/promt/type/pro列"""
+    en = pa.array([rec.get('english', '') or '' for rec in records], pa.string())
+    words = split_words(en)
+    types = detect_types(en, words)
+    return {
+        'en': pc.utf8_trim_whitespace(en).to_pylist(),     # 只保留en本体，不带词性
+        'zh': [rec.get('chinese', '') or '' for rec in records],
+        'promt': extract_promts(words, types, table_letter),
+        'type': types.tolist(),
+        'pro': [rec.get('pos', '') or '' for rec in records],
+    }
+
+def iter_enhanced_batches(records, batch_size=ENHANCE_BATCH_SIZE):
+    """按batch_size切分记录，产出(批内首条的index, 批)"""
+    records = iter(records)
+    start_index = 1
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield start_index, batch
+        start_index += len(batch)
+
+def iter_enhanced_rows(records, table_letter=None, batch_size=ENHANCE_BATCH_SIZE):
+    # 逐行产出按ENHANCED_COLUMNS排列的元组，每batch_size条做一次列式计算，内存与总行数无关
+    for start_index, batch in iter_enhanced_batches(records, batch_size):
+        columns = enhance_columns(batch, table_letter)
+        yield from zip(range(start_index, start_index + len(batch)), columns['en'], columns['zh'],
+                       columns['promt'], repeat(0), columns['type'], columns['pro'])
+
+def encode_pos(values, dictionary):
+    """把词性列编码为字典数组；dictionary在各批之间共享且只在末尾追加，Arrow IPC文件据此写增量字典"""
+    known = set(dictionary)
+    dictionary.extend(sorted({value for value in values if value not in known}))
+    dictionary_array = pa.array(dictionary, pa.string())
+    indices = pc.index_in(pa.array(values, pa.string()), value_set=dictionary_array)
+    return pa.DictionaryArray.from_arrays(indices.cast(pa.int16()), dictionary_array)
+
+def iter_record_batches(records, table_letter=None, batch_size=ENHANCE_BATCH_SIZE):
+    # 逐批产出COLUMNAR_SCHEMA类型的pyarrow RecordBatch
+    pos_dictionary = [''] + POS_TAGS
+    for start_index, batch in iter_enhanced_batches(records, batch_size):
+        columns = enhance_columns(batch, table_letter)
+        yield pa.record_batch([
+            pa.array(np.arange(start_index, start_index + len(batch), dtype=np.int32)),
+            pa.array(columns['en'], pa.string()),
+            pa.array(columns['zh'], pa.string()),
+            pa.array(columns['promt'], pa.string()),
+            pa.array(np.zeros(len(batch), dtype=np.int32)),
+            pa.array(np.asarray(columns['type'], dtype=np.int8)),
+            encode_pos(columns['pro'], pos_dictionary),
+        ], schema=COLUMNAR_SCHEMA)
+
+def iter_enhanced_records(records, table_letter=None):
+    # 逐条产出增强记录：增加index、type、num、promt、pro列，en/zh/promt/num/type/pro
+    # 产出的是逐行字典，逐条循环比先列式计算再拼回字典更快（见benchmarks/bench_vectorized.py），列式计算只用于导出
+    letter = table_letter.lower() if table_letter else None
+    for idx, rec in enumerate(records, 1):
         eng = rec.get('english', '') or ''
-        zh = rec.get('chinese', '') or ''
-        pro = rec.get('pos', '') or ''
-        # Type判定
-        if '.' in eng:
-            typ = 1
-        else:
-            words = eng.split()
-            if len(words) == 1:
-                typ = 0
-            elif len(words) > 1:
-                typ = -1
-            else:
-                typ = 0
+        typ = detect_type(eng)
         # 只保留en本体，不带词性
         en_clean = eng.strip()
         # 提示词逻辑：对于Type=-1/1，查找en中以table_letter为首字母的单词
         promt = ''
-        if typ in (-1, 1) and table_letter:
-            found = [w for w in en_clean.split() if w.lower().startswith(table_letter.lower())]
-            promt = ','.join(found)
-        enhanced.append({
-            'en': en_clean,
-            'zh': zh,
-            'promt': promt,
-            'num': 0,
-            'type': typ,
-            'pro': pro
-        })
-    # index列最后统一编号
-    for idx, row in enumerate(enhanced, 1):
-        row['index'] = idx
-    # 保证列顺序
-    cols = ['index', 'en', 'zh', 'promt', 'num', 'type', 'pro']
-    enhanced = [{k: row.get(k, '') for k in cols} for row in enhanced]
-    return enhanced
+        if typ and letter:
+            promt = ','.join(w for w in en_clean.split() if w.lower().startswith(letter))
+        yield {'index': idx, 'en': en_clean, 'zh': rec.get('chinese', '') or '', 'promt': promt,
+               'num': 0, 'type': typ, 'pro': rec.get('pos', '') or ''}
+
+def enhance_records(records, table_letter=None):
+    return list(iter_enhanced_records(records, table_letter))
+
+def write_sheet(workbook, sheet_name, columns, rows):
+    """constant_memory模式下逐行写入一个sheet（行必须按顺序写完再写下一个sheet）"""
+    worksheet = workbook.add_worksheet(sheet_name)
+    header_format = workbook.add_format({'bold': True, 'border': 1, 'align': 'center'})
+    worksheet.write_row(0, 0, columns, header_format)
+    count = 0
+    for count, row in enumerate(rows, 1):
+        worksheet.write_row(count, 0, row)
+    return count
 
 def export_to_excel(all_tables, output_path):
-    with pd.ExcelWriter(output_path) as writer:
+    # 不经过DataFrame，增强记录直接流式写入constant_memory工作簿，内存占用与行数无关
+    workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+    try:
         for table_name, records in all_tables.items():
-            enhanced = enhance_records(records, table_letter=table_name)
-            df = pd.DataFrame(enhanced)
-            df.to_excel(writer, sheet_name=table_name, index=False)
+            write_sheet(workbook, table_name, ENHANCED_COLUMNS,
+                        iter_enhanced_rows(records, table_letter=table_name))
+    finally:
+        workbook.close()
     print(f"已导出到Excel: {output_path}")
 
-def export_to_db(all_tables, db_path):
-    conn = sqlite3.connect(db_path)
+def export_to_columnar(all_tables, output_dir, file_format='parquet'):
+    # 按字母分区写入 output_dir/letter=<字母>/part-0.<格式>，每批增强记录写成一个row group / record batch
+    for table_name, records in all_tables.items():
+        part_dir = os.path.join(output_dir, f'letter={table_name}')
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, f'part-0.{file_format}')
+        if file_format == 'parquet':
+            writer = pq.ParquetWriter(path, COLUMNAR_SCHEMA, compression='zstd')
+        else:
+            writer = pa.ipc.new_file(path, COLUMNAR_SCHEMA,
+                                     options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        with writer:
+            for batch in iter_record_batches(records, table_letter=table_name):
+                writer.write_batch(batch)
+    print(f"已导出到{file_format}: {output_dir}")
+
+def load_columnar(output_dir, file_format='parquet', letters=None):
+    """读取export_to_columnar的输出为DataFrame（含letter列），letters可只读部分字母分区"""
+    partitioning = ds.partitioning(pa.schema([('letter', pa.string())]), flavor='hive')
+    dataset = ds.dataset(output_dir, format='parquet' if file_format == 'parquet' else 'ipc',
+                         partitioning=partitioning)
+    row_filter = ds.field('letter').isin(letters) if letters else None
+    return dataset.to_table(filter=row_filter).to_pandas()
+
+def export_to_db(all_tables, db_path, source='txt'):
+    # 写入统一词汇库，每个字母覆盖该来源之前导出的数据
     for table_name, records in all_tables.items():
-        enhanced = enhance_records(records, table_letter=table_name)
-        df = pd.DataFrame(enhanced)
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
-        print(f"  ✅ 创建表：{table_name} ({len(df)} 条记录)")
-    conn.close()
+        count = upsert_records(db_path, iter_enhanced_records(records, table_letter=table_name),
+                               source, kind='txt', letter=table_name, replace=True)
+        print(f"  ✅ 写入字母：{table_name} ({count} 条记录)")
     print(f"已导出到数据库: {db_path}")
 
 def detect_type(eng):
@@ -266,45 +395,35 @@ def detect_type(eng):
 
 def process_txt_file(txt_path):
     # 假设每行格式：中文\t英文
-    data = []
     with open(txt_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if '\t' in line:
-                zh, en = line.split('\t', 1)
-            else:
-                zh, en = '', line
-            data.append({'zh': zh, 'en': en})
+        lines = pc.utf8_trim_whitespace(pa.array(f.read().split('\n'), pa.string()))
+    lines = lines.filter(pc.not_equal(lines, ''))
+    if len(lines) == 0:
+        return pd.DataFrame()
+    # 按第一个制表符切成[中文, 英文]；没有制表符时整行是英文
+    parts = pc.split_pattern(lines, '\t', max_splits=1)
+    flat = pc.list_flatten(parts)
+    offsets = parts.offsets.to_numpy()
+    has_tab = np.diff(offsets) == 2
+    en = flat.take(pa.array(offsets[1:] - 1))
+    zh = pc.if_else(pa.array(has_tab), flat.take(pa.array(offsets[:-1])), '')
+    types = detect_types(en)
     # 生成DataFrame
-    df = pd.DataFrame(data)
-    if df.empty:
-        return df
+    df = pd.DataFrame({'zh': zh.to_pylist(), 'en': en.to_pylist()})
     # 生成Type列
-    df['Type'] = df['en'].apply(detect_type)
+    df['Type'] = types
     # 生成index列
     df['index'] = range(1, len(df)+1)
     # 生成Num列
     df['Num'] = 0
-    # 处理词组/句子的中文加括号单词
-    last_word = ''
-    zh_list = df['zh'].tolist()
-    en_list = df['en'].tolist()
-    type_list = df['Type'].tolist()
-    for i in range(len(df)):
-        if type_list[i] == 0:
-            # 记录最近的单词
-            last_word = en_list[i].strip()
-        elif type_list[i] in (-1, 1) and last_word:
-            # 在中文后加括号单词
-            zh_list[i] = zh_list[i] + f'（{last_word}）'
-    df['zh'] = zh_list
+    # 处理词组/句子的中文加括号单词：向前填充最近的单词
+    last_word = pd.Series(pc.utf8_trim_whitespace(en).to_pylist(), dtype=df['en'].dtype).where(types == 0).ffill()
+    tagged = (types != 0) & last_word.notna().to_numpy() & (last_word != '').to_numpy()
+    df.loc[tagged, 'zh'] = df.loc[tagged, 'zh'] + '（' + last_word[tagged] + '）'
     return df[['index', 'zh', 'en', 'Type', 'Num']]
 
 def batch_txt_to_excel_and_db(txt_dir='txt', excel_path='words.xlsx', db_path='words.db'):
-    writer = pd.ExcelWriter(excel_path, engine='xlsxwriter')
-    conn = sqlite3.connect(db_path)
+    workbook = xlsxwriter.Workbook(excel_path, {'constant_memory': True})
     subdirs = [d for d in os.listdir(txt_dir) if os.path.isdir(os.path.join(txt_dir, d))]
     subdirs.sort()
     for subdir in subdirs:
@@ -318,14 +437,15 @@ def batch_txt_to_excel_and_db(txt_dir='txt', excel_path='words.xlsx', db_path='w
             # 重新编号index
             df['index'] = range(1, len(df)+1)
             # 写入Excel
-            df.to_excel(writer, sheet_name=subdir, index=False)
-            # 写入数据库
-            df.to_sql(subdir, conn, if_exists='replace', index=False)
+            write_sheet(workbook, subdir, list(df.columns), df.itertuples(index=False, name=None))
+            # 写入统一词汇库
+            records = ({'en': en, 'zh': zh, 'type': typ, 'num': num}
+                       for en, zh, typ, num in zip(df['en'], df['zh'], df['Type'], df['Num']))
+            upsert_records(db_path, records, txt_dir, kind='txt', letter=subdir, replace=True)
             print(f"✅ 已处理 {target_file}")
         else:
             print(f"⚠️  {target_file} 无有效内容")
-    writer.close()
-    conn.close()
+    workbook.close()
 
 if __name__ == '__main__':
     import argparse
@@ -333,11 +453,17 @@ if __name__ == '__main__':
     parser.add_argument('--input', type=str, required=True, help='输入文件夹路径')
     parser.add_argument('--excel', type=str, default='words.xlsx', help='输出excel文件')
     parser.add_argument('--db', type=str, default='words.db', help='输出sqlite db文件')
+    parser.add_argument('--parquet', type=str, help='同时导出Parquet目录（按字母分区）')
+    parser.add_argument('--arrow', type=str, help='同时导出Arrow IPC目录（按字母分区）')
     args = parser.parse_args()
 
     all_tables = process_folder(args.input)
     if all_tables:
         export_to_excel(all_tables, args.excel)
-        export_to_db(all_tables, args.db)
+        export_to_db(all_tables, args.db, source=args.input)
+        if args.parquet:
+            export_to_columnar(all_tables, args.parquet, 'parquet')
+        if args.arrow:
+            export_to_columnar(all_tables, args.arrow, 'arrow')
     else:
         print("没有处理到任何文件，退出。") 
\ No newline at end of file
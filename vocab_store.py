@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+统一词汇库 - 所有写入方共用的规范化存储（entries / senses / sources，释义与来源的多对多关联在 sense_sources）
+取代 words.db 的按字母分表、words_ai.db 的额外同名表与 vocabulary.db 的单表结构。
+用法：
+    python vocab_store.py migrate --db vocab.db words.db words_ai.db vocabulary.db
+"""
+import os
+import queue
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+
+from chinese_index import init_chinese_index, index_chinese, rebuild_chinese_index, INDEX_TABLE
+
+DEFAULT_POOL_SIZE = int(os.getenv('VOCAB_DB_POOL_SIZE', '4'))
+DEFAULT_BATCH_SIZE = 500  # 每批IN查询的参数数，低于SQLite默认变量上限
+STORE_TABLES = ('sources', 'entries', 'senses', 'sense_sources', INDEX_TABLE, 'sqlite_sequence')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    kind TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    letter TEXT NOT NULL,
+    english TEXT NOT NULL,
+    type INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (letter, english)
+);
+CREATE TABLE IF NOT EXISTS senses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+    pos TEXT NOT NULL DEFAULT '',
+    chinese TEXT NOT NULL DEFAULT '',
+    promt TEXT,
+    num INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (entry_id, pos, chinese)
+);
+-- 同一释义可由多个来源提供；某来源重新导出时只删除它的关联，没有任何来源的释义才删除
+CREATE TABLE IF NOT EXISTS sense_sources (
+    sense_id INTEGER NOT NULL REFERENCES senses(id) ON DELETE CASCADE,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    PRIMARY KEY (sense_id, source_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_entries_english ON entries (english COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_sense_sources_source ON sense_sources (source_id);
+DROP VIEW IF EXISTS vocabulary_view;
+CREATE VIEW vocabulary_view AS
+    SELECT s.id AS id, e.id AS entry_id, e.letter AS letter, e.english AS english, e.type AS type,
+           s.pos AS pos, s.chinese AS chinese, s.promt AS promt, s.num AS num,
+           (SELECT GROUP_CONCAT(src.name, ', ') FROM sense_sources ss JOIN sources src ON src.id = ss.source_id
+            WHERE ss.sense_id = s.id) AS source
+    FROM senses s
+    JOIN entries e ON e.id = s.entry_id;
+'''
+
+
+def _connect(db_path, timeout=30):
+    conn = sqlite3.connect(db_path, timeout=timeout, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    return conn
+
+
+class ConnectionPool:
+    """按需创建、最多size个的SQLite连接池；取出的连接在with块结束时提交或回滚"""
+
+    def __init__(self, db_path, size=DEFAULT_POOL_SIZE, timeout=30):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return _connect(self.db_path, self.timeout)
+        return self._idle.get(timeout=self.timeout)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._created = 0
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, size=DEFAULT_POOL_SIZE):
+    """每个数据库文件共用一个连接池，首次获取时建表"""
+    key = os.path.abspath(db_path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path, size)
+            with pool.connection() as conn:
+                conn.executescript(SCHEMA)
+                _upgrade_sources(conn)
+                if init_chinese_index(conn):
+                    rebuild_chinese_index(conn)
+            _pools[key] = pool
+    return pool
+
+
+def _upgrade_sources(conn):
+    """旧版库的释义只有一个source_id列：首次打开时转为sense_sources关联（该列此后不再使用）"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(senses)")}
+    if 'source_id' not in columns or conn.execute("SELECT 1 FROM sense_sources LIMIT 1").fetchone():
+        return
+    conn.execute('''INSERT OR IGNORE INTO sense_sources (sense_id, source_id)
+                    SELECT id, source_id FROM senses WHERE source_id IS NOT NULL''')
+
+
+def close_pool(db_path):
+    """关闭并移除数据库的连接池（备份/删除数据库文件前调用）"""
+    with _pools_lock:
+        pool = _pools.pop(os.path.abspath(db_path), None)
+    if pool:
+        pool.close_all()
+
+
+def init_store(db_path):
+    get_pool(db_path)
+
+
+def is_store(db_path):
+    """判断数据库是否已是统一结构"""
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='entries'").fetchone()
+    finally:
+        conn.close()
+    return row is not None
+
+
+def letter_of(english, default='#'):
+    """英文首字母（小写），非字母开头时归入default"""
+    first = (english or '').strip()[:1].lower()
+    return first if 'a' <= first <= 'z' else default
+
+
+def _clean_optional(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return None if value in ('', 'NULL') else value
+
+
+def _normalize(record, letter):
+    """统一记录字段：en/zh/pro/type/promt/num"""
+    english = (record.get('en') or '').strip()
+    return (
+        letter or letter_of(english),
+        english,
+        int(record.get('type') or 0),
+        _clean_optional(record.get('pro')) or '',
+        (record.get('zh') or '').strip(),
+        _clean_optional(record.get('promt')),
+        int(record.get('num') or 0),
+    )
+
+
+def get_source_id(conn, name, kind=''):
+    conn.execute("INSERT OR IGNORE INTO sources (name, kind) VALUES (?, ?)", (name, kind))
+    return conn.execute("SELECT id FROM sources WHERE name = ?", (name,)).fetchone()[0]
+
+
+def _delete_source_letter(conn, source_id, letter):
+    """删除某来源在某字母下的释义关联；不再有任何来源的释义连同索引一并删除，并清理无释义的词条"""
+    sense_ids = [row[0] for row in conn.execute(
+        '''SELECT ss.sense_id FROM sense_sources ss
+           JOIN senses s ON s.id = ss.sense_id JOIN entries e ON e.id = s.entry_id
+           WHERE ss.source_id = ? AND e.letter = ?''', (source_id, letter))]
+    for i in range(0, len(sense_ids), DEFAULT_BATCH_SIZE):
+        batch = sense_ids[i:i + DEFAULT_BATCH_SIZE]
+        placeholders = ','.join('?' * len(batch))
+        conn.execute(f"DELETE FROM sense_sources WHERE source_id = ? AND sense_id IN ({placeholders})",
+                     (source_id, *batch))
+        orphans = f'''SELECT id FROM senses WHERE id IN ({placeholders})
+                      AND NOT EXISTS (SELECT 1 FROM sense_sources ss WHERE ss.sense_id = senses.id)'''
+        conn.execute(f"DELETE FROM {INDEX_TABLE} WHERE sense_id IN ({orphans})", batch)
+        conn.execute(f"DELETE FROM senses WHERE id IN ({orphans})", batch)
+    conn.execute('''DELETE FROM entries WHERE letter = ?
+                    AND NOT EXISTS (SELECT 1 FROM senses s WHERE s.entry_id = entries.id)''', (letter,))
+
+
+def _write_batch(conn, rows, source_id):
+    conn.executemany('''INSERT INTO entries (letter, english, type) VALUES (?, ?, ?)
+                        ON CONFLICT (letter, english) DO UPDATE SET type = excluded.type''',
+                     [(letter, english, typ) for letter, english, typ, *_ in rows])
+    # 取回词条id
+    by_letter = {}
+    for letter, english, *_ in rows:
+        by_letter.setdefault(letter, set()).add(english)
+    entry_ids = {}
+    for letter, words in by_letter.items():
+        words = list(words)
+        placeholders = ','.join('?' * len(words))
+        for entry_id, english in conn.execute(
+                f"SELECT id, english FROM entries WHERE letter = ? AND english IN ({placeholders})",
+                (letter, *words)):
+            entry_ids[(letter, english)] = entry_id
+    conn.executemany('''INSERT INTO senses (entry_id, pos, chinese, promt, num)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (entry_id, pos, chinese) DO UPDATE SET
+                            promt = COALESCE(excluded.promt, senses.promt)''',
+                     [(entry_ids[(letter, english)], pos, chinese, promt, num)
+                      for letter, english, _, pos, chinese, promt, num in rows])
+    ids = sorted(set(entry_ids.values()))
+    placeholders = ','.join('?' * len(ids))
+    senses = conn.execute(f"SELECT id, entry_id, pos, chinese FROM senses WHERE entry_id IN ({placeholders})",
+                          ids).fetchall()
+    # 关联到本来源（其他来源已提供的释义只增加关联，不改变原有来源）
+    sense_ids = {(entry_id, pos, chinese): sense_id for sense_id, entry_id, pos, chinese in senses}
+    conn.executemany("INSERT OR IGNORE INTO sense_sources (sense_id, source_id) VALUES (?, ?)",
+                     {(sense_ids[(entry_ids[(letter, english)], pos, chinese)], source_id)
+                      for letter, english, _, pos, chinese, _, _ in rows})
+    # 增量更新中文二元组索引（重复写入会被忽略）
+    index_chinese(conn, [(sense_id, chinese) for sense_id, _, _, chinese in senses])
+
+
+def upsert_records(db_path, records, source, kind='', letter=None, replace=False,
+                   batch_size=DEFAULT_BATCH_SIZE):
+    """批量写入记录（字段en/zh/pro/type/promt/num），返回写入条数
+
+    letter为空时按英文首字母归类；replace=True时先清空该来源在该字母下的旧数据
+    """
+    pool = get_pool(db_path)
+    total = 0
+    with pool.connection() as conn:
+        source_id = get_source_id(conn, source, kind)
+        if replace and letter:
+            _delete_source_letter(conn, source_id, letter)
+        batch = []
+        for record in records:
+            batch.append(_normalize(record, letter))
+            if len(batch) >= batch_size:
+                _write_batch(conn, batch, source_id)
+                total += len(batch)
+                batch = []
+        if batch:
+            _write_batch(conn, batch, source_id)
+            total += len(batch)
+    return total
+
+
+def fetch_letter(db_path, letter):
+    """按写入顺序返回某字母下的 [(en, pro, zh, promt)]"""
+    with get_pool(db_path).connection() as conn:
+        return conn.execute('''SELECT english, pos, chinese, promt FROM vocabulary_view
+                               WHERE letter = ? ORDER BY id''', (letter,)).fetchall()
+
+
+def _legacy_records(conn, table, columns):
+    """把旧库中一张表的行转换为统一记录，返回(字母, 记录列表)；无法识别的表返回None"""
+    lower = {c.lower(): c for c in columns}
+    if {'english', 'pos', 'chinese'} <= set(lower):
+        # vocabulary.db：单表，按首字母归类
+        select = [lower['english'], lower['pos'], lower['chinese']]
+        has_source = 'source_file' in lower
+        if has_source:
+            select.append(lower['source_file'])
+        rows = conn.execute(f'SELECT {", ".join(select)} FROM "{table}" ORDER BY rowid').fetchall()
+        return None, [{'en': r[0], 'pro': r[1], 'zh': r[2], 'source_file': r[3] if has_source else None}
+                      for r in rows]
+    if {'en', 'zh'} <= set(lower):
+        # words.db / words_ai.db：按字母分表
+        fields = ['en', 'zh', 'pro', 'type', 'promt', 'num']
+        select = [lower.get(f) for f in fields]
+        rows = conn.execute(
+            f'SELECT {", ".join(c if c else "NULL" for c in select)} FROM "{table}" ORDER BY rowid').fetchall()
+        letter = table.lower() if len(table) == 1 and 'a' <= table.lower() <= 'z' else None
+        return letter, [dict(zip(fields, r)) for r in rows]
+    return None
+
+
+def migrate(target_db, legacy_dbs):
+    """把旧结构的数据库导入统一词汇库，返回导入条数"""
+    init_store(target_db)
+    total = 0
+    for legacy_db in legacy_dbs:
+        if not os.path.exists(legacy_db):
+            print(f"跳过 {legacy_db}，文件不存在")
+            continue
+        db_name = os.path.basename(legacy_db)
+        if is_store(legacy_db):
+            print(f"跳过 {legacy_db}，已是统一结构")
+            continue
+        conn = sqlite3.connect(legacy_db)
+        try:
+            tables = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+            for table in tables:
+                if table in STORE_TABLES:
+                    continue
+                columns = [r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')]
+                converted = _legacy_records(conn, table, columns)
+                if converted is None:
+                    print(f"  ⚠️  跳过无法识别的表: {db_name}:{table}")
+                    continue
+                letter, records = converted
+                if not records:
+                    continue
+                if 'source_file' in records[0]:
+                    # 保留vocabulary表中每条记录的来源文件
+                    by_source = {}
+                    for record in records:
+                        by_source.setdefault(record.pop('source_file') or table, []).append(record)
+                    count = sum(upsert_records(target_db, group, f"{db_name}:{source}", kind='json')
+                                for source, group in by_source.items())
+                else:
+                    count = upsert_records(target_db, records, f"{db_name}:{table}", kind='legacy', letter=letter)
+                total += count
+                print(f"  ✅ 导入 {db_name}:{table} ({count} 条记录)")
+        finally:
+            conn.close()
+    return total
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='统一词汇库工具')
+    parser.add_argument('command', choices=['migrate'], help='命令: migrate-导入旧结构数据库')
+    parser.add_argument('legacy', nargs='+', help='旧数据库文件（words.db / words_ai.db / vocabulary.db）')
+    parser.add_argument('--db', default='vocab.db', help='统一词汇库路径(默认: vocab.db)')
+    args = parser.parse_args()
+
+    if os.path.abspath(args.db) in [os.path.abspath(p) for p in args.legacy]:
+        print("错误: 目标库不能与旧库相同")
+        exit(1)
+    total = migrate(args.db, args.legacy)
+    print(f"迁移完成，共导入 {total} 条记录到 {args.db}")